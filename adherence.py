@@ -0,0 +1,91 @@
+"""Calcula la adherencia por agente y día a partir de las salidas limpias.
+
+Cruza los intervalos de conexiones (limpio_* de limpieza_datos_conexiones)
+con los turnos de programadas y/o topes, por agent_email y fecha. Acepta los
+CSV de la aplicación web o los CSV/Parquet de clean.py.
+
+Ejemplos:
+    python adherence.py --conexiones out/conexiones/ --programadas out/programadas/ -o adherencia.csv
+    python adherence.py --conexiones "out/limpio_conex*.parquet" --topes out/topes/ -o adherencia.csv
+
+Columnas de salida: horas_turno (largo del horario), horas_programadas
+(Total_horas), horas_conectadas (estados distintos de Offline), horas_en_turno
+(la parte conectada dentro del horario), adherencia = horas_en_turno /
+horas_turno y conformidad = horas_conectadas / horas_programadas. Si un agente
+tiene turno en programadas y en topes el mismo día, vale el de programadas.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import motor  # noqa: F401  (agrega static/scripts al path para importar comun)
+from comun.adherencia import leer_conexiones, leer_turnos, calcular_adherencia
+from comun.escritura import escribir_csv
+from comun.resumen import SUFIJO_RESUMEN
+
+EXTENSIONS = ('.csv', '.parquet')
+
+
+def expand_outputs(patterns):
+    """Expande carpetas y patrones glob a las salidas limpias (sin reportes de calidad ni resúmenes)"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True) or [pattern]
+        files.extend(path for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(EXTENSIONS)
+                     and SUFIJO_RESUMEN not in os.path.basename(path))
+    return sorted(set(files))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='adherence',
+        description="Adherencia por agente y día: conexiones vs. programadas/topes",
+        epilog="Los patrones glob deben ir entre comillas para que los expanda adherence y no el shell.",
+    )
+    parser.add_argument('--conexiones', nargs='+', required=True, help="Salidas limpias de conexiones")
+    parser.add_argument('--programadas', nargs='+', default=[], help="Salidas limpias de programadas")
+    parser.add_argument('--topes', nargs='+', default=[], help="Salidas limpias de topes")
+    parser.add_argument('--output', '-o', required=True, help="CSV de salida")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    conexiones = expand_outputs(args.conexiones)
+    programadas = expand_outputs(args.programadas)
+    topes = expand_outputs(args.topes)
+    if not conexiones:
+        print("❌ No se encontraron salidas de conexiones", file=sys.stderr)
+        return 2
+    if not programadas and not topes:
+        print("❌ Se necesita al menos una salida de programadas o topes", file=sys.stderr)
+        return 2
+
+    print(f"🚀 Conexiones: {len(conexiones)} archivos, programadas: {len(programadas)}, topes: {len(topes)}")
+    inicio = time.time()
+    intervalos = leer_conexiones(conexiones)
+    turnos = leer_turnos(programadas, topes)
+    print(f"📄 {len(intervalos):,} intervalos conectados, {len(turnos):,} turnos")
+
+    resultado = calcular_adherencia(intervalos, turnos)
+    carpeta = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(carpeta, exist_ok=True)
+    escribir_csv(resultado, args.output)
+
+    con_turno = resultado['horas_turno'].notna()
+    print(f"✅ {args.output}: {len(resultado):,} filas agente/día ({con_turno.sum():,} con turno) "
+          f"en {time.time() - inicio:.1f}s")
+    if con_turno.any():
+        print(f"📊 Adherencia media: {resultado.loc[con_turno, 'adherencia'].mean():.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import contextlib
+import fcntl
+import json
+import math
+import os
+import time
+import uuid
+
+# Segundos de proceso por MB de entrada de cada script (medidos con archivos de ~10MB);
+# el costo estimado de un job es la suma de tamaño x tasa de cada archivo y script
+SCRIPT_SECONDS_PER_MB = {
+    'limpieza_datos_conexiones': 0.07,
+    'limpieza_datos_programadas': 0.12,
+    'limpieza_datos_metrics_New_Escheme': 0.18,
+    'limpieza_datos_RQ': 0.22,
+    'limpieza_datos_topes': 0.24,
+}
+# Tasa para scripts sin medir o aún no detectados (selección automática)
+DEFAULT_SECONDS_PER_MB = 0.25
+# Jobs con costo estimado hasta este valor (segundos) van por el carril rápido
+FAST_LANE_MAX_COST = 5
+# Cuánto espera en cola una petición antes de responder 429
+QUEUE_WAIT_SECONDS = 15
+# Intervalo con el que un job en cola vuelve a mirar si le toca
+POLL_INTERVAL_SECONDS = 0.2
+# Un ticket de un proceso que murió sin liberarlo se descarta tras este tiempo
+TICKET_TTL_SECONDS = 6 * 3600
+# Peso de cada job terminado en la corrección de la estimación (media móvil exponencial)
+CALIBRATION_WEIGHT = 0.2
+# Tope del Retry-After sugerido
+MAX_RETRY_AFTER = 600
+
+
+class AdmissionError(Exception):
+    """La instancia no puede aceptar el job ahora (se traduce a 429 con Retry-After)"""
+
+    def __init__(self, message, retry_after, status=429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+def estimate_cost(sizes_and_scripts, rates=None):
+    """Costo estimado en segundos de una lista de (bytes, [scripts])"""
+    rates = {**SCRIPT_SECONDS_PER_MB, **(rates or {})}
+    return sum(
+        size / 1024 ** 2 * rates.get(script_name, DEFAULT_SECONDS_PER_MB)
+        for size, script_names in sizes_and_scripts
+        for script_name in script_names
+    )
+
+
+class AdmissionControl:
+    """Admisión por costo y reparto justo de los workers entre usuarios.
+
+    Hay ``slots`` lugares para jobs de cualquier tamaño y ``fast_slots`` más
+    reservados para los jobs chicos (costo <= ``fast_lane_max_cost``), así un
+    RQ pequeño no espera detrás de un mes de conexiones. Cada usuario tiene
+    como máximo ``per_user_active`` jobs corriendo por carril y
+    ``per_user_queued`` esperando; cuando se libera un lugar lo toma el job en
+    cola cuyo usuario tiene menos jobs activos (y, a igualdad, el más antiguo).
+    Si la cola está llena, o un job no consigue lugar en ``wait_seconds``, se
+    lanza AdmissionError con un Retry-After estimado a partir del costo
+    pendiente. Con espera 0 (workers síncronos, donde esperar en cola
+    retendría el único hilo del worker) un job sin lugar se rechaza enseguida.
+
+    El estado vive en ``<root>/state.json`` y se modifica bajo ``flock``, así
+    los límites valen para todos los workers de gunicorn. La estimación se
+    corrige con el tiempo real de cada job terminado (``calibration``).
+    """
+
+    def __init__(self, root, slots, fast_slots=1, per_user_active=1, per_user_queued=1,
+                 max_queued=8, wait_seconds=QUEUE_WAIT_SECONDS, fast_lane_max_cost=FAST_LANE_MAX_COST):
+        if slots < 1:
+            raise ValueError(f"Se necesita al menos un lugar para jobs generales (slots={slots})")
+        self.root = root
+        self.slots = slots
+        self.fast_slots = max(fast_slots, 0)
+        self.per_user_active = max(per_user_active, 1)
+        self.per_user_queued = max(per_user_queued, 0)
+        self.max_queued = max(max_queued, 0)
+        self.wait_seconds = wait_seconds
+        self.fast_lane_max_cost = fast_lane_max_cost
+        os.makedirs(root, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Estado compartido bajo lock exclusivo; los cambios se guardan al salir"""
+        with open(os.path.join(self.root, 'lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                path = os.path.join(self.root, 'state.json')
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+                state.setdefault('active', {})
+                state.setdefault('queued', {})
+                state.setdefault('calibration', 1.0)
+                self._prune(state)
+                yield state
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _prune(self, state):
+        """Descarta tickets de procesos que ya no existen o demasiado viejos"""
+        limit = time.time() - TICKET_TTL_SECONDS
+        for group in ('active', 'queued'):
+            for ticket_id, ticket in list(state[group].items()):
+                if ticket['since'] < limit or not _alive(ticket['pid']):
+                    del state[group][ticket_id]
+
+    def lane(self, cost):
+        return 'rapido' if cost <= self.fast_lane_max_cost else 'general'
+
+    def _has_room(self, state, ticket):
+        active = list(state['active'].values())
+        same_user = [t for t in active if t['user'] == ticket['user'] and t['lane'] == ticket['lane']]
+        if len(same_user) >= self.per_user_active:
+            return False
+        # Los jobs chicos pueden ocupar lugares generales libres: el total vale para ambos carriles
+        if len(active) >= self.slots + self.fast_slots:
+            return False
+        if ticket['lane'] == 'general':
+            return sum(1 for t in active if t['lane'] == 'general') < self.slots
+        return True
+
+    def _next(self, state):
+        """Ticket en cola al que le toca el próximo lugar libre, o None"""
+        active_by_user = {}
+        for t in state['active'].values():
+            active_by_user[t['user']] = active_by_user.get(t['user'], 0) + 1
+        candidates = [
+            (active_by_user.get(t['user'], 0), t['since'], ticket_id)
+            for ticket_id, t in state['queued'].items()
+            if self._has_room(state, t)
+        ]
+        return min(candidates)[2] if candidates else None
+
+    def _retry_after(self, state, cost):
+        """Segundos estimados hasta que haya lugar: costo pendiente repartido entre los lugares"""
+        now = time.time()
+        pending = sum(max(t['cost'] * state['calibration'] - (now - t['started']), 0)
+                      for t in state['active'].values())
+        pending += sum(t['cost'] * state['calibration'] for t in state['queued'].values())
+        capacity = self.slots + (self.fast_slots if self.lane(cost) == 'rapido' else 0)
+        return min(max(math.ceil(pending / capacity), 1), MAX_RETRY_AFTER)
+
+    def acquire(self, user, cost, wait_seconds=None):
+        """Espera un lugar para el job y lo ocupa; devuelve el ticket para ``release``.
+
+        Lanza AdmissionError si el usuario o la instancia ya tienen la cola
+        llena, o si no hubo lugar en ``wait_seconds`` (por defecto el del
+        constructor; con 0 no se espera en cola).
+        """
+        wait_seconds = self.wait_seconds if wait_seconds is None else wait_seconds
+        ticket_id = uuid.uuid4().hex
+        ticket = {'user': user, 'cost': cost, 'lane': self.lane(cost), 'pid': os.getpid(), 'since': time.time()}
+
+        with self._state() as state:
+            if not self._has_room(state, ticket):
+                if wait_seconds <= 0:
+                    raise AdmissionError("No hay lugar para procesar el job", self._retry_after(state, cost))
+                queued_by_user = sum(1 for t in state['queued'].values() if t['user'] == user)
+                if queued_by_user >= self.per_user_queued or len(state['queued']) >= self.max_queued:
+                    raise AdmissionError("Cola de procesamiento llena", self._retry_after(state, cost))
+            state['queued'][ticket_id] = ticket
+
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            retry_after = None
+            with self._state() as state:
+                if self._next(state) == ticket_id:
+                    state['active'][ticket_id] = {**state['queued'].pop(ticket_id), 'started': time.time()}
+                    return ticket_id
+                if time.monotonic() >= deadline:
+                    state['queued'].pop(ticket_id, None)
+                    retry_after = self._retry_after(state, cost)
+            if retry_after is not None:
+                raise AdmissionError("No hubo lugar para procesar el job a tiempo", retry_after)
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def release(self, ticket_id):
+        """Libera el lugar del job y corrige la estimación con su duración real"""
+        with self._state() as state:
+            ticket = state['active'].pop(ticket_id, None)
+            # Los jobs de menos de un segundo estimado miden más el overhead que el proceso
+            if ticket and ticket['cost'] >= 1:
+                elapsed = time.time() - ticket['started']
+                state['calibration'] += CALIBRATION_WEIGHT * (elapsed / ticket['cost'] - state['calibration'])
+
+    @contextlib.contextmanager
+    def admit(self, user, cost, wait_seconds=None):
+        """``acquire`` + ``release`` alrededor de un bloque"""
+        ticket_id = self.acquire(user, cost, wait_seconds)
+        try:
+            yield ticket_id
+        finally:
+            self.release(ticket_id)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -1,14 +1,22 @@
 import os
-from flask import Flask, render_template, request, send_file
-import importlib.util
+from flask import Flask, render_template, request, send_file, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import tempfile
-import atexit
 import shutil
+import threading
+import time
+import json
 from datetime import datetime
 import zipfile
 import logging
 
+# Los módulos del servidor (cargas, resultados, progreso, admisión, pool de scripts) se importan
+# en init_app: importar app.py desde la CLI o las herramientas no los carga
+from motor import SCRIPT_FOLDER, get_scripts_list, process_file, detect_script, shared_input
+from comun.calidad import ruta_reporte, cargar_reporte
+from comun.resumen import rutas_resumen
+from comun.validacion import ErrorValidacion
+
 # Configuración básica de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,223 +25,630 @@ app = Flask(__name__)
 
 # Configuración con rutas relativas dentro del proyecto
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SCRIPT_FOLDER = os.path.join(BASE_DIR, 'static', 'scripts')
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploaded_files')
 DOWNLOAD_FOLDER = os.path.join(BASE_DIR, 'processed_files')
-
-# Asegurar que las carpetas existan
-os.makedirs(SCRIPT_FOLDER, exist_ok=True)
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+CHUNK_FOLDER = os.path.join(BASE_DIR, 'upload_chunks')
+RESULT_FOLDER = os.path.join(BASE_DIR, 'results')
+PROGRESS_FOLDER = os.path.join(BASE_DIR, 'progress')
+ADMISSION_FOLDER = os.path.join(BASE_DIR, 'admission')
 
 # Configuración de la aplicación
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB límite
-app.config['ALLOWED_EXTENSIONS'] = {'csv'}
+app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB límite por petición (formulario o fragmento)
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 ** 3))  # 10GB por archivo fragmentado
+app.config['ALLOWED_EXTENSIONS'] = {'csv', 'gz', 'zip', 'zst'}  # CSV plano o comprimido (.csv.gz, .zip con CSVs, .zst)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
+# Base SQLite opcional donde cada script carga sus datos limpios (una tabla por script)
+app.config['SINK_DATABASE'] = os.environ.get('SINK_DATABASE')
+# Claves de upsert por script; si falta, se usa SINK_KEY definido en el script
+app.config['SINK_KEYS'] = {}
+# Si la casilla de tablas de resumen (agregados por agente/LOB/día o semana) aparece marcada
+app.config['SUMMARIES'] = os.environ.get('SUMMARIES', '0') != '0'
+# Antigüedad a partir de la cual un archivo suelto en las carpetas de trabajo se considera huérfano
+app.config['STALE_FILE_SECONDS'] = 6 * 3600
+# Segundos que una conexión /progress sigue enviando eventos antes de cerrarse. Con 0 envía
+# el estado actual y cierra: EventSource reconecta solo (Last-Event-ID) y ninguna escucha
+# retiene un worker síncrono. Con workers con hilos o asíncronos conviene subirlo.
+app.config['PROGRESS_STREAM_SECONDS'] = float(os.environ.get('PROGRESS_STREAM_SECONDS', 0))
+# Espera sugerida al navegador entre reconexiones del stream de progreso
+app.config['PROGRESS_RETRY_MS'] = int(os.environ.get('PROGRESS_RETRY_MS', 1000))
+# Admisión de jobs: los workers de gunicorn se reparten entre el carril rápido (por defecto
+# uno, solo si hay al menos dos workers) y los lugares para cualquier job (el resto, al
+# menos uno: sin lugares generales la app no arranca), más límites por usuario y cola máxima
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+app.config['FAST_LANE_SLOTS'] = int(os.environ.get('FAST_LANE_SLOTS', min(1, WEB_CONCURRENCY - 1)))
+app.config['ADMISSION_SLOTS'] = int(os.environ.get(
+    'ADMISSION_SLOTS', WEB_CONCURRENCY - app.config['FAST_LANE_SLOTS']))
+app.config['MAX_ACTIVE_PER_USER'] = int(os.environ.get('MAX_ACTIVE_PER_USER', 1))
+app.config['MAX_QUEUED_PER_USER'] = int(os.environ.get('MAX_QUEUED_PER_USER', 1))
+app.config['MAX_QUEUED_JOBS'] = int(os.environ.get('MAX_QUEUED_JOBS', 8))
+# Espera máxima en cola, solo con workers con hilos o asíncronos: en un worker síncrono la
+# espera retendría el worker (y las peticiones nuevas quedarían en el backlog del socket),
+# así que ahí un job sin lugar recibe el 429 enseguida
+app.config['QUEUE_WAIT_SECONDS'] = float(os.environ.get('QUEUE_WAIT_SECONDS', 15))
+# Encabezado con el usuario autenticado por el proxy; sin él se usa la IP del cliente
+app.config['USER_HEADER'] = os.environ.get('USER_HEADER')
+# Procesos aislados que ejecutan los scripts (por worker web; con workers con hilos, uno por
+# hilo). Con 0 los scripts corren dentro del worker web, sin límites.
+app.config['SCRIPT_POOL_SIZE'] = int(os.environ.get('SCRIPT_POOL_SIZE', 1))
+# Reporte de adherencia (conexiones vs. programadas/topes) cuando un job trae ambas salidas
+app.config['ADHERENCE'] = os.environ.get('ADHERENCE', '1') != '0'
+
+# Valor del selector de scripts que activa la detección automática por archivo
+AUTO_SCRIPT = 'auto'
+
+# Almacenes, admisión y pool de scripts de este proceso: los crea init_app antes de la primera petición
+chunked_uploads = None
+results = None
+progress_store = None
+admission = None
+script_pool = None
+_init_lock = threading.Lock()
+
+def init_app():
+    """Crea las carpetas de trabajo, los almacenes, la admisión y el pool de scripts (una vez por proceso)
+    
+    Importar app.py no lo hace, así la CLI y las herramientas que importan el módulo no crean
+    carpetas ni cargan los módulos del servidor. Corre antes de la primera petición; fuera de
+    una petición (ej. benchmarks que llaman a execute_script) hay que llamarlo a mano. Los
+    valores de app.config que ya estén definidos no se tocan.
+    """
+    global chunked_uploads, results, progress_store, admission, script_pool
+    with _init_lock:
+        if results is not None:
+            return
+        from chunked_uploads import ChunkedUploadStore
+        from result_store import ResultStore, RESULT_TTL_SECONDS, RESULT_MAX_BYTES
+        from progress import ProgressStore
+        from admission import AdmissionControl, SCRIPT_SECONDS_PER_MB
+        from script_pool import ScriptPool, MAX_JOBS_PER_WORKER, MEMORY_LIMIT_BYTES, CPU_LIMIT_SECONDS, JOB_TIMEOUT_SECONDS
+        
+        # Retención de los ZIP de resultados: vigencia por job y espacio total máximo
+        app.config.setdefault('RESULT_TTL', int(os.environ.get('RESULT_TTL', RESULT_TTL_SECONDS)))
+        app.config.setdefault('RESULT_MAX_BYTES', int(os.environ.get('RESULT_MAX_BYTES', RESULT_MAX_BYTES)))
+        # Segundos de proceso por MB de cada script para estimar el costo (ajustes sobre los medidos)
+        app.config.setdefault('SCRIPT_SECONDS_PER_MB', dict(SCRIPT_SECONDS_PER_MB))
+        # Límites de los procesos del pool de scripts
+        app.config.setdefault('SCRIPT_MAX_JOBS', int(os.environ.get('SCRIPT_MAX_JOBS', MAX_JOBS_PER_WORKER)))
+        app.config.setdefault('SCRIPT_MEMORY_LIMIT', int(os.environ.get('SCRIPT_MEMORY_LIMIT', MEMORY_LIMIT_BYTES)))
+        app.config.setdefault('SCRIPT_CPU_SECONDS', int(os.environ.get('SCRIPT_CPU_SECONDS', CPU_LIMIT_SECONDS)))
+        app.config.setdefault('SCRIPT_TIMEOUT', float(os.environ.get('SCRIPT_TIMEOUT', JOB_TIMEOUT_SECONDS)))
+        
+        # Asegurar que las carpetas existan
+        os.makedirs(SCRIPT_FOLDER, exist_ok=True)
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        
+        chunked_uploads = ChunkedUploadStore(CHUNK_FOLDER, app.config['MAX_UPLOAD_SIZE'])
+        progress_store = ProgressStore(PROGRESS_FOLDER)
+        admission = AdmissionControl(
+            ADMISSION_FOLDER,
+            slots=app.config['ADMISSION_SLOTS'],
+            fast_slots=app.config['FAST_LANE_SLOTS'],
+            per_user_active=app.config['MAX_ACTIVE_PER_USER'],
+            per_user_queued=app.config['MAX_QUEUED_PER_USER'],
+            max_queued=app.config['MAX_QUEUED_JOBS'],
+            wait_seconds=app.config['QUEUE_WAIT_SECONDS'],
+        )
+        script_pool = ScriptPool(
+            size=app.config['SCRIPT_POOL_SIZE'],
+            max_jobs=app.config['SCRIPT_MAX_JOBS'],
+            memory_limit=app.config['SCRIPT_MEMORY_LIMIT'],
+            cpu_limit=app.config['SCRIPT_CPU_SECONDS'],
+            timeout=app.config['SCRIPT_TIMEOUT'],
+        ) if app.config['SCRIPT_POOL_SIZE'] > 0 else None
+        store = ResultStore(RESULT_FOLDER, ttl=app.config['RESULT_TTL'], max_bytes=app.config['RESULT_MAX_BYTES'])
+        # El barredor también vence cargas fragmentadas abandonadas, progreso viejo y archivos huérfanos
+        store.sweep_tasks.extend([chunked_uploads.purge_expired, progress_store.purge_expired, cleanup])
+        # results es lo último que se asigna: marca la inicialización como completa
+        results = store
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def allowed_script(filename):
-    """Valida que los scripts sean seguros"""
-    return filename.endswith('.py') and not any(bad in filename for bad in ['..', '/', '\\'])
+def script_settings(script_name, summaries=False):
+    """Variables globales adicionales que la app configura en cada script"""
+    settings = {'RESUMEN': summaries}
+    if app.config['SINK_DATABASE']:
+        settings['SINK_DATABASE'] = app.config['SINK_DATABASE']
+        if script_name in app.config['SINK_KEYS']:
+            settings['SINK_KEY'] = app.config['SINK_KEYS'][script_name]
+    return settings
 
-def get_scripts_list():
-    """Obtiene la lista de scripts disponibles"""
-    scripts = []
-    try:
-        for file in os.listdir(SCRIPT_FOLDER):
-            if allowed_script(file):
-                scripts.append(file[:-3])  # Quitar extensión .py
-    except FileNotFoundError:
-        logger.error("Carpeta de scripts no encontrada, creando...")
-        os.makedirs(SCRIPT_FOLDER, exist_ok=True)
-    return scripts
+def request_user():
+    """Usuario al que se le cuentan los límites de admisión"""
+    if app.config['USER_HEADER'] and request.headers.get(app.config['USER_HEADER']):
+        return request.headers[app.config['USER_HEADER']]
+    return request.remote_addr or 'anonimo'
+
+def script_label(script_name):
+    """Nombre corto del script (limpieza_datos_topes -> topes) para distinguir salidas"""
+    return script_name[len('limpieza_datos_'):] if script_name.startswith('limpieza_datos_') else script_name
 
-def execute_script(script_name, input_files):
-    """Ejecuta script para múltiples archivos y devuelve lista de archivos procesados"""
-    script_path = os.path.join(SCRIPT_FOLDER, f"{script_name}.py")
+def execute_script(script_name, input_files, errors=None, label=None, progress=None, summaries=False):
+    """Ejecuta script para múltiples archivos y devuelve lista de archivos procesados
+    
+    Si se pasa ``errors`` (lista), se le agrega (archivo, motivo) por cada archivo rechazado.
+    ``label`` se antepone al nombre de las salidas (y a los motivos de rechazo) cuando el
+    mismo archivo pasa por varios scripts. ``progress`` (JobProgress) recibe el avance de
+    cada archivo. Con ``summaries`` los scripts escriben además sus tablas de resumen.
+    """
+    prefix = f"{label}_" if label else ""
+    reason_prefix = f"{label}: " if label else ""
     processed_files = []
     
-    if not os.path.exists(script_path):
+    if script_name not in get_scripts_list():
         raise FileNotFoundError(f"No se encontró el script: {script_name}.py")
     
+    # En un proceso aislado del pool si está habilitado; si no, dentro de este worker
+    run_script = script_pool.process_file if script_pool else process_file
+    
     try:
-        # Cargar módulo dinámicamente con validación adicional
-        spec = importlib.util.spec_from_file_location(script_name, script_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        
         for input_path in input_files:
+            stage = progress.start_file(script_name, input_path) if progress else None
+            rows = None
             try:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                original_filename = secure_filename(os.path.basename(input_path))
-                output_filename = f"procesado_({timestamp})_{original_filename}"
-                output_path = os.path.join(DOWNLOAD_FOLDER, output_filename)
-                
-                # Configurar variables en el script
-                module.INPUT_FOLDER = os.path.dirname(input_path)
-                module.OUTPUT_FOLDER = os.path.dirname(output_path)
-                
-                # Ejecutar función principal con validación
-                if hasattr(module, 'procesar_archivos'):
-                    logger.info(f"Ejecutando procesar_archivos() en {script_name}")
-                    module.procesar_archivos()
-                elif hasattr(module, 'main'):
-                    logger.info(f"Ejecutando main() en {script_name}")
-                    module.main()
-                else:
-                    raise AttributeError("No se encontró función ejecutable (procesar_archivos o main)")
-                
-                # Verificar salida
-                expected_output = os.path.join(module.OUTPUT_FOLDER, f"limpio_{os.path.basename(input_path)}")
-                if not os.path.exists(expected_output):
-                    raise FileNotFoundError(f"El script no generó el archivo esperado: {expected_output}")
-                if os.path.getsize(expected_output) == 0:
-                    raise ValueError("El archivo de salida está vacío")
-                
-                # Mover archivo procesado
-                os.rename(expected_output, output_path)
-                processed_files.append(output_path)
+                outputs = run_script(
+                    script_name, input_path, DOWNLOAD_FOLDER,
+                    output_name=lambda nombre: f"procesado_({timestamp})_{prefix}{secure_filename(nombre)}",
+                    settings=script_settings(script_name, summaries),
+                    progress=stage,
+                )
+                processed_files.extend(outputs)
+                reports = filter(None, map(cargar_reporte, get_quality_reports(outputs)))
+                rows = sum(report.get('filas_entrada') or 0 for report in reports)
                 
+            except ErrorValidacion as e:
+                logger.warning(f"Archivo rechazado {input_path}: {str(e)}")
+                if errors is not None:
+                    errors.append((os.path.basename(input_path), reason_prefix + '; '.join(e.errores)))
+                continue
             except Exception as e:
                 logger.error(f"Error procesando {input_path}: {str(e)}")
+                if errors is not None:
+                    errors.append((os.path.basename(input_path), reason_prefix + str(e)))
                 continue
+            finally:
+                if progress:
+                    progress.finish_file(rows=rows)
                 
         return processed_files
     
     except Exception as e:
         # Limpiar archivos en caso de error
-        for file in processed_files:
+        for file in processed_files + get_quality_reports(processed_files) + get_summaries(processed_files):
             if os.path.exists(file):
                 os.remove(file)
         raise e
 
+def build_adherence(outputs_by_script, errors=None, progress=None):
+    """Cruza las salidas de conexiones con las de programadas/topes del mismo job
+    
+    Devuelve la ruta de ``adherencia_(<fecha>).csv`` en DOWNLOAD_FOLDER, o None si el job
+    no trae ambas partes. Un fallo se agrega a ``errors`` sin cortar el job.
+    """
+    conexiones = outputs_by_script.get('limpieza_datos_conexiones')
+    programadas = outputs_by_script.get('limpieza_datos_programadas', [])
+    topes = outputs_by_script.get('limpieza_datos_topes', [])
+    if not app.config['ADHERENCE'] or not conexiones or not (programadas or topes):
+        return None
+    
+    from comun.adherencia import leer_conexiones, leer_turnos, calcular_adherencia
+    from comun.escritura import escribir_csv
+    
+    if progress:
+        progress.stage('adherencia')
+    output_path = os.path.join(DOWNLOAD_FOLDER, f"adherencia_({datetime.now().strftime('%Y%m%d_%H%M%S')}).csv")
+    try:
+        resultado = calcular_adherencia(leer_conexiones(conexiones), leer_turnos(programadas, topes))
+        escribir_csv(resultado, output_path)
+        logger.info(f"Adherencia: {len(resultado)} filas agente/día")
+        return output_path
+    except Exception as e:
+        logger.error(f"Error calculando la adherencia: {str(e)}", exc_info=True)
+        if errors is not None:
+            errors.append(('adherencia', str(e)))
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+
+def route_file(input_path):
+    """Devuelve el script detectado para un archivo, o None si no se reconoce"""
+    try:
+        script_name, scores = detect_script(input_path)
+    except Exception as e:
+        logger.error(f"No se pudo inspeccionar {input_path}: {str(e)}")
+        return None
+    if script_name:
+        logger.info(f"{os.path.basename(input_path)} -> {script_name} (puntajes: {scores})")
+    return script_name
+
+def plan_scripts(input_files, script_names, file_scripts=None):
+    """Decide qué scripts corren sobre cada archivo; devuelve (plan, no reconocidos)
+    
+    ``script_names`` se aplica a todos los archivos y ``file_scripts`` ({archivo: [scripts]})
+    lo reemplaza para archivos puntuales. AUTO_SCRIPT dentro de una lista se sustituye por
+    el script detectado para ese archivo.
+    """
+    plan = {}
+    unrecognized = []
+    for input_path in input_files:
+        requested = file_scripts.get(os.path.basename(input_path), script_names)
+        scripts = []
+        for script_name in requested:
+            if script_name == AUTO_SCRIPT:
+                script_name = route_file(input_path)
+                if not script_name:
+                    unrecognized.append(os.path.basename(input_path))
+                    continue
+            if script_name not in scripts:
+                scripts.append(script_name)
+        if scripts:
+            plan[input_path] = scripts
+    return plan, unrecognized
+
+def parse_file_scripts(value):
+    """Lee el campo opcional file_scripts: JSON {nombre de archivo: [scripts]}"""
+    if not value:
+        return {}
+    data = json.loads(value)
+    if not isinstance(data, dict) or not all(
+            isinstance(scripts, list) and all(isinstance(name, str) for name in scripts)
+            for scripts in data.values()):
+        raise ValueError("file_scripts debe ser un objeto {archivo: [scripts]}")
+    return {secure_filename(filename): scripts for filename, scripts in data.items()}
+
+def get_quality_reports(output_files):
+    """Devuelve las rutas de los reportes de calidad existentes para los archivos procesados"""
+    return [ruta_reporte(file) for file in output_files if os.path.exists(ruta_reporte(file))]
+
+def get_summaries(output_files):
+    """Devuelve las rutas de las tablas de resumen escritas junto a los archivos procesados"""
+    return [path for file in output_files for path in rutas_resumen(file)]
+
+def process_job(job_folder, valid_files, uploads, script_names, file_scripts, summaries):
+    """Ensambla las cargas en ``job_folder``, corre los scripts y arma el ZIP de un job ya admitido"""
+    from chunked_uploads import UploadError
+    from progress import JobProgress
+    
+    tracker = None
+    job_error = None
+    try:
+        for status in uploads:
+            try:
+                input_path = chunked_uploads.claim(status['upload_id'], job_folder, secure_filename(status['filename']))
+                valid_files.append(input_path)
+                logger.info(f"Carga fragmentada ensamblada: {input_path}")
+            except UploadError as e:
+                logger.warning(f"Carga {status['upload_id']} descartada: {str(e)}")
+        
+        if not valid_files:
+            return render_template('index.html', 
+                               error="Ningún archivo permitido",
+                               scripts=get_scripts_list(),
+                               selected_scripts=None)
+        
+        plan, unrecognized = plan_scripts(valid_files, script_names, file_scripts)
+        
+        file_errors = [(name, "No se reconoció el tipo de reporte") for name in unrecognized]
+        
+        # Avance publicado para /progress/<progress_id> (el ID lo genera el navegador)
+        tracker = JobProgress(progress_store, request.form.get('progress_id'), [
+            os.path.getsize(input_path) for input_path, file_script_names in plan.items()
+            for _ in file_script_names
+        ])
+        
+        # Cada archivo se descomprime una sola vez y se pasa por todos sus scripts
+        output_files = []
+        outputs_by_script = {}
+        for input_path, file_script_names in plan.items():
+            multiple = len(file_script_names) > 1
+            with shared_input(input_path) as input_files:
+                tracker.resize([os.path.getsize(input_path)] * len(file_script_names),
+                               [os.path.getsize(file) for file in input_files] * len(file_script_names))
+                for file_script in file_script_names:
+                    outputs = execute_script(
+                        file_script, input_files, errors=file_errors,
+                        label=script_label(file_script) if multiple else None,
+                        progress=tracker,
+                        summaries=summaries,
+                    )
+                    output_files.extend(outputs)
+                    outputs_by_script.setdefault(file_script, []).extend(outputs)
+        
+        # Qué script(s) recibió cada archivo, si no fue uno solo elegido para todos
+        routing = {}
+        if AUTO_SCRIPT in script_names or file_scripts or len(script_names) > 1:
+            for input_path, file_script_names in plan.items():
+                for file_script in file_script_names:
+                    routing.setdefault(file_script, []).append(os.path.basename(input_path))
+        
+        if not output_files:
+            job_error = "No se procesaron archivos correctamente"
+            return render_template('index.html', 
+                                 error="No se procesaron archivos correctamente",
+                                 file_errors=file_errors,
+                                 scripts=get_scripts_list(),
+                                 selected_scripts=script_names)
+        
+        processed = len(output_files)
+        adherence = build_adherence(outputs_by_script, errors=file_errors, progress=tracker)
+        if adherence:
+            output_files.append(adherence)
+        
+        # Crear ZIP (archivos limpios + reportes de calidad + resúmenes) dentro del job en el almacén de resultados
+        quality_reports = get_quality_reports(output_files)
+        summary_files = get_summaries(output_files)
+        tracker.stage('comprimiendo')
+        zip_filename = f"resultados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        job_id, zip_path = results.reserve(zip_filename)
+        
+        with zipfile.ZipFile(zip_path, 'w') as zipf:
+            for file in output_files + quality_reports + summary_files:
+                zipf.write(file, os.path.basename(file))
+        job = results.commit(job_id)
+        
+        calidad = [reporte for reporte in map(cargar_reporte, quality_reports) if reporte]
+        
+        return render_template('index.html', 
+                             success=f"Se procesaron {processed} archivos!",
+                             file_errors=file_errors,
+                             routing=routing or None,
+                             download_file=zip_filename,
+                             job_id=job_id,
+                             download_expires=datetime.fromtimestamp(job['expires']).strftime('%Y-%m-%d %H:%M'),
+                             calidad=calidad,
+                             scripts=get_scripts_list(),
+                             selected_scripts=script_names)
+            
+    except Exception as e:
+        logger.error(f"Error al procesar: {str(e)}", exc_info=True)
+        job_error = str(e)
+        return render_template('index.html', 
+                            error=f"Error al procesar: {str(e)}",
+                            scripts=get_scripts_list(),
+                            selected_scripts=script_names)
+    finally:
+        if tracker is not None:
+            tracker.finish(error=job_error)
+        # Limpieza de las salidas (la entrada la borra index junto con la carpeta del job)
+        if 'output_files' in locals():
+            for file in output_files + get_quality_reports(output_files) + get_summaries(output_files):
+                if os.path.exists(file):
+                    os.remove(file)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        if 'files[]' not in request.files:
+        from chunked_uploads import UploadError
+        from admission import AdmissionError, estimate_cost
+        
+        # Los archivos llegan por el formulario (files[]) o ya ensamblados por /uploads (upload_ids[])
+        upload_ids = request.form.getlist('upload_ids[]')
+        if 'files[]' not in request.files and not upload_ids:
             return render_template('index.html', 
                                error="No se seleccionaron archivos",
                                scripts=get_scripts_list(),
-                               selected_script=None)
+                               selected_scripts=None)
         
         files = request.files.getlist('files[]')
-        script_name = request.form.get('script_name')
+        # Uno o varios scripts por archivo: la selección aplica a todos y file_scripts la ajusta por archivo
+        script_names = [name for name in request.form.getlist('script_name') if name]
+        # Tablas de resumen junto a cada CSV limpio (casilla del formulario)
+        summaries = bool(request.form.get('resumen'))
+        try:
+            file_scripts = parse_file_scripts(request.form.get('file_scripts'))
+        except ValueError as e:
+            return render_template('index.html', 
+                               error=f"Selección de scripts inválida: {str(e)}",
+                               scripts=get_scripts_list(),
+                               selected_scripts=None)
         
-        if not files or all(file.filename == '' for file in files):
+        if not upload_ids and (not files or all(file.filename == '' for file in files)):
             return render_template('index.html', 
                                error="No se seleccionaron archivos válidos",
                                scripts=get_scripts_list(),
-                               selected_script=None)
+                               selected_scripts=None)
         
-        if not script_name:
+        if not script_names and not file_scripts:
             return render_template('index.html', 
                                error="No se seleccionó script",
                                scripts=get_scripts_list(),
-                               selected_script=None)
-        
-        valid_files = []
-        for file in files:
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                input_path = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(input_path)
-                valid_files.append(input_path)
-                logger.info(f"Archivo guardado: {input_path}")
+                               selected_scripts=None)
         
-        if not valid_files:
+        available = set(get_scripts_list()) | {AUTO_SCRIPT}
+        unknown = sorted({name for names in [script_names, *file_scripts.values()] for name in names} - available)
+        if unknown:
             return render_template('index.html', 
-                               error="Ningún archivo permitido",
+                               error=f"Script no disponible: {', '.join(unknown)}",
                                scripts=get_scripts_list(),
-                               selected_script=None)
+                               selected_scripts=None)
         
+        # Cada job recibe sus archivos en su propia carpeta: dos jobs con archivos del mismo
+        # nombre no se pisan ni se borran la entrada entre sí
+        job_folder = tempfile.mkdtemp(prefix='job_', dir=UPLOAD_FOLDER)
         try:
-            output_files = execute_script(script_name, valid_files)
-            
-            if not output_files:
-                return render_template('index.html', 
-                                     error="No se procesaron archivos correctamente",
-                                     scripts=get_scripts_list(),
-                                     selected_script=script_name)
+            valid_files = []
+            for file in files:
+                if file and allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
+                    input_path = os.path.join(job_folder, filename)
+                    file.save(input_path)
+                    valid_files.append(input_path)
+                    logger.info(f"Archivo guardado: {input_path}")
             
-            # Crear ZIP
-            zip_filename = f"resultados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-            zip_path = os.path.join(DOWNLOAD_FOLDER, zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for file in output_files:
-                    zipf.write(file, os.path.basename(file))
+            uploads = []
+            for upload_id in upload_ids:
+                try:
+                    status = chunked_uploads.status(upload_id)
+                    if allowed_file(status['filename']):
+                        uploads.append(status)
+                except UploadError as e:
+                    logger.warning(f"Carga {upload_id} descartada: {str(e)}")
             
-            return render_template('index.html', 
-                                 success=f"Se procesaron {len(output_files)} archivos!",
-                                 download_file=zip_filename,
-                                 scripts=get_scripts_list(),
-                                 selected_script=script_name)
-                
-        except Exception as e:
-            logger.error(f"Error al procesar: {str(e)}", exc_info=True)
-            return render_template('index.html', 
-                                error=f"Error al procesar: {str(e)}",
-                                scripts=get_scripts_list(),
-                                selected_script=script_name)
+            # Admisión por costo: se decide antes de reclamar las cargas fragmentadas, así con
+            # un 429 el cliente puede reenviar los mismos upload_ids sin volver a subirlos
+            cost = estimate_cost(
+                [(os.path.getsize(path), file_scripts.get(os.path.basename(path), script_names))
+                 for path in valid_files] +
+                [(status['size'], file_scripts.get(secure_filename(status['filename']), script_names))
+                 for status in uploads],
+                app.config['SCRIPT_SECONDS_PER_MB'],
+            )
+            try:
+                wait = app.config['QUEUE_WAIT_SECONDS'] if request.environ.get('wsgi.multithread') else 0
+                with admission.admit(request_user(), cost, wait):
+                    return process_job(job_folder, valid_files, uploads, script_names, file_scripts, summaries)
+            except AdmissionError as e:
+                logger.warning(f"Job rechazado para {request_user()} (costo estimado {cost:.1f}s): {str(e)}")
+                response = app.make_response((render_template('index.html', 
+                                   error=f"{str(e)}: el servidor está ocupado, reintenta en {e.retry_after} segundos",
+                                   scripts=get_scripts_list(),
+                                   selected_scripts=script_names), e.status))
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
         finally:
-            # Limpieza
-            for file in valid_files:
-                if os.path.exists(file):
-                    os.remove(file)
-            if 'output_files' in locals():
-                for file in output_files:
-                    if os.path.exists(file):
-                        os.remove(file)
+            # Limpieza de la entrada del job (formulario y cargas ensambladas)
+            shutil.rmtree(job_folder, ignore_errors=True)
     else:
         return render_template('index.html', 
                             scripts=get_scripts_list(),
-                            selected_script=None)
+                            selected_scripts=None)
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    file_path = os.path.join(DOWNLOAD_FOLDER, filename)
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Inicia una carga fragmentada: recibe {filename, size} y devuelve el upload_id"""
+    from chunked_uploads import UploadError
     
-    if not os.path.exists(file_path):
-        logger.warning(f"Archivo no encontrado: {filename}")
-        return "Archivo no encontrado", 404
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename', ''))
+    try:
+        size = int(data.get('size', -1))
+    except (TypeError, ValueError):
+        size = -1
     
+    if not allowed_file(filename):
+        return jsonify(error="Tipo de archivo no permitido"), 400
+    
+    try:
+        return jsonify(chunked_uploads.create(filename, size)), 201
+    except UploadError as e:
+        return jsonify(error=str(e)), e.status
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    """GET devuelve el desplazamiento actual (para reanudar); PUT anexa un fragmento"""
+    from chunked_uploads import UploadError
+    
+    try:
+        if request.method == 'GET':
+            return jsonify(chunked_uploads.status(upload_id))
+        
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify(error="Falta el encabezado Upload-Offset"), 400
+        return jsonify(chunked_uploads.append(upload_id, offset, request.stream))
+    except UploadError as e:
+        return jsonify(error=str(e), offset=e.offset), e.status
+
+@app.route('/download/<job_id>/<filename>')
+def download_file(job_id, filename):
+    """Descarga el resultado de un job; se puede repetir (o reanudar con Range) hasta que venza"""
+    job = results.get(job_id, filename)
+    
+    if not job:
+        logger.warning(f"Resultado no encontrado o vencido: {job_id}/{filename}")
+        return "Archivo no encontrado o vencido", 404
+    
+    # conditional=True responde Range/If-Range con 206 y ETag/Last-Modified con 304
     response = send_file(
-        file_path,
+        job['path'],
         as_attachment=True,
         download_name=filename,
-        mimetype='application/zip' if filename.endswith('.zip') else 'text/csv'
+        mimetype='application/zip' if filename.endswith('.zip') else 'text/csv',
+        conditional=True,
+        max_age=0
     )
+    # Anunciar la reanudación también en la respuesta completa (werkzeug solo lo hace en las 206)
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+def progress_event(job_id, seq):
+    """Evento SSE con el estado de un job si es más nuevo que ``seq``: (seq, texto, terminado) o None"""
+    state = progress_store.read(job_id)
+    if not state or state['seq'] <= seq:
+        return None
+    event = 'done' if state['terminado'] else 'progress'
+    return state['seq'], f"id: {state['seq']}\nevent: {event}\ndata: {json.dumps(state)}\n\n", state['terminado']
+
+@app.route('/progress/<job_id>')
+def progress_stream(job_id):
+    """Server-Sent Events con el avance de un job (eventos 'progress' y un 'done' final)
     
-    @response.call_on_close
-    def remove_file():
-        try:
-            os.remove(file_path)
-            logger.info(f"Archivo eliminado después de descarga: {filename}")
-        except Exception as e:
-            logger.error(f"Error eliminando archivo: {str(e)}")
+    Solo lee el estado que publica el worker que procesa el job, así que no hay hilos por
+    escucha. Tras PROGRESS_STREAM_SECONDS cierra; el navegador reconecta con Last-Event-ID
+    y recibe solo estados más nuevos que el último que vio.
+    """
+    from progress import PUBLISH_INTERVAL_SECONDS
+    
+    if not progress_store.valid_id(job_id):
+        return "Job inválido", 404
+    try:
+        last_seq = int(request.headers.get('Last-Event-ID') or request.args.get('since') or 0)
+    except ValueError:
+        last_seq = 0
+    window = app.config['PROGRESS_STREAM_SECONDS']
+    retry = app.config['PROGRESS_RETRY_MS']
     
+    def events():
+        seq = last_seq
+        deadline = time.monotonic() + window
+        yield f"retry: {retry}\n\n"
+        while True:
+            event = progress_event(job_id, seq)
+            if event:
+                seq, text, finished = event
+                yield text
+                if finished:
+                    return
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(PUBLISH_INTERVAL_SECONDS)
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Sin búfer en nginx
     return response
 
+@app.before_request
+def start_background_tasks():
+    """Inicializa la app y arranca el barredor de resultados en cada proceso que atiende peticiones"""
+    init_app()
+    results.start_sweeper()
+
 def cleanup():
-    """Limpieza programada de archivos temporales"""
+    """Elimina archivos huérfanos de las carpetas de trabajo (los que quedaron de un proceso interrumpido)"""
+    limit = time.time() - app.config['STALE_FILE_SECONDS']
     try:
         for folder in [UPLOAD_FOLDER, DOWNLOAD_FOLDER]:
             for filename in os.listdir(folder):
                 file_path = os.path.join(folder, filename)
                 try:
-                    if os.path.isfile(file_path):
+                    if os.path.getmtime(file_path) >= limit:
+                        continue
+                    if os.path.isdir(file_path):
+                        # Carpeta de un job (o temporal del motor) de un proceso interrumpido
+                        shutil.rmtree(file_path, ignore_errors=True)
+                    else:
                         os.unlink(file_path)
+                    logger.info(f"Archivo huérfano eliminado: {file_path}")
                 except Exception as e:
                     logger.error(f"Error eliminando {file_path}: {str(e)}")
     except Exception as e:
         logger.error(f"Error en cleanup: {str(e)}")
 
-atexit.register(cleanup)
-
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
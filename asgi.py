@@ -0,0 +1,62 @@
+"""Modo de servicio asíncrono (ASGI) de la aplicación.
+
+Con gunicorn síncrono, un cliente lento que sube o descarga un archivo
+ocupa un worker durante toda la transferencia aunque la CPU esté ociosa.
+Aquí la red la atiende el event loop del servidor ASGI y la app Flask corre
+sin cambios en un pool de hilos (a2wsgi): el cuerpo de la petición llega al
+hilo a medida que se lee, sin juntarlo antes en memoria, y la respuesta se
+envía por bloques con control de flujo. La limpieza en sí sigue en los
+procesos del pool de scripts.
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port 10000
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker    (con gunicorn.conf.py)
+
+Cada proceso atiende varios jobs a la vez (y espera en la cola de admisión
+en lugar de responder 429 enseguida), así que conviene fijar ADMISSION_SLOTS
+y SCRIPT_POOL_SIZE según los jobs simultáneos deseados. Cada escucha de
+/progress ocupa un hilo mientras dura su ventana (PROGRESS_STREAM_SECONDS).
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.wsgi import FileWrapper
+
+import app as flask_app
+
+# Hilos que ejecutan las peticiones de Flask (por proceso); la mayoría espera al pool de scripts
+REQUEST_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# Bloque de lectura de los archivos que se descargan (cada bloque es un mensaje ASGI)
+FILE_BLOCK = 1024 * 1024
+
+
+def large_blocks(wsgi_app):
+    """``wsgi.file_wrapper`` con bloques de FILE_BLOCK para las descargas con send_file"""
+    def wrapped(environ, start_response):
+        environ['wsgi.file_wrapper'] = lambda file, buffer_size=FILE_BLOCK: FileWrapper(file, max(buffer_size, FILE_BLOCK))
+        return wsgi_app(environ, start_response)
+    return wrapped
+
+
+class Lifespan:
+    """Atiende el ciclo de vida ASGI: al apagar detiene los procesos ociosos del pool de scripts"""
+
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            await self.asgi_app(scope, receive, send)
+            return
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if flask_app.script_pool:
+                    flask_app.script_pool.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = Lifespan(WSGIMiddleware(large_blocks(flask_app.app), workers=REQUEST_THREADS))
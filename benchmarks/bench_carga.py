@@ -0,0 +1,344 @@
+"""Prueba de carga de la subida (POST /) y la descarga (/download/<archivo>).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_carga.py [--concurrencia 4] [--peticiones 40]
+                                     [--workers 2] [--filas 5000]
+                                     [--archivos 1] [--script limpieza_datos_RQ]
+                                     [--url http://host:puerto] [--json]
+
+Sin --url levanta un gunicorn local (con gunicorn.conf.py, igual que en
+producción) en un puerto libre y lo detiene al terminar; con --url usa un
+servidor ya en marcha y no mide memoria. Cada petición sube un lote de CSV
+sintéticos, descarga el ZIP de resultados y verifica que sea un ZIP. Se
+reportan percentiles de latencia de cada fase, throughput, errores por tipo
+(los 429 del control de admisión aparte) y memoria de los workers y del pool de
+scripts (RSS y PSS, leídos de /proc; PSS reparte las páginas compartidas por
+copy-on-write con el maestro).
+
+El gunicorn local se levanta con WEB_CONCURRENCY igual a --workers, para que
+la admisión reparta un lugar por worker, y con USER_HEADER: cada petición se
+identifica como un usuario distinto, así los límites por usuario no rechazan
+a los clientes simultáneos (todos llegan desde 127.0.0.1).
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATRON_DESCARGA = re.compile(r'href="(/download/[^"]+)"')
+PATRON_ERROR = re.compile(r'<div class="message error">\s*(.*?)\s*</div>', re.S)
+
+# Cada cuánto se muestrea la memoria de los workers
+INTERVALO_MEMORIA = 0.5
+# Encabezado con el que cada petición se identifica ante el control de admisión
+ENCABEZADO_USUARIO = 'X-Bench-Cliente'
+
+
+def csv_rq(filas, semilla):
+    azar = random.Random(semilla)
+    lineas = ["r0,r1,r2,r3,r4,r5,r6,r7,r8,r9,r10,r11"]
+    for _ in range(filas):
+        lineas.append(
+            f'"{azar.randint(0, 9)},{azar.randint(0, 99)}",{azar.randint(1, 5)},'
+            f'{azar.randint(1, 28)}/04/2025,"{azar.randint(0, 9)},75",08:{azar.randint(10, 59)}:30,'
+            f'a,b,c,d,e,"7,{azar.randint(0, 9)}",x'
+        )
+    return ('\n'.join(lineas) + '\n').encode()
+
+
+def csv_conexiones(filas, semilla):
+    azar = random.Random(semilla)
+    lineas = ["inicio,fin,email,estado,intervalo,duracion,bpo,servicio,lob,id_lob,fecha"]
+    for _ in range(filas):
+        dia = azar.randint(1, 28)
+        lineas.append(
+            f'2025-04-{dia:02d} 08:00:00,2025-04-{dia:02d} 09:30:00,agente{azar.randint(0, 300)}@bpo.com,'
+            f'{azar.choice(["Online", "Break", "Offline"])},2025-04-{dia:02d} 08:00:00,'
+            f'{azar.random() * 2:.3f},BPO{azar.randint(1, 3)},Servicio,'
+            f'{azar.choice(["CS Fraude", "RS Overnight", "PS Phone"])},{azar.randint(1, 9)},'
+            f"'{dia} abr 2025"
+        )
+    return ('\n'.join(lineas) + '\n').encode()
+
+
+# Generadores de lotes sintéticos por script
+GENERADORES = {
+    'limpieza_datos_RQ': csv_rq,
+    'limpieza_datos_conexiones': csv_conexiones,
+}
+
+
+def multipart(campos, archivos):
+    """Codifica un formulario multipart/form-data; devuelve (cuerpo, content-type)"""
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    for nombre, archivo, contenido in archivos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{archivo}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'.encode()
+        )
+        partes.append(contenido)
+        partes.append(b'\r\n')
+    partes.append(f'--{limite}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_gunicorn(workers, puerto, registro):
+    # Las variables ya definidas en el entorno (ADMISSION_SLOTS, MAX_*_PER_USER...) se respetan
+    entorno = {'WEB_CONCURRENCY': str(workers), 'USER_HEADER': ENCABEZADO_USUARIO, **os.environ}
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app',
+         '--bind', f'127.0.0.1:{puerto}', '--workers', str(workers), '--timeout', '300'],
+        cwd=BASE_DIR, stdout=registro, stderr=registro, env=entorno,
+    )
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al iniciar (código {proceso.returncode})")
+        try:
+            urllib.request.urlopen(url + '/', timeout=2).read()
+            return proceso, url
+        except (urllib.error.URLError, ConnectionError, http.client.HTTPException):
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("gunicorn no respondió en 60 s")
+
+
+def descendientes(pid):
+    """PIDs de todos los procesos que cuelgan de pid: workers de gunicorn, forkserver y pool de scripts"""
+    hijos = collections.defaultdict(list)
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                campos = f.read().rsplit(')', 1)[1].split()
+            hijos[int(campos[1])].append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+    encontrados = []
+    pendientes = list(hijos[pid])
+    while pendientes:
+        actual = pendientes.pop()
+        encontrados.append(actual)
+        pendientes.extend(hijos[actual])
+    return encontrados
+
+
+def memoria(pid):
+    """(RSS, PSS) en bytes de un proceso; PSS es None si el kernel no expone smaps_rollup"""
+    rss = pss = None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    rss = int(linea.split()[1]) * 1024
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for linea in f:
+                if linea.startswith('Pss:'):
+                    pss = int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+class MonitorMemoria(threading.Thread):
+    """Muestrea periódicamente la memoria de los descendientes del maestro y guarda el máximo de cada uno"""
+
+    def __init__(self, maestro):
+        super().__init__(daemon=True)
+        self.maestro = maestro
+        self.maximos = {}
+        self.detener = threading.Event()
+
+    def run(self):
+        while not self.detener.wait(INTERVALO_MEMORIA):
+            for pid in descendientes(self.maestro):
+                rss, pss = memoria(pid)
+                if rss is None:
+                    continue
+                anterior = self.maximos.get(pid, (0, 0))
+                self.maximos[pid] = (max(anterior[0], rss), max(anterior[1], pss or 0))
+
+
+def ejecutar_peticion(url, script, lote, numero):
+    """Sube un lote y descarga el resultado; devuelve un dict con tiempos y error"""
+    resultado = {'subida': None, 'descarga': None, 'error': None, 'bytes': 0}
+    archivos = [('files[]', f'carga_{numero}_{i}.csv', contenido) for i, contenido in enumerate(lote)]
+    cuerpo, tipo = multipart([('script_name', script)], archivos)
+    resultado['bytes'] = len(cuerpo)
+
+    inicio = time.perf_counter()
+    try:
+        peticion = urllib.request.Request(url + '/', data=cuerpo, headers={
+            'Content-Type': tipo, ENCABEZADO_USUARIO: f'cliente-{numero}'})
+        with urllib.request.urlopen(peticion, timeout=600) as respuesta:
+            html = respuesta.read().decode('utf-8', 'replace')
+    except urllib.error.HTTPError as e:
+        # Rechazo del control de admisión: no es una falla del procesamiento
+        resultado['error'] = 'rechazada por admisión (429)' if e.code == 429 else f'subida HTTP {e.code}'
+        return resultado
+    except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+        resultado['error'] = f'subida {type(e).__name__}'
+        return resultado
+    resultado['subida'] = time.perf_counter() - inicio
+
+    enlace = PATRON_DESCARGA.search(html)
+    if not enlace:
+        mensaje = PATRON_ERROR.search(html)
+        resultado['error'] = f"sin descarga: {mensaje.group(1) if mensaje else 'respuesta inesperada'}"
+        return resultado
+
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url + enlace.group(1), timeout=600) as respuesta:
+            contenido = respuesta.read()
+    except urllib.error.HTTPError as e:
+        resultado['error'] = f'descarga HTTP {e.code}'
+        return resultado
+    except (urllib.error.URLError, OSError, http.client.HTTPException) as e:
+        resultado['error'] = f'descarga {type(e).__name__}'
+        return resultado
+    resultado['descarga'] = time.perf_counter() - inicio
+
+    if not contenido.startswith(b'PK'):
+        resultado['error'] = 'descarga no es un ZIP'
+    return resultado
+
+
+def percentiles(valores):
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(round(q / 100 * (len(ordenados) - 1))))]
+    return {
+        'p50': p(50), 'p90': p(90), 'p95': p(95), 'p99': p(99),
+        'max': ordenados[-1], 'media': statistics.mean(ordenados),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrencia', type=int, default=4, help="clientes simultáneos")
+    parser.add_argument('--peticiones', type=int, default=40, help="total de subidas")
+    parser.add_argument('--workers', type=int, default=2, help="workers de gunicorn (sin --url)")
+    parser.add_argument('--filas', type=int, default=5000, help="filas por CSV sintético")
+    parser.add_argument('--archivos', type=int, default=1, help="CSV por subida")
+    parser.add_argument('--script', default='limpieza_datos_RQ', choices=sorted(GENERADORES))
+    parser.add_argument('--url', help="servidor ya en marcha (no se levanta gunicorn)")
+    parser.add_argument('--json', action='store_true', help="imprimir el resumen como JSON")
+    args = parser.parse_args()
+
+    # Lotes generados de antemano para no medir la generación
+    generador = GENERADORES[args.script]
+    lotes = [[generador(args.filas, n * args.archivos + i) for i in range(args.archivos)]
+             for n in range(min(args.peticiones, 8))]
+
+    proceso = monitor = None
+    registro = open(os.devnull, 'w')
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+        else:
+            proceso, url = iniciar_gunicorn(args.workers, puerto_libre(), registro)
+            monitor = MonitorMemoria(proceso.pid)
+            monitor.start()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            resultados = list(pool.map(
+                lambda n: ejecutar_peticion(url, args.script, lotes[n % len(lotes)], n),
+                range(args.peticiones),
+            ))
+        duracion = time.perf_counter() - inicio
+    finally:
+        if monitor:
+            monitor.detener.set()
+            monitor.join()
+        if proceso:
+            proceso.send_signal(signal.SIGTERM)
+            proceso.wait(timeout=30)
+        registro.close()
+
+    exitosas = [r for r in resultados if not r['error']]
+    errores = collections.Counter(r['error'] for r in resultados if r['error'])
+    rechazadas = errores.pop('rechazada por admisión (429)', 0)
+    resumen = {
+        'peticiones': args.peticiones,
+        'concurrencia': args.concurrencia,
+        'workers': None if args.url else args.workers,
+        'filas_por_archivo': args.filas,
+        'archivos_por_peticion': args.archivos,
+        'duracion_s': duracion,
+        'peticiones_por_s': len(exitosas) / duracion,
+        'mb_subidos_por_s': sum(r['bytes'] for r in exitosas) / duracion / 1e6,
+        'tasa_error': sum(errores.values()) / args.peticiones,
+        'tasa_rechazo_429': rechazadas / args.peticiones,
+        'errores': dict(errores),
+        'subida_s': percentiles([r['subida'] for r in resultados if r['subida'] is not None]),
+        'descarga_s': percentiles([r['descarga'] for r in resultados if r['descarga'] is not None]),
+        'total_s': percentiles([r['subida'] + r['descarga'] for r in exitosas]),
+    }
+    if monitor and monitor.maximos:
+        resumen['memoria_workers_mb'] = {
+            'rss_max': max(rss for rss, _ in monitor.maximos.values()) / 1e6,
+            'pss_max': max(pss for _, pss in monitor.maximos.values()) / 1e6,
+            'pss_total': sum(pss for _, pss in monitor.maximos.values()) / 1e6,
+            'procesos_observados': len(monitor.maximos),
+        }
+
+    if args.json:
+        print(json.dumps(resumen, indent=2))
+        return
+
+    print(f"{args.peticiones} peticiones, concurrencia {args.concurrencia}, "
+          f"{args.archivos} x {args.filas} filas ({args.script})")
+    print(f"duración {duracion:.1f} s   {resumen['peticiones_por_s']:.2f} pet/s   "
+          f"{resumen['mb_subidos_por_s']:.2f} MB/s subidos   errores {resumen['tasa_error']:.1%}   "
+          f"rechazos 429 {resumen['tasa_rechazo_429']:.1%}")
+    for fase in ('subida_s', 'descarga_s', 'total_s'):
+        valores = resumen[fase]
+        if valores:
+            print(f"{fase[:-2]:<10} " + "   ".join(
+                f"{clave} {valor * 1000:8.1f} ms" for clave, valor in valores.items()))
+    if rechazadas:
+        print(f"  {rechazadas:4d} x rechazada por admisión (429)")
+    for error, cantidad in errores.most_common():
+        print(f"  {cantidad:4d} x {error}")
+    if 'memoria_workers_mb' in resumen:
+        m = resumen['memoria_workers_mb']
+        print(f"memoria workers y pool: RSS máx {m['rss_max']:.0f} MB   PSS máx {m['pss_max']:.0f} MB   "
+              f"PSS total {m['pss_total']:.0f} MB ({m['procesos_observados']} procesos)")
+
+
+if __name__ == '__main__':
+    main()
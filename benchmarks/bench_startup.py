@@ -0,0 +1,82 @@
+"""Mide el tiempo de arranque en frío y con precarga de los scripts.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_startup.py [--repeticiones 5]
+
+Cada medición corre en un proceso nuevo para que nada quede en sys.modules:
+- import_app:    importar app.py (lo que pagan la CLI y las herramientas)
+- primera_peticion_fria: inicializar la app (init_app) y ejecutar un script por primera vez
+- warm_scripts:  precarga completa que hace el maestro de gunicorn
+- primera_peticion_precargada: ejecutar un script después de warm_scripts()
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICION = r'''
+import json, os, shutil, sys, tempfile, time, contextlib, io
+sys.path.insert(0, {base!r})
+inicio = time.perf_counter()
+import app
+tiempos = {{"import_app": time.perf_counter() - inicio}}
+if {precargar!r}:
+    inicio = time.perf_counter()
+    import motor
+    motor.warm_scripts()
+    tiempos["warm_scripts"] = time.perf_counter() - inicio
+
+carpeta = tempfile.mkdtemp()
+ruta = os.path.join(carpeta, "bench.csv")
+with open(ruta, "w") as f:
+    f.write("r0,r1,r2,r3,r4,r5,r6,r7,r8,r9,r10,r11\n")
+    for i in range(1000):
+        f.write(f'"1,5",2,01/04/2025,"4,75",08:15:30,a,b,c,d,e,"7,1",x\n')
+
+inicio = time.perf_counter()
+app.init_app()
+with contextlib.redirect_stdout(io.StringIO()):
+    salidas = app.execute_script("limpieza_datos_RQ", [ruta])
+tiempos["primera_ejecucion"] = time.perf_counter() - inicio
+for salida in salidas + app.get_quality_reports(salidas):
+    os.remove(salida)
+shutil.rmtree(carpeta)
+print(json.dumps(tiempos))
+'''
+
+
+def medir(precargar):
+    codigo = MEDICION.format(base=BASE_DIR, precargar=precargar)
+    resultado = subprocess.run(
+        [sys.executable, '-c', codigo],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def resumir(nombre, valores):
+    valores_ms = [v * 1000 for v in valores]
+    print(f"{nombre:<32} mediana {statistics.median(valores_ms):8.1f} ms   "
+          f"min {min(valores_ms):8.1f} ms   max {max(valores_ms):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    frios = [medir(False) for _ in range(args.repeticiones)]
+    precargados = [medir(True) for _ in range(args.repeticiones)]
+
+    resumir('import_app', [m['import_app'] for m in frios])
+    resumir('primera_peticion_fria', [m['primera_ejecucion'] for m in frios])
+    resumir('warm_scripts (maestro)', [m['warm_scripts'] for m in precargados])
+    resumir('primera_peticion_precargada', [m['primera_ejecucion'] for m in precargados])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+
+# Tamaño de fragmento sugerido al cliente (cada PUT queda muy por debajo de MAX_CONTENT_LENGTH)
+CHUNK_SIZE = 8 * 1024 * 1024
+# Bloque de copia desde el stream de la petición al disco
+COPY_BLOCK = 1024 * 1024
+# Horas que se conserva una carga incompleta antes de eliminarla
+UPLOAD_TTL_SECONDS = 24 * 3600
+
+
+class UploadError(Exception):
+    """Error de protocolo en una carga fragmentada (se traduce a un código HTTP)"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploadStore:
+    """Ensambla en disco archivos subidos por fragmentos, con reanudación.
+
+    Cada carga vive en ``<root>/<upload_id>/`` con un ``meta.json`` y un
+    ``data.part`` que crece por anexado. El desplazamiento actual es el tamaño
+    de ``data.part``, así que tras una conexión caída el cliente consulta el
+    estado y continúa desde ese byte. Todo el estado está en disco para que
+    funcione con varios workers de gunicorn.
+    """
+
+    def __init__(self, root, max_size, ttl=UPLOAD_TTL_SECONDS):
+        self.root = root
+        self.max_size = max_size
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        # Los IDs son uuid4 en hex; cualquier otra cosa se rechaza antes de tocar el disco
+        if not upload_id or len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError("Identificador de carga inválido", status=404)
+        return os.path.join(self.root, upload_id)
+
+    def _meta(self, upload_id):
+        try:
+            with open(os.path.join(self._dir(upload_id), 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("La carga no existe o expiró", status=404)
+
+    def create(self, filename, size):
+        """Registra una nueva carga y devuelve su estado inicial"""
+        if size < 0 or size > self.max_size:
+            raise UploadError(f"Tamaño no permitido: {size} bytes (máximo {self.max_size})", status=413)
+        self.purge_expired()
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = self._dir(upload_id)
+        os.makedirs(upload_dir)
+        meta = {'filename': filename, 'size': size, 'created': time.time()}
+        with open(os.path.join(upload_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        open(os.path.join(upload_dir, 'data.part'), 'wb').close()
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        meta = self._meta(upload_id)
+        offset = os.path.getsize(os.path.join(self._dir(upload_id), 'data.part'))
+        return {
+            'upload_id': upload_id,
+            'filename': meta['filename'],
+            'size': meta['size'],
+            'offset': offset,
+            'complete': offset == meta['size'],
+            'chunk_size': CHUNK_SIZE,
+        }
+
+    def append(self, upload_id, offset, stream):
+        """Anexa el cuerpo de la petición en ``offset``.
+
+        Si el desplazamiento no coincide con lo que ya hay en disco se responde
+        409 con el desplazamiento real, para que el cliente se resincronice.
+        """
+        meta = self._meta(upload_id)
+        part_path = os.path.join(self._dir(upload_id), 'data.part')
+
+        with open(part_path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                current = f.seek(0, os.SEEK_END)
+                if offset != current:
+                    raise UploadError("Desplazamiento fuera de secuencia", status=409, offset=current)
+                while True:
+                    block = stream.read(COPY_BLOCK)
+                    if not block:
+                        break
+                    if current + len(block) > meta['size']:
+                        raise UploadError("El fragmento excede el tamaño declarado", status=413, offset=current)
+                    f.write(block)
+                    current += len(block)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        return self.status(upload_id)
+
+    def claim(self, upload_id, destination_folder, filename):
+        """Mueve una carga completa a la carpeta de entrada y devuelve su ruta final"""
+        status = self.status(upload_id)
+        if not status['complete']:
+            raise UploadError(f"La carga {status['filename']} está incompleta", status=409, offset=status['offset'])
+
+        destination = os.path.join(destination_folder, filename)
+        os.replace(os.path.join(self._dir(upload_id), 'data.part'), destination)
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        return destination
+
+    def purge_expired(self):
+        """Elimina cargas abandonadas más antiguas que el TTL"""
+        limit = time.time() - self.ttl
+        for upload_id in os.listdir(self.root):
+            upload_dir = os.path.join(self.root, upload_id)
+            try:
+                if os.path.getmtime(upload_dir) < limit and os.path.getmtime(os.path.join(upload_dir, 'data.part')) < limit:
+                    shutil.rmtree(upload_dir, ignore_errors=True)
+            except OSError:
+                continue
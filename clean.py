@@ -0,0 +1,204 @@
+"""Ejecuta los scripts de limpieza por lotes desde la línea de comandos.
+
+Usa el mismo motor por archivo que la aplicación web (motor.process_file).
+
+Ejemplos:
+    python clean.py --script conexiones in/ out/
+    python clean.py --script programadas --jobs 8 --format parquet "in/*.csv.gz" out/
+    python clean.py --script auto in/ out/     (detecta el script de cada archivo)
+    python clean.py --script conexiones --summaries in/ out/     (más tablas de resumen)
+
+Con --format parquet los scripts que lo admiten (FORMATO) escriben el
+Parquet directamente desde su DataFrame, con sus tipos; la salida de los que
+escriben el CSV fila a fila (metrics) se convierte después, como texto. Las
+tablas de resumen quedan siempre en CSV: son chicas y se abren a mano.
+
+Los archivos cuya salida ya existe en la carpeta destino se omiten, así que
+un lote interrumpido se reanuda volviendo a lanzar el mismo comando
+(--force los reprocesa). El código de salida es 1 si algún archivo falló.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import motor
+from comun.calidad import ruta_reporte
+from comun.entrada import entradas_de_archivo, es_entrada_valida
+
+logger = logging.getLogger('clean')
+
+FORMATS = ('csv', 'parquet')
+AUTO_SCRIPT = 'auto'
+
+
+def resolve_script(name):
+    """Acepta el nombre completo del script o un alias corto (conexiones, rq, metrics...)"""
+    scripts = motor.get_scripts_list()
+    if name in scripts or name == AUTO_SCRIPT:
+        return name
+    lowered = name.lower()
+    for script in scripts:
+        if script.lower() == f"limpieza_datos_{lowered}":
+            return script
+    matches = [script for script in scripts if lowered in script.lower()]
+    if len(matches) == 1:
+        return matches[0]
+    raise ValueError(f"Script desconocido o ambiguo: {name}. Disponibles: {', '.join(sorted(scripts))}")
+
+
+def expand_inputs(patterns):
+    """Expande carpetas y patrones glob a la lista ordenada de archivos de entrada"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True) or [pattern]
+        files.extend(path for path in candidates if os.path.isfile(path) and es_entrada_valida(path))
+    return sorted(set(files))
+
+
+def output_name(nombre, fmt):
+    base = f"limpio_{nombre}"
+    return base if fmt == 'csv' else f"{os.path.splitext(base)[0]}.{fmt}"
+
+
+def is_done(input_path, output_folder, fmt):
+    """Un archivo está completo si todas sus salidas existen (se escriben de forma atómica).
+
+    Un ZIP sin ningún CSV nunca cuenta como completo: se procesa y su error queda reportado.
+    """
+    nombres = [entrada.nombre for entrada in entradas_de_archivo(input_path)]
+    return bool(nombres) and all(
+        os.path.exists(os.path.join(output_folder, output_name(nombre, fmt))) for nombre in nombres
+    )
+
+
+def to_parquet(csv_path):
+    """Convierte una salida CSV a Parquet (requiere pyarrow) conservando los valores como texto.
+
+    Solo para los scripts que escriben el CSV fila a fila sin tipos (no
+    declaran FORMATO); sus tablas de resumen siguen en CSV.
+    """
+    import pandas as pd
+
+    parquet_path = f"{os.path.splitext(csv_path)[0]}.parquet"
+    temporary = f"{parquet_path}.tmp"
+    df = pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig')
+    df.to_parquet(temporary, index=False)
+    os.replace(temporary, parquet_path)
+    os.remove(csv_path)
+    if os.path.exists(ruta_reporte(csv_path)):
+        os.replace(ruta_reporte(csv_path), ruta_reporte(parquet_path))
+    return parquet_path
+
+
+def run_one(script_name, input_path, output_folder, fmt, settings, verbose):
+    """Procesa un archivo (se ejecuta en un proceso del pool). Devuelve (salidas, log del script)"""
+    captured = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if verbose else captured):
+            outputs = motor.process_file(script_name, input_path, output_folder, settings=settings)
+    except Exception as e:
+        # Adjuntar los errores que imprimió el script: ahí suele estar la causa real
+        lines = captured.getvalue().strip().splitlines()
+        errors = [line for line in lines if line.lstrip().startswith('❌') or 'Error' in line]
+        tail = '\n'.join((errors or lines)[-3:])
+        raise RuntimeError(f"{e}\n{tail}" if tail else str(e)) from None
+    if not outputs:
+        raise RuntimeError("El archivo no contiene ningún CSV")
+    if fmt == 'parquet':
+        outputs = [path if path.endswith('.parquet') else to_parquet(path) for path in outputs]
+    return outputs, captured.getvalue()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='clean',
+        description="Limpieza por lotes con los scripts de static/scripts",
+        epilog="Los patrones glob deben ir entre comillas para que los expanda clean y no el shell.",
+    )
+    parser.add_argument('inputs', nargs='+', help="Archivos, carpetas o patrones glob de entrada")
+    parser.add_argument('output', help="Carpeta de salida")
+    parser.add_argument('--script', required=True, help="Script a ejecutar (nombre o alias: conexiones, topes, programadas, rq, metrics; 'auto' para detectarlo por archivo)")
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="Archivos procesados en paralelo (procesos)")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="Formato de salida")
+    parser.add_argument('--force', action='store_true', help="Reprocesar archivos que ya tienen salida")
+    parser.add_argument('--sink-database', help="Base SQLite donde cargar también los datos limpios")
+    parser.add_argument('--summaries', action='store_true', help="Escribir también las tablas de resumen (<salida>_resumen_*.csv, en CSV con cualquier --format)")
+    parser.add_argument('--verbose', '-v', action='store_true', help="Mostrar la salida de los scripts")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)s %(message)s')
+
+    try:
+        script_name = resolve_script(args.script)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ --format parquet requiere el paquete 'pyarrow'", file=sys.stderr)
+            return 2
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("❌ No se encontraron archivos de entrada", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output, exist_ok=True)
+    pending = [path for path in inputs if args.force or not is_done(path, args.output, args.format)]
+    skipped = len(inputs) - len(pending)
+    print(f"🚀 {script_name}: {len(pending)} archivos por procesar, {skipped} ya completos")
+
+    failures = 0
+    jobs = []
+    for path in pending:
+        if script_name != AUTO_SCRIPT:
+            jobs.append((script_name, path))
+            continue
+        detected, _ = motor.detect_script(path)
+        if detected:
+            print(f"🔍 {os.path.basename(path)} -> {detected}")
+            jobs.append((detected, path))
+        else:
+            failures += 1
+            print(f"❌ {os.path.basename(path)}: no se reconoció el tipo de reporte", file=sys.stderr)
+
+    settings = {'SINK_DATABASE': args.sink_database} if args.sink_database else {}
+    if args.format != 'csv':
+        settings['FORMATO'] = args.format
+    if args.summaries:
+        settings['RESUMEN'] = True
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(run_one, job_script, path, args.output, args.format, settings, args.verbose): path
+            for job_script, path in jobs
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                outputs, _ = future.result()
+                print(f"✅ {os.path.basename(path)} -> {', '.join(os.path.basename(o) for o in outputs)}")
+            except Exception as e:
+                failures += 1
+                print(f"❌ {os.path.basename(path)}: {e}", file=sys.stderr)
+
+    print(f"Completados: {len(pending) - failures}, fallidos: {failures}, omitidos: {skipped}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
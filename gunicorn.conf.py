@@ -0,0 +1,22 @@
+# Configuración de gunicorn (se carga automáticamente al ejecutar "gunicorn app:app"
+# desde la raíz del proyecto). También vale para el modo asíncrono:
+# "gunicorn asgi:app -k uvicorn.workers.UvicornWorker" (ver asgi.py).
+import os
+
+# Importar la app una sola vez en el proceso maestro y compartirla con los
+# workers por copy-on-write. Desactivar con PRELOAD_SCRIPTS=0 (ej. en desarrollo).
+preload_app = os.environ.get('PRELOAD_SCRIPTS', '1') != '0'
+
+
+def when_ready(server):
+    """Precarga los scripts de limpieza en el maestro, antes de crear los workers.
+
+    Con el pool de scripts (SCRIPT_POOL_SIZE > 0) los scripts corren en los
+    procesos del forkserver, que los precarga por su cuenta (script_warmup):
+    cargarlos también aquí solo sumaría memoria a cada worker web.
+    """
+    if preload_app:
+        from app import app
+        if app.config['SCRIPT_POOL_SIZE'] == 0:
+            from motor import warm_scripts
+            warm_scripts()
@@ -0,0 +1,261 @@
+"""Motor de ejecución de los scripts de limpieza, compartido por la web y la CLI.
+
+No importa Flask ni pandas: los scripts cargan sus propias dependencias
+cuando se ejecutan (o en warm_scripts).
+"""
+import contextlib
+import gc
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_FOLDER = os.path.join(BASE_DIR, 'static', 'scripts')
+
+# Los scripts importan utilidades compartidas del paquete static/scripts/comun
+if SCRIPT_FOLDER not in sys.path:
+    sys.path.insert(0, SCRIPT_FOLDER)
+
+from comun.calidad import agregar_advertencias, ruta_reporte
+from comun.deteccion import detectar
+from comun.entrada import entradas_de_archivo, observar_lectura
+from comun.resumen import mover_resumenes
+from comun.sondeo import sondear
+from comun.validacion import validar_entrada
+
+# Esquemas declarados por cada script (ESQUEMA), cacheados por fecha de modificación
+_schema_cache = {}
+
+
+def allowed_script(filename):
+    """Valida que los scripts sean seguros"""
+    return filename.endswith('.py') and not any(bad in filename for bad in ['..', '/', '\\'])
+
+
+def get_scripts_list():
+    """Obtiene la lista de scripts disponibles"""
+    scripts = []
+    try:
+        for file in os.listdir(SCRIPT_FOLDER):
+            if allowed_script(file):
+                scripts.append(file[:-3])  # Quitar extensión .py
+    except FileNotFoundError:
+        logger.error("Carpeta de scripts no encontrada, creando...")
+        os.makedirs(SCRIPT_FOLDER, exist_ok=True)
+    return scripts
+
+
+def load_script(script_name):
+    """Carga un script como módulo nuevo (cada ejecución tiene sus propias variables globales)"""
+    script_path = os.path.join(SCRIPT_FOLDER, f"{script_name}.py")
+
+    if not allowed_script(f"{script_name}.py") or not os.path.exists(script_path):
+        raise FileNotFoundError(f"No se encontró el script: {script_name}.py")
+
+    # Cargar módulo dinámicamente con validación adicional
+    spec = importlib.util.spec_from_file_location(script_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def warm_scripts():
+    """Precarga todos los scripts y sus dependencias pesadas (pandas, numpy...).
+
+    Pensado para el proceso que se bifurca en los que ejecutan los scripts:
+    el forkserver del pool (script_warmup) o, sin pool, el maestro de
+    gunicorn con preload_app. Los módulos quedan en sys.modules antes del
+    fork y los hijos los comparten por copy-on-write en lugar de importarlos
+    en el primer job. Importar app.py no lo ejecuta, así las herramientas de
+    línea de comandos siguen arrancando rápido.
+    """
+    inicio = time.perf_counter()
+    warmed = []
+    for script_name in get_scripts_list():
+        try:
+            load_script(script_name)
+            warmed.append(script_name)
+        except Exception as e:
+            logger.error(f"No se pudo precargar {script_name}: {str(e)}")
+
+    # Mover los objetos precargados a la generación permanente: el GC de los
+    # workers no los recorre y sus páginas no se copian tras el fork
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Scripts precargados en {time.perf_counter() - inicio:.2f}s: {', '.join(warmed)}")
+    return warmed
+
+
+def script_schemas():
+    """Devuelve {script: ESQUEMA} de los scripts que declaran una huella de entrada"""
+    schemas = {}
+    for script_name in get_scripts_list():
+        script_path = os.path.join(SCRIPT_FOLDER, f"{script_name}.py")
+        mtime = os.path.getmtime(script_path)
+        cached = _schema_cache.get(script_name)
+        if cached is None or cached[0] != mtime:
+            try:
+                cached = (mtime, getattr(load_script(script_name), 'ESQUEMA', None))
+            except Exception as e:
+                logger.error(f"No se pudo leer el esquema de {script_name}: {str(e)}")
+                cached = (mtime, None)
+            _schema_cache[script_name] = cached
+        if cached[1]:
+            schemas[script_name] = cached[1]
+    return schemas
+
+
+def detect_script(input_path):
+    """Identifica qué script corresponde a un archivo leyendo solo sus primeros KB.
+
+    Devuelve (script, detalle): script es None si no encaja con ningún esquema
+    o es ambiguo; detalle incluye los puntajes para mostrar al usuario. En un
+    ZIP todos los CSV deben corresponder al mismo script.
+    """
+    schemas = script_schemas()
+    detected = set()
+    scores = {}
+    for entrada in entradas_de_archivo(input_path):
+        script_name, scores = detectar(sondear(entrada), schemas)
+        detected.add(script_name)
+    if len(detected) != 1:
+        return None, scores
+    return detected.pop(), scores
+
+
+def _stage_input(input_path, folder):
+    """Deja el archivo de entrada (sin copiarlo si es posible) en una carpeta propia del trabajo"""
+    destination = os.path.join(folder, os.path.basename(input_path))
+    try:
+        os.symlink(os.path.abspath(input_path), destination)
+    except OSError:
+        shutil.copy(input_path, destination)
+
+
+@contextlib.contextmanager
+def shared_input(input_path):
+    """Prepara un archivo para pasarlo por varios scripts leyéndolo una sola vez.
+
+    Produce la lista de archivos que hay que entregar a cada script. Un CSV
+    plano se usa tal cual; uno comprimido (.gz, .zst o .zip con varios CSV) se
+    descomprime una única vez a CSV planos temporales, y todos los scripts
+    leen esos en lugar de volver a descomprimir el original.
+    """
+    entradas = entradas_de_archivo(input_path)
+    if len(entradas) == 1 and entradas[0].miembro is None and input_path.lower().endswith('.csv'):
+        yield [input_path]
+        return
+
+    folder = tempfile.mkdtemp(prefix='compartida_')
+    try:
+        plain_files = []
+        for entrada in entradas:
+            destination = os.path.join(folder, entrada.nombre)
+            with entrada.abrir() as source, open(destination, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            plain_files.append(destination)
+        yield plain_files
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _with_format(path, output_format):
+    """``path`` con la extensión del formato de salida (como comun.escritura.ruta_en_formato)"""
+    return path if output_format == 'csv' else f"{os.path.splitext(path)[0]}.{output_format}"
+
+
+def process_file(script_name, input_path, output_folder, output_name=None, settings=None, progress=None):
+    """Ejecuta un script sobre un único archivo y devuelve las rutas de salida.
+
+    El archivo se expone al script en una carpeta de entrada temporal donde es
+    el único archivo, así ``procesar_archivos()`` no vuelve a procesar otros
+    archivos de la misma carpeta ni los de peticiones concurrentes. Las salidas
+    se escriben en una carpeta temporal dentro de ``output_folder`` y se mueven
+    al final con ``os.replace``: o aparecen completas o no aparecen.
+
+    ``output_name`` recibe el nombre lógico del CSV (``x.csv``) y devuelve el
+    nombre final; por defecto ``limpio_x.csv``. ``settings`` son variables
+    globales adicionales del script (ej. ``SINK_DATABASE``, ``RESUMEN`` o
+    ``FORMATO``); solo se aplican las que el script define. Con
+    ``FORMATO='parquet'`` la salida (y su nombre final) lleva la extensión
+    .parquet. Las tablas de resumen que escriba el script (comun.resumen)
+    acompañan a su salida con el mismo prefijo y siguen siendo CSV.
+
+    Si el script declara ESQUEMA, cada CSV se valida antes leyendo solo su
+    encabezado y primeros KB: un archivo equivocado se rechaza con
+    ``ErrorValidacion`` (con el motivo) sin llegar a parsearlo completo, y las
+    advertencias se agregan al reporte de calidad.
+
+    ``progress`` (opcional) recibe ``progress(etapa, bytes_leidos=None,
+    lineas=None)``: 'validando', 'limpiando' (con los bytes y líneas que el
+    script va leyendo) y 'guardando'.
+    """
+    output_name = output_name or (lambda nombre: f"limpio_{nombre}")
+    progress = progress or (lambda etapa, **avance: None)
+    os.makedirs(output_folder, exist_ok=True)
+    module = load_script(script_name)
+
+    warnings = []
+    progress('validando')
+    schema = getattr(module, 'ESQUEMA', None)
+    if schema:
+        for entrada in entradas_de_archivo(input_path):
+            warnings.extend(validar_entrada(entrada, schema))
+
+    work_input = tempfile.mkdtemp(prefix='entrada_')
+    work_output = tempfile.mkdtemp(prefix='.tmp_', dir=output_folder)
+    try:
+        _stage_input(input_path, work_input)
+
+        # Configurar variables en el script
+        module.INPUT_FOLDER = work_input
+        module.OUTPUT_FOLDER = work_output
+        for key, value in (settings or {}).items():
+            if hasattr(module, key):
+                setattr(module, key, value)
+
+        # Ejecutar función principal con validación
+        progress('limpiando')
+        with observar_lectura(lambda entrada, leidos, lineas: progress('limpiando', bytes_leidos=leidos, lineas=lineas)):
+            if hasattr(module, 'procesar_archivos'):
+                logger.info(f"Ejecutando procesar_archivos() en {script_name}")
+                module.procesar_archivos()
+            elif hasattr(module, 'main'):
+                logger.info(f"Ejecutando main() en {script_name}")
+                module.main()
+            else:
+                raise AttributeError("No se encontró función ejecutable (procesar_archivos o main)")
+        progress('guardando')
+
+        # Verificar salida (un archivo comprimido .zip puede contener varios CSV); los
+        # scripts que declaran FORMATO pueden haberla escrito como Parquet
+        output_format = getattr(module, 'FORMATO', 'csv')
+        pending = []
+        for entrada in entradas_de_archivo(input_path):
+            expected_output = _with_format(os.path.join(work_output, f"limpio_{entrada.nombre}"), output_format)
+            if not os.path.exists(expected_output):
+                raise FileNotFoundError(f"El script no generó el archivo esperado: {os.path.basename(expected_output)}")
+            if os.path.getsize(expected_output) == 0:
+                raise ValueError("El archivo de salida está vacío")
+            pending.append((expected_output,
+                            _with_format(os.path.join(output_folder, output_name(entrada.nombre)), output_format)))
+
+        # Mover archivos procesados (y su reporte de calidad y resúmenes, si el script los generó)
+        outputs = []
+        for expected_output, output_path in pending:
+            if os.path.exists(ruta_reporte(expected_output)):
+                os.replace(ruta_reporte(expected_output), ruta_reporte(output_path))
+            mover_resumenes(expected_output, output_path)
+            os.replace(expected_output, output_path)
+            agregar_advertencias(output_path, warnings)
+            outputs.append(output_path)
+        return outputs
+    finally:
+        shutil.rmtree(work_input, ignore_errors=True)
+        shutil.rmtree(work_output, ignore_errors=True)
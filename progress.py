@@ -0,0 +1,156 @@
+import json
+import os
+import time
+
+# Tiempo que se conserva el estado de progreso de un job terminado
+PROGRESS_TTL_SECONDS = 3600
+# Intervalo mínimo entre escrituras del estado (salvo cambios de etapa o archivo)
+PUBLISH_INTERVAL_SECONDS = 0.25
+# Fracción del avance de un archivo que corresponde a leerlo; el resto es limpiar y guardar
+READ_SHARE = 0.9
+
+
+class ProgressStore:
+    """Estado de progreso de cada job, en disco para que lo lea cualquier worker.
+
+    Cada job es un ``<root>/<job_id>.json`` que reemplaza atómicamente quien
+    procesa la petición; el endpoint SSE solo lo lee. El ``seq`` crece con
+    cada publicación y sirve como id de evento (Last-Event-ID) al reconectar.
+    """
+
+    def __init__(self, root, ttl=PROGRESS_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id):
+        # Los IDs son 32 caracteres hex generados por el cliente; cualquier otra cosa se ignora
+        if not job_id or len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def valid_id(self, job_id):
+        return self._path(job_id) is not None
+
+    def publish(self, job_id, state):
+        path = self._path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def read(self, job_id):
+        path = self._path(job_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (TypeError, OSError, ValueError):
+            return None
+
+    def purge_expired(self):
+        """Elimina estados de jobs más antiguos que el TTL"""
+        limit = time.time() - self.ttl
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+class JobProgress:
+    """Acumula el avance de un job (archivo x script) y lo publica en el ProgressStore.
+
+    El avance se mide en bytes: cada tarea pesa el tamaño de su archivo, la
+    lectura cuenta hasta READ_SHARE de ese peso y el resto al terminar. El ETA
+    extrapola el ritmo observado. Con ``store=None`` no publica nada.
+    """
+
+    def __init__(self, store, job_id, task_sizes):
+        self.store = store if store is not None and store.valid_id(job_id) else None
+        self.job_id = job_id
+        self.total_bytes = sum(task_sizes) or 1
+        self.started = time.monotonic()
+        self.last_publish = 0
+        self.done_bytes = 0
+        self.rows_done = 0
+        self.current_size = 0
+        self.state = {
+            'job_id': job_id,
+            'seq': 0,
+            'total': len(task_sizes),
+            'completados': 0,
+            'archivo': None,
+            'script': None,
+            'etapa': 'en cola',
+            'porcentaje_archivo': 0,
+            'porcentaje': 0,
+            'filas': 0,
+            'transcurrido': 0,
+            'eta_segundos': None,
+            'terminado': False,
+            'error': None,
+        }
+        self._publish(force=True)
+
+    def _publish(self, force=False, fraction=0.0):
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_publish < PUBLISH_INTERVAL_SECONDS:
+            return
+        done = self.done_bytes + fraction * self.current_size
+        elapsed = now - self.started
+        self.state['seq'] += 1
+        self.state['porcentaje'] = round(100 * min(done / self.total_bytes, 1), 1)
+        self.state['porcentaje_archivo'] = round(100 * fraction, 1)
+        self.state['transcurrido'] = round(elapsed, 1)
+        if self.state['terminado']:
+            self.state['eta_segundos'] = 0
+        elif done > 0:
+            self.state['eta_segundos'] = round(elapsed * (self.total_bytes - done) / done, 1)
+        self.last_publish = now
+        self.store.publish(self.job_id, self.state)
+
+    def resize(self, planned, actual):
+        """Reemplaza tareas estimadas por las reales (p. ej. un ZIP que resultó tener varios CSV)"""
+        self.total_bytes = max(self.total_bytes + sum(actual) - sum(planned), 1)
+        self.state['total'] += len(actual) - len(planned)
+
+    def start_file(self, script_name, input_path):
+        """Marca el inicio de una tarea; devuelve el callback de etapas para motor.process_file"""
+        self.current_size = os.path.getsize(input_path)
+        self.state.update(archivo=os.path.basename(input_path), script=script_name, etapa='validando')
+        self._publish(force=True)
+        return self.stage
+
+    def stage(self, etapa, bytes_leidos=None, lineas=None):
+        """Callback del motor: etapa actual y, durante la lectura, bytes y líneas consumidos"""
+        changed = etapa != self.state['etapa']
+        self.state['etapa'] = etapa
+        fraction = 0.0
+        if bytes_leidos is not None and self.current_size:
+            fraction = READ_SHARE * min(bytes_leidos / self.current_size, 1)
+        if etapa == 'guardando':
+            fraction = READ_SHARE
+        if lineas is not None:
+            # La primera línea es el encabezado
+            self.state['filas'] = self.rows_done + max(lineas - 1, 0)
+        self._publish(force=changed, fraction=fraction)
+
+    def finish_file(self, rows=None):
+        """Cierra la tarea actual sumando sus filas leídas"""
+        self.done_bytes += self.current_size
+        self.current_size = 0
+        if rows is not None:
+            self.rows_done += rows
+        self.state['filas'] = self.rows_done
+        self.state['completados'] += 1
+        self._publish(force=True)
+
+    def finish(self, error=None):
+        """Último evento del job; ``error`` indica que terminó sin resultados"""
+        self.state.update(terminado=True, error=error, etapa='terminado', archivo=None, script=None)
+        self.done_bytes = self.total_bytes
+        self._publish(force=True)
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Tiempo que un resultado queda disponible para descargar (y reintentar la descarga)
+RESULT_TTL_SECONDS = 24 * 3600
+# Espacio máximo que ocupan los resultados; al superarlo se desalojan los que vencen antes
+RESULT_MAX_BYTES = 5 * 1024 ** 3
+# Cada cuánto corre el barrido en segundo plano
+SWEEP_INTERVAL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class ResultStore:
+    """Conserva en disco los resultados de cada job hasta que vencen.
+
+    Cada job vive en ``<root>/<job_id>/`` con el archivo de resultados y un
+    ``meta.json`` (nombre, tamaño, creación y vencimiento). El archivo no se
+    borra al descargarlo: una descarga cortada se puede reintentar o reanudar
+    con Range mientras el job no venza. Un hilo barredor elimina los jobs
+    vencidos y, si el total supera ``max_bytes``, desaloja primero los que
+    vencen antes. Como todo el estado está en disco, funciona con varios
+    workers de gunicorn (cada uno con su barredor; borrar dos veces es inocuo).
+    """
+
+    def __init__(self, root, ttl=RESULT_TTL_SECONDS, max_bytes=RESULT_MAX_BYTES,
+                 sweep_interval=SWEEP_INTERVAL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.sweep_tasks = []
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, job_id):
+        # Los IDs son uuid4 en hex; cualquier otra cosa se rechaza antes de tocar el disco
+        if not job_id or len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        return os.path.join(self.root, job_id)
+
+    def _read_meta(self, job_dir):
+        try:
+            with open(os.path.join(job_dir, 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def reserve(self, filename):
+        """Crea un job vacío; devuelve (job_id, ruta donde escribir el resultado)"""
+        job_id = uuid.uuid4().hex
+        job_dir = self._dir(job_id)
+        os.makedirs(job_dir)
+        return job_id, os.path.join(job_dir, os.path.basename(filename))
+
+    def commit(self, job_id, ttl=None):
+        """Publica el resultado escrito en la ruta reservada y devuelve su metadata.
+
+        Hasta este punto el job no es descargable; los reservados que nunca se
+        publican los elimina el barredor cuando superan el TTL.
+        """
+        job_dir = self._dir(job_id)
+        files = [name for name in os.listdir(job_dir) if name != 'meta.json']
+        if len(files) != 1:
+            raise ValueError(f"El job {job_id} debe contener un solo archivo de resultados")
+        created = time.time()
+        meta = {
+            'filename': files[0],
+            'size': os.path.getsize(os.path.join(job_dir, files[0])),
+            'created': created,
+            'expires': created + (self.ttl if ttl is None else ttl),
+        }
+        tmp_path = os.path.join(job_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(job_dir, 'meta.json'))
+        self.evict(keep=job_id)
+        return meta
+
+    def get(self, job_id, filename=None):
+        """Metadata (con 'path') de un job vigente, o None si no existe o venció"""
+        job_dir = self._dir(job_id)
+        meta = self._read_meta(job_dir) if job_dir else None
+        if not meta or meta['expires'] < time.time():
+            return None
+        if filename is not None and filename != meta['filename']:
+            return None
+        meta['path'] = os.path.join(job_dir, meta['filename'])
+        return meta if os.path.exists(meta['path']) else None
+
+    def remove(self, job_id):
+        job_dir = self._dir(job_id)
+        if job_dir:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def jobs(self):
+        """Lista (job_id, meta) de los jobs publicados; meta es None si solo están reservados"""
+        found = []
+        for job_id in os.listdir(self.root):
+            job_dir = self._dir(job_id)
+            if job_dir and os.path.isdir(job_dir):
+                found.append((job_id, self._read_meta(job_dir)))
+        return found
+
+    def sweep(self):
+        """Elimina los jobs vencidos y los reservados abandonados; luego aplica el límite de tamaño"""
+        now = time.time()
+        for job_id, meta in self.jobs():
+            try:
+                if meta is None:
+                    expired = os.path.getmtime(self._dir(job_id)) + self.ttl < now
+                else:
+                    expired = meta['expires'] < now
+            except OSError:
+                continue
+            if expired:
+                self.remove(job_id)
+                logger.info(f"Resultado vencido eliminado: {job_id}")
+        self.evict()
+
+    def evict(self, keep=None):
+        """Desaloja los jobs que vencen antes hasta que el total quepa en max_bytes"""
+        published = sorted(
+            ((meta['expires'], job_id, meta['size']) for job_id, meta in self.jobs() if meta),
+        )
+        total = sum(size for _, _, size in published)
+        for _, job_id, size in published:
+            if total <= self.max_bytes:
+                break
+            if job_id == keep:
+                continue
+            self.remove(job_id)
+            total -= size
+            logger.info(f"Resultado desalojado por espacio: {job_id} ({size} bytes)")
+
+    def _sweep_loop(self, stop):
+        while not stop.wait(self.sweep_interval):
+            for task in [self.sweep] + self.sweep_tasks:
+                try:
+                    task()
+                except Exception as e:
+                    logger.error(f"Error en el barrido de resultados: {str(e)}")
+
+    def start_sweeper(self):
+        """Inicia el hilo barredor en este proceso (idempotente, y de nuevo tras un fork)"""
+        with self._lock:
+            if self._sweeper_pid == os.getpid() and self._sweeper.is_alive():
+                return
+            stop = threading.Event()
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(stop,), daemon=True,
+                                             name='result-sweeper')
+            self._sweeper.stop = stop
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        with self._lock:
+            if self._sweeper and self._sweeper_pid == os.getpid():
+                self._sweeper.stop.set()
+                self._sweeper.join()
+            self._sweeper = self._sweeper_pid = None
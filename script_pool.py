@@ -0,0 +1,290 @@
+"""Procesos persistentes y aislados para ejecutar los scripts de limpieza.
+
+Un script desbocado o un CSV patológico corre en un proceso aparte con
+límites de memoria y CPU; si los supera, o si pasa el tiempo máximo, se
+pierde ese proceso y no el worker web. Los procesos nacen de un forkserver
+que ya importó pandas y el motor, y atienden varios jobs antes de reciclarse,
+así el aislamiento no cuesta un intérprete nuevo por job.
+"""
+import logging
+import multiprocessing
+import os
+import pickle
+import resource
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+import motor
+from comun.calidad import ruta_reporte
+from comun.resumen import mover_resumenes
+
+logger = logging.getLogger(__name__)
+
+# Módulos que el forkserver importa una sola vez; los procesos del pool nacen con ellos cargados
+# (comun.escritura trae pyarrow si está instalado; si falta, el forkserver lo ignora).
+# script_warmup precarga todos los scripts con motor.warm_scripts
+PRELOAD_MODULES = ['motor', 'numpy', 'pandas', 'comun.escritura', 'script_warmup']
+# Jobs que atiende un proceso antes de reemplazarlo (acota la fragmentación de memoria)
+MAX_JOBS_PER_WORKER = 20
+# Memoria virtual adicional que puede reservar un job (sobre la que el proceso ya usa)
+MEMORY_LIMIT_BYTES = 4 * 1024 ** 3
+# Segundos de CPU por job; al superarlos el kernel termina el proceso (SIGXCPU)
+CPU_LIMIT_SECONDS = 30 * 60
+# Tiempo real máximo por job; al superarlo el proceso se mata
+JOB_TIMEOUT_SECONDS = 60 * 60
+# Intervalo mínimo entre mensajes de avance que el proceso envía al worker web
+PROGRESS_INTERVAL_SECONDS = 0.1
+
+
+class ScriptWorkerError(RuntimeError):
+    """El proceso que ejecutaba el script murió, superó un límite o no respondió a tiempo"""
+
+
+class ScriptPool:
+    """Pool de procesos que ejecutan ``motor.process_file`` con límites por job.
+
+    ``process_file`` tiene la misma firma que la del motor: el job corre en un
+    proceso del pool, el avance llega por el mismo pipe y los errores del
+    script (incluido ErrorValidacion) se relanzan aquí. Como ``output_name``
+    puede ser cualquier función, el proceso escribe con los nombres por
+    defecto en una carpeta temporal y el renombrado final se hace aquí.
+
+    Hasta ``size`` jobs a la vez por proceso web; los procesos se crean al
+    primer uso (y de nuevo tras un fork, como el barredor de resultados).
+    """
+
+    def __init__(self, size=1, max_jobs=MAX_JOBS_PER_WORKER, memory_limit=MEMORY_LIMIT_BYTES,
+                 cpu_limit=CPU_LIMIT_SECONDS, timeout=JOB_TIMEOUT_SECONDS):
+        self.size = max(size, 1)
+        self.max_jobs = max_jobs
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset_if_forked(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = []
+                self._slots = threading.BoundedSemaphore(self.size)
+
+    def _spawn(self):
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main, args=(child_conn, self.memory_limit, self.cpu_limit),
+            name='script-worker', daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        logger.info(f"Proceso de scripts iniciado (pid {process.pid})")
+        return _Worker(process, parent_conn)
+
+    def _take(self):
+        self._reset_if_forked()
+        self._slots.acquire()
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+        try:
+            return self._spawn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _give(self, worker):
+        if worker.ready and worker.jobs < self.max_jobs and worker.process.is_alive():
+            with self._lock:
+                self._idle.append(worker)
+        else:
+            worker.stop()
+        self._slots.release()
+
+    def process_file(self, script_name, input_path, output_folder, output_name=None, settings=None, progress=None):
+        """Como ``motor.process_file``, pero en un proceso aislado del pool"""
+        output_name = output_name or (lambda nombre: f"limpio_{nombre}")
+        progress = progress or (lambda etapa, **avance: None)
+        os.makedirs(output_folder, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.pool_', dir=output_folder)
+        worker = self._take()
+        try:
+            outputs = worker.run((script_name, input_path, staging, settings), progress, self.timeout)
+
+            # Renombrar con output_name (y llevar el reporte de calidad y los resúmenes junto a cada salida)
+            final_outputs = []
+            for staged in outputs:
+                output_path = os.path.join(output_folder, output_name(os.path.basename(staged)[len('limpio_'):]))
+                if os.path.exists(ruta_reporte(staged)):
+                    os.replace(ruta_reporte(staged), ruta_reporte(output_path))
+                mover_resumenes(staged, output_path)
+                os.replace(staged, output_path)
+                final_outputs.append(output_path)
+            return final_outputs
+        finally:
+            self._give(worker)
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def close(self):
+        """Detiene los procesos ociosos de este proceso web"""
+        with self._lock:
+            if self._pid == os.getpid():
+                for worker in self._idle:
+                    worker.stop()
+                self._idle = []
+
+
+class _Worker:
+    """Extremo web de un proceso del pool"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+        # Falso mientras hay un job en curso o si el proceso quedó en mal estado
+        self.ready = True
+
+    def run(self, job, progress, timeout):
+        """Envía un job, atiende sus mensajes de avance y devuelve las salidas (o relanza su error)"""
+        self.jobs += 1
+        self.ready = False
+        self.conn.send(job)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.kill()
+                raise ScriptWorkerError(f"El script superó el tiempo máximo de {timeout:.0f}s y se detuvo")
+            try:
+                if not self.conn.poll(min(remaining, 1)):
+                    if not self.process.is_alive():
+                        raise EOFError
+                    continue
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                self.process.join(1)
+                raise ScriptWorkerError(self._death_reason())
+
+            kind = message[0]
+            if kind == 'progress':
+                progress(message[1], **message[2])
+            elif kind == 'ok':
+                self.ready = True
+                return message[1]
+            elif kind == 'error':
+                # Tras un MemoryError el proceso queda fragmentado y termina: no se reutiliza
+                self.ready = not isinstance(message[1], MemoryError)
+                raise message[1]
+
+    def _death_reason(self):
+        exitcode = self.process.exitcode
+        if exitcode == -signal.SIGXCPU:
+            return "El script superó el límite de tiempo de CPU y se detuvo"
+        if exitcode == -signal.SIGKILL:
+            return "El proceso del script fue terminado (posible falta de memoria)"
+        return f"El proceso del script terminó inesperadamente (código {exitcode})"
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+    def stop(self):
+        """Pide al proceso que termine; si no lo hace enseguida, lo mata"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(5)
+        self.kill()
+
+
+def _virtual_size():
+    """Memoria virtual que ya ocupa este proceso (VmSize), o None si no se puede leer"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmSize:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _set_job_limits(memory_limit, cpu_limit):
+    """Fija los límites soft del job sobre lo que el proceso ya consumió (los hard no cambian)"""
+    _, memory_hard = resource.getrlimit(resource.RLIMIT_AS)
+    current = _virtual_size()
+    if memory_limit and current is not None:
+        soft = current + memory_limit
+        if memory_hard != resource.RLIM_INFINITY:
+            soft = min(soft, memory_hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, memory_hard))
+
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_limit:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + 1 + int(cpu_limit)
+        if cpu_hard != resource.RLIM_INFINITY:
+            soft = min(soft, cpu_hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, cpu_hard))
+
+
+def _clear_job_limits():
+    for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+
+def _picklable(error):
+    """La excepción tal cual si se puede enviar por el pipe; si no, su texto"""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return ScriptWorkerError(f"{type(error).__name__}: {error}")
+
+
+def _worker_main(conn, memory_limit, cpu_limit):
+    """Bucle de un proceso del pool: recibe jobs hasta que le llega None o se cierra el pipe"""
+    last_sent = [0.0, None]
+
+    def progress(etapa, **avance):
+        # Los cambios de etapa siempre; el avance de lectura, como mucho cada PROGRESS_INTERVAL_SECONDS
+        now = time.monotonic()
+        if etapa == last_sent[1] and now - last_sent[0] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_sent[:] = [now, etapa]
+        conn.send(('progress', etapa, avance))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        script_name, input_path, output_folder, settings = job
+        last_sent[:] = [0.0, None]
+        try:
+            _set_job_limits(memory_limit, cpu_limit)
+            outputs = motor.process_file(script_name, input_path, output_folder,
+                                         settings=settings, progress=progress)
+            message = ('ok', outputs)
+        except MemoryError:
+            message = ('error', MemoryError("El script superó el límite de memoria del job"))
+        except Exception as e:
+            message = ('error', _picklable(e))
+        finally:
+            _clear_job_limits()
+        conn.send(message)
+        if isinstance(message[1], MemoryError):
+            break
@@ -0,0 +1,10 @@
+"""Precarga de los scripts de limpieza en el forkserver del pool de scripts.
+
+El forkserver importa este módulo una sola vez (ver PRELOAD_MODULES en
+script_pool.py): importarlo ejecuta ``motor.warm_scripts``, así cada proceso
+del pool nace con los scripts y sus dependencias ya cargados y congelados,
+en lugar de importarlos en su primer job.
+"""
+import motor
+
+warmed = motor.warm_scripts()
@@ -0,0 +1,5 @@
+"""Utilidades compartidas por los scripts de limpieza.
+
+Este paquete no es un script ejecutable: ``get_scripts_list`` solo lista
+archivos ``.py`` sueltos, por lo que la carpeta no aparece en el formulario.
+"""
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+from comun.categorias import aplicar_unicos
+
+# Estados de conexiones que no cuentan como tiempo conectado
+ESTADOS_DESCONECTADO = {'offline'}
+
+# Columnas que se leen de cada salida limpia
+COLUMNAS_CONEXIONES = ['status_start_time', 'status_end_time', 'agent_email', 'agent_status']
+COLUMNAS_PROGRAMADAS = ['agent_email', 'fecha', 'Horario_Roster', 'Total_horas']
+COLUMNAS_TOPES = ['agent_email', 'fecha', 'Horario_Rooster', 'Total_horas']
+
+COLUMNAS_SALIDA = [
+    'agent_email', 'fecha', 'fuente', 'horario', 'horas_turno', 'horas_programadas',
+    'horas_conectadas', 'horas_en_turno', 'adherencia', 'conformidad',
+]
+
+FORMATO_FECHA_HORA = '%Y-%m-%d %H:%M:%S'
+SEGUNDOS_HORA = 3600
+
+
+def _leer(ruta, columnas, categoricas=()):
+    """Lee solo ``columnas`` de una salida limpia (CSV con o sin BOM, o Parquet de clean.py)"""
+    tipos = {columna: 'category' if columna in categoricas else str for columna in columnas}
+    if ruta.lower().endswith('.parquet'):
+        # El Parquet conserva los tipos del script: se lleva a texto como el CSV, con los nulos como nulos
+        df = pd.read_parquet(ruta, columns=columnas)
+        return df.astype(tipos).mask(df.isna())
+    return pd.read_csv(ruta, usecols=columnas, dtype=tipos, encoding='utf-8-sig')
+
+
+def _normalizar_email(serie):
+    """Emails sin espacios y en minúsculas (vacíos como nulos), una vez por valor distinto"""
+    return aplicar_unicos(serie, lambda valor: valor.strip().lower() or None if isinstance(valor, str) else None)
+
+
+def leer_conexiones(rutas):
+    """Intervalos conectados por agente: agent_email, inicio, fin (datetime64)"""
+    partes = []
+    for ruta in rutas:
+        df = _leer(ruta, COLUMNAS_CONEXIONES, categoricas=('agent_email', 'agent_status'))
+        estado = df['agent_status'].astype(str).str.strip().str.lower()
+        df = df[~estado.isin(ESTADOS_DESCONECTADO)]
+        partes.append(pd.DataFrame({
+            'agent_email': _normalizar_email(df['agent_email']).astype(object),
+            'inicio': pd.to_datetime(df['status_start_time'], format=FORMATO_FECHA_HORA, errors='coerce'),
+            'fin': pd.to_datetime(df['status_end_time'], format=FORMATO_FECHA_HORA, errors='coerce'),
+        }))
+    conexiones = pd.concat(partes, ignore_index=True) if partes else \
+        pd.DataFrame({'agent_email': pd.Series(dtype=str), 'inicio': pd.Series(dtype='datetime64[ns]'),
+                      'fin': pd.Series(dtype='datetime64[ns]')})
+    validas = conexiones['inicio'].notna() & conexiones['fin'].notna() & (conexiones['fin'] > conexiones['inicio'])
+    return conexiones[validas & conexiones['agent_email'].notna()].reset_index(drop=True)
+
+
+def unir_intervalos(conexiones):
+    """Une los intervalos solapados de cada agente (exportes repetidos o estados superpuestos).
+
+    Un barrido sobre los intervalos ordenados por agente e inicio: empieza un
+    bloque nuevo cuando el inicio supera el mayor fin visto hasta ahí en ese
+    agente. Así ningún minuto se cuenta dos veces.
+    """
+    if conexiones.empty:
+        return conexiones
+    ordenadas = conexiones.sort_values(['agent_email', 'inicio'], kind='stable').reset_index(drop=True)
+    agente = ordenadas['agent_email']
+    fin_previo = ordenadas.groupby('agent_email', sort=False)['fin'].cummax().shift()
+    nuevo = (agente != agente.shift()) | (ordenadas['inicio'] > fin_previo)
+    bloques = ordenadas.groupby(nuevo.cumsum(), sort=False).agg(
+        agent_email=('agent_email', 'first'), inicio=('inicio', 'min'), fin=('fin', 'max'))
+    return bloques.reset_index(drop=True)
+
+
+def _turnos_de(df, columna_horario, fuente):
+    """Ventana de cada turno a partir de 'HH:MM - HH:MM'; si termina antes de empezar, cruza la medianoche"""
+    fecha = pd.to_datetime(df['fecha'], format='%Y-%m-%d', errors='coerce')
+    # El horario se interpreta una vez por valor distinto
+    partes = df[columna_horario].astype('category')
+    horas = partes.cat.categories.str.extract(r'^\s*(\d{2}):(\d{2})\s*-\s*(\d{2}):(\d{2})\s*$').astype(float)
+    minutos_inicio = (horas[0] * 60 + horas[1]).to_numpy()
+    minutos_fin = (horas[2] * 60 + horas[3]).to_numpy()
+    codigos = partes.cat.codes.to_numpy()
+    validos = codigos >= 0
+    inicio_min = np.where(validos, minutos_inicio[np.where(validos, codigos, 0)], np.nan)
+    fin_min = np.where(validos, minutos_fin[np.where(validos, codigos, 0)], np.nan)
+    fin_min = np.where(fin_min <= inicio_min, fin_min + 24 * 60, fin_min)
+
+    inicio = fecha + pd.to_timedelta(inicio_min, unit='m')
+    fin = fecha + pd.to_timedelta(fin_min, unit='m')
+    total = pd.to_numeric(df['Total_horas'], errors='coerce')
+    turnos = pd.DataFrame({
+        'agent_email': _normalizar_email(df['agent_email']).astype(object),
+        'fecha': df['fecha'],
+        'fuente': fuente,
+        'horario': df[columna_horario],
+        't_inicio': inicio,
+        't_fin': fin,
+        'horas_turno': (fin - inicio).dt.total_seconds() / SEGUNDOS_HORA,
+        'total_horas': total,
+    })
+    return turnos[fecha.notna() & turnos['agent_email'].notna()]
+
+
+def leer_turnos(rutas_programadas=(), rutas_topes=()):
+    """Un turno por (agent_email, fecha); programadas tiene prioridad sobre topes"""
+    partes = [_turnos_de(_leer(ruta, COLUMNAS_PROGRAMADAS), 'Horario_Roster', 'programadas')
+              for ruta in rutas_programadas]
+    partes += [_turnos_de(_leer(ruta, COLUMNAS_TOPES), 'Horario_Rooster', 'topes') for ruta in rutas_topes]
+    if not partes:
+        raise ValueError("Se necesita al menos una salida de programadas o topes")
+    turnos = pd.concat(partes, ignore_index=True)
+    # Preferir filas con horario válido, y entre ellas la primera fuente
+    turnos = turnos.assign(_sin_horario=turnos['t_inicio'].isna())
+    turnos = turnos.sort_values('_sin_horario', kind='stable')
+    turnos = turnos.drop_duplicates(['agent_email', 'fecha']).drop(columns='_sin_horario')
+    horas = turnos['total_horas'].where(turnos['total_horas'] > 0, turnos['horas_turno'])
+    return turnos.assign(horas_programadas=horas).drop(columns='total_horas').reset_index(drop=True)
+
+
+def _horas_en_turno(conexiones, turnos):
+    """Horas conectadas dentro de la ventana de cada turno (índice = fila de ``turnos``).
+
+    Join de intervalos por sort-merge: con ``merge_asof`` cada intervalo se
+    asocia, por agente, al último turno que empezó antes de su inicio y al
+    último que empezó antes de su fin; así se cubren los intervalos que
+    empiezan antes del turno o cruzan de un turno al siguiente. Un intervalo
+    que abarcara tres turnos perdería el del medio, algo que con estados de
+    minutos u horas no ocurre. Costo O(n log n) por el ordenamiento.
+    """
+    ventanas = turnos.loc[turnos['t_inicio'].notna(), ['agent_email', 't_inicio', 't_fin']]
+    ventanas = ventanas.rename_axis('turno').reset_index().sort_values('t_inicio')
+    intervalos = conexiones.rename_axis('fila').reset_index()
+    if ventanas.empty or intervalos.empty:
+        return pd.Series(0.0, index=turnos.index)
+
+    # Agentes como enteros compartidos: merge_asof agrupa más rápido por un entero
+    agentes = pd.CategoricalDtype(pd.unique(pd.concat([ventanas['agent_email'], intervalos['agent_email']])))
+    ventanas['agente'] = ventanas['agent_email'].astype(agentes).cat.codes
+    intervalos['agente'] = intervalos['agent_email'].astype(agentes).cat.codes
+    ventanas = ventanas.drop(columns='agent_email')
+    intervalos = intervalos.drop(columns='agent_email')
+
+    por_inicio = pd.merge_asof(intervalos.sort_values('inicio'), ventanas, left_on='inicio',
+                               right_on='t_inicio', by='agente', direction='backward')
+    por_fin = pd.merge_asof(intervalos.sort_values('fin'), ventanas, left_on='fin',
+                            right_on='t_inicio', by='agente', direction='backward', allow_exact_matches=False)
+    cruce = pd.concat([por_inicio, por_fin], ignore_index=True).dropna(subset=['turno'])
+    cruce = cruce.drop_duplicates(['fila', 'turno'])
+
+    solape = (np.minimum(cruce['fin'].to_numpy(), cruce['t_fin'].to_numpy())
+              - np.maximum(cruce['inicio'].to_numpy(), cruce['t_inicio'].to_numpy()))
+    horas = pd.Series(solape / np.timedelta64(1, 's') / SEGUNDOS_HORA).clip(lower=0)
+    horas = horas.groupby(cruce['turno'].astype(int).to_numpy()).sum()
+    return horas.reindex(turnos.index, fill_value=0.0)
+
+
+def calcular_adherencia(conexiones, turnos):
+    """Horas programadas vs. conectadas por agente y día.
+
+    - horas_turno: largo de la ventana del horario; horas_programadas: Total_horas
+      (o el largo de la ventana si no viene).
+    - horas_conectadas: tiempo en estados distintos de Offline (sin contar dos veces los
+      intervalos solapados), por día de inicio.
+    - horas_en_turno: la parte de ese tiempo que cae dentro de la ventana.
+    - adherencia = horas_en_turno / horas_turno; conformidad = horas_conectadas / horas_programadas.
+
+    Incluye los días con turno y sin conexión, y los días con conexión sin turno.
+    """
+    conexiones = unir_intervalos(conexiones)
+    turnos = turnos.assign(horas_en_turno=_horas_en_turno(conexiones, turnos))
+
+    conectadas = (conexiones['fin'] - conexiones['inicio']).dt.total_seconds() / SEGUNDOS_HORA
+    por_dia = conectadas.groupby([conexiones['agent_email'], conexiones['inicio'].dt.floor('D')]).sum()
+    por_dia = por_dia.rename('horas_conectadas').rename_axis(['agent_email', 'dia']).reset_index()
+    # Formatear la fecha después de agregar: una vez por agente y día, no por intervalo
+    por_dia['fecha'] = por_dia.pop('dia').dt.strftime('%Y-%m-%d')
+
+    resultado = turnos.merge(por_dia, on=['agent_email', 'fecha'], how='outer')
+    resultado[['horas_conectadas', 'horas_en_turno']] = resultado[['horas_conectadas', 'horas_en_turno']].fillna(0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado['adherencia'] = resultado['horas_en_turno'] / resultado['horas_turno'].where(resultado['horas_turno'] > 0)
+        resultado['conformidad'] = resultado['horas_conectadas'] / resultado['horas_programadas'].where(resultado['horas_programadas'] > 0)
+
+    columnas_horas = ['horas_turno', 'horas_programadas', 'horas_conectadas', 'horas_en_turno']
+    resultado[columnas_horas] = resultado[columnas_horas].round(2)
+    resultado[['adherencia', 'conformidad']] = resultado[['adherencia', 'conformidad']].round(4)
+    return resultado.sort_values(['agent_email', 'fecha'], kind='stable')[COLUMNAS_SALIDA].reset_index(drop=True)
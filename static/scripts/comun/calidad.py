@@ -0,0 +1,107 @@
+import json
+import os
+from collections import Counter
+
+# Máximo de valores distintos que se guardan por histograma de rechazos
+MAX_VALORES_HISTOGRAMA = 20
+
+
+def ruta_reporte(ruta_salida):
+    """Devuelve la ruta del reporte de calidad asociado a un archivo de salida"""
+    return f"{os.path.splitext(ruta_salida)[0]}_calidad.json"
+
+
+class ReporteCalidad:
+    """Acumula métricas de calidad mientras un script limpia un archivo.
+
+    Los scripts registran los conteos sobre los datos que ya tienen en memoria
+    (o fila a fila en los scripts por streaming), así el reporte no requiere
+    volver a leer la entrada ni la salida.
+    """
+
+    def __init__(self, script, archivo):
+        self.script = script
+        self.archivo = archivo
+        self.filas_entrada = 0
+        self.filas_salida = 0
+        self.nulos = {}
+        self.rechazos = {}
+        self.advertencias = []
+
+    def registrar_nulos(self, etapa, df, nombres=None):
+        """Guarda los nulos por columna de un DataFrame para la etapa 'antes' o 'despues'"""
+        conteos = df.isna().sum().tolist()
+        nombres = nombres or [str(col) for col in df.columns]
+        for nombre, conteo in zip(nombres, conteos):
+            self.nulos.setdefault(nombre, {})[etapa] = int(conteo)
+
+    def contar_nulo(self, etapa, columna, cantidad=1):
+        """Incrementa el conteo de nulos de una columna (modo streaming)"""
+        conteos = self.nulos.setdefault(columna, {})
+        conteos[etapa] = conteos.get(etapa, 0) + cantidad
+
+    def registrar_rechazos(self, columna, antes, despues):
+        """Cuenta los valores que tenían dato y quedaron nulos tras la limpieza"""
+        rechazados = antes[antes.notna() & despues.isna()]
+        if len(rechazados):
+            histograma = self.rechazos.setdefault(columna, Counter())
+            histograma.update(rechazados.astype(str).value_counts().to_dict())
+
+    def registrar_valores(self, columna, valores):
+        """Agrega al histograma de una columna los valores de una Serie (ej. LOB sin mapear)"""
+        if len(valores):
+            histograma = self.rechazos.setdefault(columna, Counter())
+            histograma.update(valores.astype(str).value_counts().to_dict())
+
+    def contar_rechazo(self, columna, valor):
+        """Agrega un valor rechazado al histograma de la columna (modo streaming)"""
+        self.rechazos.setdefault(columna, Counter())[str(valor)] += 1
+
+    def advertir(self, mensaje):
+        self.advertencias.append(mensaje)
+
+    def a_dict(self):
+        rechazos = {}
+        for columna, histograma in self.rechazos.items():
+            top = histograma.most_common(MAX_VALORES_HISTOGRAMA)
+            rechazos[columna] = {
+                'total': sum(histograma.values()),
+                'distintos': len(histograma),
+                'valores': dict(top),
+            }
+        return {
+            'script': self.script,
+            'archivo': self.archivo,
+            'filas_entrada': self.filas_entrada,
+            'filas_salida': self.filas_salida,
+            'nulos': self.nulos,
+            'rechazos': rechazos,
+            'advertencias': self.advertencias,
+        }
+
+    def guardar(self, ruta_salida):
+        """Escribe el reporte como JSON junto al archivo de salida"""
+        ruta = ruta_reporte(ruta_salida)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.a_dict(), f, ensure_ascii=False, indent=2)
+        return ruta
+
+
+def agregar_advertencias(ruta_salida, advertencias):
+    """Agrega advertencias externas (ej. de la validación previa) al reporte de un archivo"""
+    ruta = ruta_reporte(ruta_salida)
+    reporte = cargar_reporte(ruta)
+    if reporte is None or not advertencias:
+        return
+    reporte['advertencias'] = advertencias + reporte.get('advertencias', [])
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+
+def cargar_reporte(ruta):
+    """Lee un reporte de calidad; devuelve None si no existe o está corrupto"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
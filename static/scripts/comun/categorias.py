@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+def tipos_categoricos(muestra, posiciones, encabezado=True):
+    """dtype para pd.read_csv que lee como categóricas las columnas indicadas por posición.
+
+    Las columnas repetitivas (emails, LOB, BPO, estados...) tienen pocos valores
+    distintos: como categóricas cada valor se guarda una sola vez y las filas
+    solo llevan un código entero. Con ``encabezado=False`` (lectura con
+    header=None) las claves son las posiciones; si no, se toman los nombres del
+    encabezado de la muestra. Los nombres vacíos o repetidos se omiten porque
+    pandas los renombra al leer.
+    """
+    if not encabezado:
+        return {posicion: 'category' for posicion in posiciones}
+    nombres = muestra.encabezado
+    return {
+        nombres[posicion]: 'category'
+        for posicion in posiciones
+        if posicion < len(nombres) and nombres[posicion] and nombres.count(nombres[posicion]) == 1
+    }
+
+
+def inferir_categorias(df):
+    """Devuelve a dtype numérico las columnas categóricas cuyos valores son todos números.
+
+    Con dtype='category' pandas deja siempre las categorías como texto; una
+    columna que sin categorías se habría leído como numérica vuelve a serlo
+    (int64, o float64 si tiene vacíos), igual que con la inferencia normal, y
+    las validaciones de tipo de cada script la tratan como antes.
+    """
+    for columna in df.columns:
+        serie = df[columna]
+        if not isinstance(serie.dtype, pd.CategoricalDtype) or serie.cat.categories.empty:
+            continue
+        try:
+            pd.to_numeric(serie.cat.categories)
+        except (ValueError, TypeError):
+            continue
+        df[columna] = pd.to_numeric(serie.astype(object))
+    return df
+
+
+def aplicar_unicos(serie, funcion):
+    """Equivale a ``serie.apply(funcion)`` pero llama a la función una vez por valor distinto.
+
+    Factoriza la serie (códigos + valores únicos), transforma solo los únicos y
+    reparte el resultado a las filas con ``take``: el costo de las validaciones
+    en Python depende de cuántos valores distintos hay, no de cuántas filas.
+    La función debe ser pura (mismo resultado para el mismo valor). En una
+    columna object, None y NaN se transforman por separado, como con apply
+    (``str(None)`` no es ``str(nan)``); en una categórica los nulos quedan
+    nulos sin llamar a la función, también como apply. Si la entrada es
+    categórica y el resultado es texto, la salida sigue siendo categórica.
+    """
+    if serie.empty:
+        return serie.apply(funcion)
+    categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=categorica)
+    unicos = np.asarray(unicos, dtype=object)
+    if serie.dtype == object:
+        codigos, unicos = _separar_none(serie.to_numpy(), codigos, unicos)
+    transformados = pd.Series(unicos, dtype=object).apply(funcion)
+    if categorica and (codigos < 0).any():
+        # Como apply, los nulos de una categórica quedan nulos sin pasar por la función
+        codigos = np.where(codigos < 0, len(transformados), codigos)
+        transformados = pd.Series(np.append(transformados.to_numpy(dtype=object), np.nan)).infer_objects()
+    if categorica and transformados.dtype == object:
+        transformados = transformados.astype('category')
+        resultado = pd.Categorical.from_codes(
+            transformados.cat.codes.to_numpy().take(codigos),
+            dtype=transformados.dtype,
+        )
+    else:
+        resultado = transformados.to_numpy().take(codigos)
+    return pd.Series(resultado, index=serie.index, name=serie.name)
+
+
+def _separar_none(valores, codigos, unicos):
+    """factorize junta None y NaN en un solo nulo: les da códigos distintos, cada uno con su valor"""
+    nones = valores == None  # noqa: E711 (comparación elemento a elemento)
+    posiciones_nulas = np.flatnonzero(pd.isna(unicos))
+    if not nones.any() or not len(posiciones_nulas):
+        return codigos, unicos
+    nulo = posiciones_nulas[0]
+    otros_nulos = (codigos == nulo) & ~nones
+    unicos = np.append(unicos, np.array([None], dtype=object))
+    if otros_nulos.any():
+        unicos[nulo] = valores[np.argmax(otros_nulos)]
+    codigos = np.where(nones, len(unicos) - 1, codigos)
+    return codigos, unicos
@@ -0,0 +1,72 @@
+import re
+from functools import lru_cache
+
+# Puntaje mínimo y margen sobre el segundo candidato para aceptar una detección
+PUNTAJE_MINIMO = 3.0
+MARGEN_MINIMO = 0.5
+
+
+@lru_cache(maxsize=None)
+def _patron(expresion):
+    return re.compile(expresion, re.IGNORECASE)
+
+
+def puntuar(muestra, esquema):
+    """Compara una Muestra con el ESQUEMA declarado por un script.
+
+    Claves del esquema:
+    - ``columnas``: cantidad esperada de columnas (3 puntos si coincide
+      exacto; 1.5 si hay más y ``admite_extra`` es True).
+    - ``encabezados``: nombres conocidos; suma hasta 3 puntos según la
+      proporción presente en la primera fila.
+    - ``patrones``: {índice: regex} que deben cumplir las celdas de datos;
+      suma hasta 2 puntos según la proporción de celdas que coinciden.
+    - ``encabezado``: False si el archivo puede no traer fila de títulos
+      (entonces los patrones también se evalúan en la primera fila).
+    """
+    if not muestra.filas:
+        return 0.0
+
+    puntaje = 0.0
+    columnas = len(muestra.encabezado)
+    esperadas = esquema.get('columnas')
+    if esperadas:
+        if columnas == esperadas:
+            puntaje += 3
+        elif columnas > esperadas and esquema.get('admite_extra'):
+            puntaje += 1.5
+
+    encabezados = esquema.get('encabezados')
+    if encabezados:
+        presentes = {str(celda).strip().lower() for celda in muestra.encabezado}
+        conocidos = [nombre.lower() for nombre in encabezados]
+        puntaje += 3 * sum(nombre in presentes for nombre in conocidos) / len(conocidos)
+
+    patrones = esquema.get('patrones')
+    filas = muestra.filas if esquema.get('encabezado') is False else muestra.datos
+    if patrones and filas:
+        proporciones = []
+        for indice, expresion in patrones.items():
+            celdas = [fila[indice].strip() for fila in filas if len(fila) > indice and fila[indice].strip()]
+            if celdas:
+                coinciden = sum(bool(_patron(expresion).search(celda)) for celda in celdas)
+                proporciones.append(coinciden / len(celdas))
+            else:
+                proporciones.append(0.0)
+        puntaje += 2 * sum(proporciones) / len(proporciones)
+
+    return round(puntaje, 3)
+
+
+def detectar(muestra, esquemas):
+    """Devuelve (script, puntajes) con el script que mejor encaja, o (None, puntajes) si es dudoso"""
+    puntajes = {nombre: puntuar(muestra, esquema) for nombre, esquema in esquemas.items()}
+    if not puntajes:
+        return None, puntajes
+
+    ordenados = sorted(puntajes.items(), key=lambda item: item[1], reverse=True)
+    mejor, puntaje = ordenados[0]
+    segundo = ordenados[1][1] if len(ordenados) > 1 else 0.0
+    if puntaje < PUNTAJE_MINIMO or puntaje - segundo < MARGEN_MINIMO:
+        return None, puntajes
+    return mejor, puntajes
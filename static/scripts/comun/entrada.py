@@ -0,0 +1,157 @@
+import contextlib
+import contextvars
+import gzip
+import io
+import os
+import zipfile
+
+try:
+    import zstandard
+except ImportError:  # Dependencia opcional: solo necesaria para archivos .zst
+    zstandard = None
+
+# Extensiones de entrada aceptadas (CSV plano o comprimido)
+EXTENSIONES_COMPRIMIDAS = ('.gz', '.zst')
+EXTENSIONES_ENTRADA = ('.csv', '.zip') + EXTENSIONES_COMPRIMIDAS
+
+# Observador opcional de la lectura (lo instala el motor para reportar progreso):
+# recibe (entrada, bytes leídos, líneas leídas) a medida que el script consume el archivo
+_observador = contextvars.ContextVar('observador_lectura', default=None)
+
+
+def es_entrada_valida(nombre):
+    """Indica si un archivo es un CSV o un CSV comprimido que los scripts pueden leer"""
+    return nombre.lower().endswith(EXTENSIONES_ENTRADA)
+
+
+def nombre_csv(nombre):
+    """Nombre lógico del CSV contenido en un archivo comprimido (x.csv.gz -> x.csv)"""
+    base = nombre
+    if base.lower().endswith(EXTENSIONES_COMPRIMIDAS):
+        base = os.path.splitext(base)[0]
+    if not base.lower().endswith('.csv'):
+        base = f"{base}.csv"
+    return base
+
+
+class Entrada:
+    """Un CSV de entrada, posiblemente dentro de un .gz, .zst o .zip.
+
+    ``abrir()`` devuelve un stream binario que se descomprime a medida que se
+    lee, así el archivo expandido nunca se escribe en disco.
+    """
+
+    def __init__(self, ruta, nombre, miembro=None):
+        self.ruta = ruta
+        self.nombre = nombre
+        self.miembro = miembro
+
+    def abrir(self):
+        stream = self._abrir()
+        observador = _observador.get()
+        if observador is None:
+            return stream
+        return io.BufferedReader(_LecturaObservada(self, stream, observador))
+
+    def _abrir(self):
+        ruta = self.ruta.lower()
+        if self.miembro is not None:
+            return io.BufferedReader(_MiembroZip(self.ruta, self.miembro))
+        if ruta.endswith('.gz'):
+            return gzip.open(self.ruta, 'rb')
+        if ruta.endswith('.zst'):
+            if zstandard is None:
+                raise ImportError("Se requiere el paquete 'zstandard' para leer archivos .zst")
+            return zstandard.ZstdDecompressor().stream_reader(open(self.ruta, 'rb'), closefd=True)
+        return open(self.ruta, 'rb')
+
+    def abrir_texto(self, encoding='utf-8'):
+        return io.TextIOWrapper(self.abrir(), encoding=encoding, newline='')
+
+    def __repr__(self):
+        return f"Entrada({self.ruta!r}, {self.nombre!r})"
+
+
+class _MiembroZip(io.RawIOBase):
+    """Stream de un miembro de un ZIP que también cierra el ZIP contenedor"""
+
+    def __init__(self, ruta, miembro):
+        self._zip = zipfile.ZipFile(ruta)
+        self._stream = self._zip.open(miembro)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        datos = self._stream.read(len(buffer))
+        buffer[:len(datos)] = datos
+        return len(datos)
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self._zip.close()
+        super().close()
+
+
+class _LecturaObservada(io.RawIOBase):
+    """Stream que cuenta bytes y saltos de línea leídos y avisa al observador"""
+
+    def __init__(self, entrada, stream, observador):
+        self._entrada = entrada
+        self._stream = stream
+        self._observador = observador
+        self.bytes_leidos = 0
+        self.lineas = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        datos = self._stream.read(len(buffer))
+        buffer[:len(datos)] = datos
+        if datos:
+            self.bytes_leidos += len(datos)
+            self.lineas += datos.count(b'\n')
+            self._observador(self._entrada, self.bytes_leidos, self.lineas)
+        return len(datos)
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+@contextlib.contextmanager
+def observar_lectura(observador):
+    """Durante el bloque, cada Entrada abierta en este hilo reporta su avance a ``observador``"""
+    token = _observador.set(observador)
+    try:
+        yield
+    finally:
+        _observador.reset(token)
+
+
+def entradas_de_archivo(ruta):
+    """Devuelve las entradas CSV contenidas en un archivo (varias si es un ZIP)"""
+    nombre = os.path.basename(ruta)
+    if nombre.lower().endswith('.zip'):
+        with zipfile.ZipFile(ruta) as zf:
+            return [
+                Entrada(ruta, os.path.basename(info.filename), miembro=info.filename)
+                for info in zf.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith('.csv')
+                and not info.filename.startswith('__MACOSX/')
+            ]
+    return [Entrada(ruta, nombre_csv(nombre))]
+
+
+def listar_entradas(carpeta):
+    """Lista las entradas CSV de una carpeta, abriendo los comprimidos sin extraerlos"""
+    entradas = []
+    for nombre in sorted(os.listdir(carpeta)):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.isfile(ruta) and es_entrada_valida(nombre):
+            entradas.extend(entradas_de_archivo(ruta))
+    return entradas
@@ -0,0 +1,143 @@
+import codecs
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+except ImportError:  # Dependencia opcional: sin ella se escribe siempre con pandas
+    pa = None
+
+# Backend de escritura de los CSV limpios para todos los scripts: 'pyarrow' o 'pandas'
+ESCRITOR_CSV = os.environ.get('CSV_WRITER', 'pyarrow')
+
+ENCODINGS_UTF8 = {'utf-8': b'', 'utf8': b'', 'utf-8-sig': codecs.BOM_UTF8}
+
+
+def escribir_csv(df, ruta, encoding='utf-8', escritor=None):
+    """Escribe ``df`` como ``df.to_csv(ruta, index=False, encoding=encoding)``.
+
+    Con el escritor 'pyarrow' las columnas se codifican en C (más rápido que
+    el escritor de pandas, que formatea fila por fila en Python) pero con el
+    mismo formato byte a byte: floats con ``repr`` ('1.0', '1e-05'), enteros
+    y Int64 sin '.0', nulos como campo vacío, BOM con 'utf-8-sig' y comillas
+    solo donde el csv de Python las pone. Lo que no se puede reproducir con
+    certeza (valores que requieren comillas, tipos mixtos, fechas, una sola
+    columna, otros encodings) se escribe con pandas. Devuelve el escritor
+    usado.
+    """
+    escritor = escritor or ESCRITOR_CSV
+    if escritor == 'pyarrow' and pa is not None and encoding.lower() in ENCODINGS_UTF8:
+        tabla = _tabla_arrow(df)
+        if tabla is not None:
+            try:
+                with open(ruta, 'wb') as f:
+                    f.write(ENCODINGS_UTF8[encoding.lower()])
+                    f.write(_encabezado(df.columns).encode('utf-8'))
+                    pa_csv.write_csv(tabla, f, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+                return 'pyarrow'
+            except pa.ArrowInvalid:
+                pass  # Algún valor necesita comillas: pandas reescribe el archivo completo
+    df.to_csv(ruta, index=False, encoding=encoding)
+    return 'pandas'
+
+
+def ruta_en_formato(ruta, formato):
+    """``ruta`` con la extensión del formato de salida ('csv' la deja como está)"""
+    return ruta if formato == 'csv' else f"{os.path.splitext(ruta)[0]}.{formato}"
+
+
+def escribir_salida(df, ruta, encoding='utf-8', formato='csv'):
+    """Escribe la salida limpia de un script en ``formato`` y devuelve la ruta escrita.
+
+    Con 'csv' es ``escribir_csv(df, ruta, encoding)``; con 'parquet' escribe
+    ``df`` directamente en ``<ruta sin extensión>.parquet`` conservando sus
+    tipos, sin pasar por el CSV.
+    """
+    if formato == 'parquet':
+        ruta = ruta_en_formato(ruta, formato)
+        escribir_parquet(df, ruta)
+    else:
+        escribir_csv(df, ruta, encoding=encoding)
+    return ruta
+
+
+def escribir_parquet(df, ruta):
+    """Escribe ``df`` como Parquet (requiere pyarrow) con los tipos del DataFrame.
+
+    Las categóricas quedan como columnas de diccionario y los números como
+    números. Una columna object con valores de tipos mezclados (ej. texto y
+    números) no tiene tipo en Arrow: se guarda como texto, con el mismo valor
+    que tendría en el CSV, y sus nulos siguen nulos.
+    """
+    if pa is None:
+        raise ImportError("La salida Parquet requiere el paquete 'pyarrow'")
+    try:
+        df.to_parquet(ruta, index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for posicion in range(len(df.columns)):
+            serie = df.iloc[:, posicion]
+            if pd.api.types.is_object_dtype(serie.dtype):
+                try:
+                    pa.array(serie, from_pandas=True)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    df.isetitem(posicion, serie.map(str, na_action='ignore'))
+        df.to_parquet(ruta, index=False)
+
+
+def _encabezado(columnas):
+    salida = io.StringIO()
+    csv.writer(salida, lineterminator='\n').writerow([str(columna) for columna in columnas])
+    return salida.getvalue()
+
+
+def _tabla_arrow(df):
+    """Tabla de pyarrow con cada columna ya en la forma que escribiría pandas, o None"""
+    if len(df.columns) < 2 or isinstance(df.columns, pd.MultiIndex) or os.linesep != '\n':
+        # Con una sola columna el csv de Python pone "" en los vacíos
+        return None
+    columnas = []
+    for posicion in range(len(df.columns)):
+        columna = _columna_arrow(df.iloc[:, posicion])
+        if columna is None:
+            return None
+        columnas.append(columna)
+    return pa.Table.from_arrays(columnas, names=[str(nombre) for nombre in df.columns])
+
+
+def _columna_arrow(serie):
+    dtype = serie.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        if not pd.api.types.is_object_dtype(dtype.categories.dtype):
+            return None
+        serie = serie.astype(object)
+        dtype = serie.dtype
+    if dtype == np.float64:
+        valores = serie.to_numpy()
+        return pa.array(valores.astype(str), mask=np.isnan(valores))
+    if dtype == np.bool_:
+        return pa.array(np.where(serie.to_numpy(), 'True', 'False'))
+    if pd.api.types.is_integer_dtype(dtype):
+        # int64 de numpy o Int64 de pandas (con nulos): pyarrow los escribe sin decimales
+        return pa.array(serie, from_pandas=True)
+    if pd.api.types.is_object_dtype(dtype) or isinstance(dtype, pd.StringDtype):
+        try:
+            columna = pa.array(serie, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            return None
+        if pa.types.is_null(columna.type):
+            return columna.cast(pa.string())
+        if pa.types.is_string(columna.type) or pa.types.is_large_string(columna.type):
+            return columna
+        if pa.types.is_boolean(columna.type):
+            # bool de Python con nulos (columna object): pandas escribe True/False y vacío
+            return pa_compute.if_else(columna, 'True', 'False')
+        if pa.types.is_integer(columna.type):
+            return columna
+    return None
@@ -0,0 +1,92 @@
+import csv
+import glob
+import os
+
+# Las tablas de resumen de una salida se llaman <salida sin extensión>_resumen_<nombre>.csv
+SUFIJO_RESUMEN = '_resumen_'
+
+
+def ruta_resumen(ruta_salida, nombre):
+    """Devuelve la ruta de la tabla de resumen ``nombre`` asociada a un archivo de salida"""
+    return f"{os.path.splitext(ruta_salida)[0]}{SUFIJO_RESUMEN}{nombre}.csv"
+
+
+def rutas_resumen(ruta_salida):
+    """Tablas de resumen existentes de un archivo de salida"""
+    patron = glob.escape(os.path.splitext(ruta_salida)[0]) + SUFIJO_RESUMEN + '*.csv'
+    return sorted(glob.glob(patron))
+
+
+def mover_resumenes(origen, destino):
+    """Mueve los resúmenes de la salida ``origen`` junto a ``destino`` (renombrada); devuelve las rutas nuevas"""
+    base_origen = os.path.splitext(origen)[0]
+    base_destino = os.path.splitext(destino)[0]
+    movidas = []
+    for ruta in rutas_resumen(origen):
+        nueva = base_destino + ruta[len(base_origen):]
+        os.replace(ruta, nueva)
+        movidas.append(nueva)
+    return movidas
+
+
+def resumir(df, claves, **agregaciones):
+    """``groupby(claves).agg(**agregaciones)`` sobre el DataFrame ya limpio.
+
+    Las claves nulas forman su propio grupo (así los totales cuadran con el
+    archivo) y con claves categóricas solo salen las combinaciones presentes.
+    Las sumas de floats se redondean a 4 decimales (sin restos como 0.30000000000000004).
+    """
+    resumen = df.groupby(claves, observed=True, dropna=False, sort=True).agg(**agregaciones).reset_index()
+    decimales = resumen.select_dtypes('float').columns
+    resumen[decimales] = resumen[decimales].round(4)
+    return resumen
+
+
+def guardar_resumen(ruta_salida, nombre, df):
+    """Escribe la tabla de resumen ``nombre`` junto al archivo de salida"""
+    # Import diferido: los scripts por streaming usan este módulo sin cargar pandas
+    from comun.escritura import escribir_csv
+
+    ruta = ruta_resumen(ruta_salida, nombre)
+    escribir_csv(df, ruta)
+    return ruta
+
+
+class AcumuladorResumen:
+    """Totales por clave acumulados fila a fila, para los scripts por streaming.
+
+    Cada ``agregar`` suma una fila a su grupo: cuenta las filas y suma los
+    valores numéricos (los vacíos o no numéricos no suman), así el resumen
+    sale en la misma pasada que escribe el CSV limpio. Se escribe con el
+    módulo csv, sin pandas.
+    """
+
+    def __init__(self, claves, valores=()):
+        self.claves = list(claves)
+        self.valores = list(valores)
+        self.grupos = {}
+
+    def agregar(self, clave, *valores):
+        totales = self.grupos.get(clave)
+        if totales is None:
+            totales = self.grupos[clave] = [0] + [0.0] * len(self.valores)
+        totales[0] += 1
+        for indice, valor in enumerate(valores, start=1):
+            try:
+                totales[indice] += float(valor)
+            except (TypeError, ValueError):
+                pass
+
+    def guardar(self, ruta_salida, nombre):
+        """Escribe la tabla de resumen ``nombre`` junto al archivo de salida"""
+        ruta = ruta_resumen(ruta_salida, nombre)
+        with open(ruta, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.claves + ['filas'] + self.valores)
+            for clave, totales in sorted(self.grupos.items(), key=_orden):
+                writer.writerow(list(clave) + totales)
+        return ruta
+
+
+def _orden(item):
+    return tuple('' if valor is None else str(valor) for valor in item[0])
@@ -0,0 +1,118 @@
+import codecs
+import csv
+import io
+import re
+
+# Bytes que se leen del inicio del archivo para inspeccionarlo sin parsearlo completo
+BYTES_MUESTRA = 64 * 1024
+# Filas de datos que se conservan de la muestra
+FILAS_MUESTRA = 50
+# Codificaciones que se prueban en orden (cp1252 cubre las exportaciones de Excel en español)
+CODIFICACIONES = ('utf-8', 'cp1252', 'latin-1')
+
+PATRON_DECIMAL_COMA = re.compile(r'^-?\d+,\d+$')
+PATRON_DECIMAL_PUNTO = re.compile(r'^-?\d+\.\d+$')
+
+
+class Muestra:
+    """Encabezado y primeras filas de un CSV, obtenidos leyendo solo sus primeros KB"""
+
+    def __init__(self, filas, delimitador, codificacion, bom, decimal='.'):
+        self.filas = filas
+        self.delimitador = delimitador
+        self.codificacion = codificacion
+        self.bom = bom
+        self.decimal = decimal
+
+    @property
+    def encabezado(self):
+        return self.filas[0] if self.filas else []
+
+    @property
+    def datos(self):
+        return self.filas[1:]
+
+    def __repr__(self):
+        return (f"Muestra(columnas={len(self.encabezado)}, filas={len(self.filas)}, "
+                f"delimitador={self.delimitador!r}, codificacion={self.codificacion!r}, "
+                f"decimal={self.decimal!r})")
+
+    @property
+    def codificacion_lectura(self):
+        """Codificación para abrir el archivo (utf-8-sig descarta el BOM si lo hay)"""
+        return 'utf-8-sig' if self.codificacion == 'utf-8' else self.codificacion
+
+    def opciones_pandas(self):
+        """Argumentos de pd.read_csv para leer el archivo con su formato nativo"""
+        return {
+            'sep': self.delimitador,
+            'decimal': self.decimal,
+            'encoding': self.codificacion_lectura,
+        }
+
+
+def decodificar(datos, completo):
+    """Decodifica la muestra; devuelve (texto, codificación, tenía BOM)"""
+    bom = datos.startswith(codecs.BOM_UTF8)
+    try:
+        return datos.decode('utf-8-sig'), 'utf-8', bom
+    except UnicodeDecodeError as e:
+        # El corte de la muestra puede caer en medio de un carácter multibyte
+        if not completo and e.start >= len(datos) - 3:
+            try:
+                return datos[:e.start].decode('utf-8-sig'), 'utf-8', bom
+            except UnicodeDecodeError:
+                pass
+    for codificacion in CODIFICACIONES[1:]:
+        try:
+            return datos.decode(codificacion), codificacion, bom
+        except UnicodeDecodeError:
+            continue
+
+
+def detectar_delimitador(texto):
+    try:
+        return csv.Sniffer().sniff(texto[:8192], delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+
+def detectar_decimal(filas):
+    """Separador decimal predominante entre las celdas numéricas de la muestra"""
+    coma = punto = 0
+    for fila in filas:
+        for celda in fila:
+            celda = celda.strip()
+            if PATRON_DECIMAL_COMA.match(celda):
+                coma += 1
+            elif PATRON_DECIMAL_PUNTO.match(celda):
+                punto += 1
+    return ',' if coma > punto else '.'
+
+
+def sondear(entrada, tamano=BYTES_MUESTRA):
+    """Lee los primeros ``tamano`` bytes de una Entrada y detecta su formato.
+
+    En una sola pasada sobre la muestra se determinan la codificación, el
+    delimitador y el separador decimal, para que los scripts configuren el
+    parser (``Muestra.opciones_pandas``) en lugar de corregir el texto
+    columna por columna después de leerlo.
+    """
+    with entrada.abrir() as f:
+        datos = f.read(tamano + 1)
+    completo = len(datos) <= tamano
+    datos = datos[:tamano]
+
+    texto, codificacion, bom = decodificar(datos, completo)
+    if not completo and '\n' in texto:
+        # Descartar la última línea, que quedó cortada
+        texto = texto[:texto.rfind('\n') + 1]
+
+    delimitador = detectar_delimitador(texto)
+    lector = csv.reader(io.StringIO(texto), delimiter=delimitador)
+    filas = []
+    for fila in lector:
+        filas.append(fila)
+        if len(filas) > FILAS_MUESTRA:
+            break
+    return Muestra(filas, delimitador, codificacion, bom, detectar_decimal(filas[1:]))
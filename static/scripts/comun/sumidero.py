@@ -0,0 +1,135 @@
+import sqlite3
+
+# Filas por INSERT; lotes grandes reducen el costo por transacción
+TAMANO_LOTE = 5000
+
+
+def nombres_unicos(columnas):
+    """Normaliza encabezados vacíos o repetidos para que sean columnas SQL válidas"""
+    nombres = []
+    for indice, col in enumerate(columnas):
+        nombre = str(col).strip() or f"columna_{indice + 1}"
+        base, contador = nombre, 1
+        while nombre in nombres:
+            contador += 1
+            nombre = f"{base}_{contador}"
+        nombres.append(nombre)
+    return nombres
+
+
+def tipo_sqlite(dtype):
+    """Traduce un dtype de pandas a la afinidad de columna de SQLite"""
+    tipo = str(dtype).lower()
+    if tipo.startswith(('int', 'uint', 'bool')):
+        return 'INTEGER'
+    if tipo.startswith('float'):
+        return 'REAL'
+    return 'TEXT'
+
+
+class SumideroSQLite:
+    """Carga filas limpias en una tabla SQLite con inserción por lotes.
+
+    Si se indica una clave (lista de columnas), la tabla recibe un índice
+    único sobre ella y cada lote se escribe con ``INSERT ... ON CONFLICT DO
+    UPDATE``, de modo que subir de nuevo el mismo archivo (o uno que se solapa)
+    actualiza las filas existentes en lugar de duplicarlas. Las filas con la
+    clave incompleta (algún NULL) siempre se insertan, como en SQL estándar.
+    """
+
+    def __init__(self, ruta, tabla, columnas, clave=None, tipos=None, tamano_lote=TAMANO_LOTE):
+        self.ruta = ruta
+        self.tabla = tabla
+        self.columnas = nombres_unicos(columnas)
+        self.clave = [str(col) for col in clave] if clave else []
+        self.tipos = tipos or {}
+        self.tamano_lote = tamano_lote
+        self.filas_escritas = 0
+        self._lote = []
+
+        faltantes = [col for col in self.clave if col not in self.columnas]
+        if faltantes:
+            raise ValueError(f"La clave {faltantes} no existe en las columnas de {tabla}")
+
+        self.conexion = sqlite3.connect(ruta, timeout=30)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute('PRAGMA synchronous=NORMAL')
+        self._preparar_tabla()
+        self._sql = self._sentencia_insert()
+
+    def _preparar_tabla(self):
+        definicion = ', '.join(f'"{col}" {self.tipos.get(col, "TEXT")}' for col in self.columnas)
+        self.conexion.execute(f'CREATE TABLE IF NOT EXISTS "{self.tabla}" ({definicion})')
+
+        # Agregar columnas nuevas si la tabla viene de una versión anterior del script
+        existentes = {fila[1] for fila in self.conexion.execute(f'PRAGMA table_info("{self.tabla}")')}
+        for col in self.columnas:
+            if col not in existentes:
+                self.conexion.execute(f'ALTER TABLE "{self.tabla}" ADD COLUMN "{col}" {self.tipos.get(col, "TEXT")}')
+
+        if self.clave:
+            nombre_indice = f"ux_{self.tabla}_{'_'.join(self.clave)}"
+            columnas_indice = ', '.join(f'"{col}"' for col in self.clave)
+            self.conexion.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS "{nombre_indice}" ON "{self.tabla}" ({columnas_indice})'
+            )
+        self.conexion.commit()
+
+    def _sentencia_insert(self):
+        columnas = ', '.join(f'"{col}"' for col in self.columnas)
+        marcadores = ', '.join('?' for _ in self.columnas)
+        sql = f'INSERT INTO "{self.tabla}" ({columnas}) VALUES ({marcadores})'
+        if self.clave:
+            conflicto = ', '.join(f'"{col}"' for col in self.clave)
+            actualizables = [col for col in self.columnas if col not in self.clave]
+            if actualizables:
+                asignaciones = ', '.join(f'"{col}" = excluded."{col}"' for col in actualizables)
+                sql += f' ON CONFLICT ({conflicto}) DO UPDATE SET {asignaciones}'
+            else:
+                sql += f' ON CONFLICT ({conflicto}) DO NOTHING'
+        return sql
+
+    def agregar(self, fila):
+        """Agrega una fila (secuencia en el orden de ``columnas``) al lote actual"""
+        self._lote.append(fila)
+        if len(self._lote) >= self.tamano_lote:
+            self.vaciar()
+
+    def agregar_df(self, df):
+        """Carga un DataFrame completo, convirtiendo NaN/NA en NULL"""
+        valores = df.astype(object).where(df.notna(), None)
+        for inicio in range(0, len(valores), self.tamano_lote):
+            self._lote.extend(valores.iloc[inicio:inicio + self.tamano_lote].itertuples(index=False, name=None))
+            self.vaciar()
+
+    def vaciar(self):
+        if not self._lote:
+            return
+        with self.conexion:
+            self.conexion.executemany(self._sql, self._lote)
+        self.filas_escritas += len(self._lote)
+        self._lote = []
+
+    def cerrar(self):
+        try:
+            self.vaciar()
+        finally:
+            self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.cerrar()
+        else:
+            self._lote = []
+            self.conexion.close()
+
+
+def volcar_df(ruta, tabla, df, clave=None):
+    """Carga un DataFrame limpio en ``tabla``; devuelve la cantidad de filas escritas"""
+    tipos = dict(zip(nombres_unicos(df.columns), map(tipo_sqlite, df.dtypes)))
+    with SumideroSQLite(ruta, tabla, df.columns, clave=clave, tipos=tipos) as sumidero:
+        sumidero.agregar_df(df)
+    return sumidero.filas_escritas
@@ -0,0 +1,67 @@
+from comun.sondeo import sondear
+
+
+class ErrorValidacion(ValueError):
+    """El archivo no cumple el esquema del script; se rechaza antes de parsearlo completo"""
+
+    def __init__(self, archivo, errores):
+        super().__init__(f"{archivo}: {'; '.join(errores)}")
+        self.archivo = archivo
+        self.errores = errores
+
+    def __reduce__(self):
+        # Se reconstruye con sus argumentos al volver de un proceso de script_pool
+        return (type(self), (self.archivo, self.errores))
+
+
+def validar_muestra(muestra, esquema):
+    """Valida el encabezado y la muestra de un CSV contra el ESQUEMA de un script.
+
+    Devuelve (errores, advertencias). Los errores son condiciones con las que
+    el script igual fallaría u omitiría el archivo tras leerlo completo; las
+    advertencias no impiden procesarlo.
+    """
+    errores = []
+    advertencias = []
+
+    if not muestra.filas:
+        return ["El archivo está vacío"], advertencias
+
+    # La codificación, el delimitador y el decimal se detectan y se pasan al parser;
+    # solo se informan cuando no son los habituales
+    if muestra.codificacion != 'utf-8':
+        advertencias.append(f"Codificación {muestra.codificacion} detectada")
+    if muestra.delimitador != ',':
+        advertencias.append(f"Delimitador '{muestra.delimitador}' detectado")
+    if muestra.decimal != '.':
+        advertencias.append(f"Separador decimal '{muestra.decimal}' detectado")
+
+    columnas = len(muestra.encabezado)
+    minimo = esquema.get('minimo_columnas')
+    esperadas = esquema.get('columnas')
+    if minimo and columnas < minimo:
+        errores.append(f"Tiene {columnas} columnas; se requieren al menos {minimo}")
+    elif esperadas and columnas > esperadas:
+        advertencias.append(f"Tiene {columnas} columnas; se conservarán las primeras {esperadas}")
+    elif esperadas and columnas < esperadas:
+        advertencias.append(f"Tiene {columnas} columnas; se esperaban {esperadas}")
+
+    encabezados = esquema.get('encabezados')
+    if encabezados and esquema.get('encabezado', True):
+        presentes = {str(celda).strip().lower() for celda in muestra.encabezado}
+        faltantes = [nombre for nombre in encabezados if nombre.lower() not in presentes]
+        if len(faltantes) == len(encabezados):
+            advertencias.append("Ningún encabezado coincide con los nombres esperados")
+        elif faltantes:
+            advertencias.append(f"Encabezados no reconocidos: faltan {', '.join(faltantes[:5])}"
+                                + ("..." if len(faltantes) > 5 else ""))
+
+    return errores, advertencias
+
+
+def validar_entrada(entrada, esquema):
+    """Valida una Entrada leyendo solo sus primeros KB; lanza ErrorValidacion si no sirve"""
+    errores, advertencias = validar_muestra(sondear(entrada), esquema)
+    if errores:
+        raise ErrorValidacion(entrada.nombre, errores)
+    return advertencias
@@ -3,11 +3,22 @@ import pandas as pd
 from datetime import datetime
 import re
 
+from comun.calidad import ReporteCalidad
+from comun.categorias import aplicar_unicos
+from comun.entrada import listar_entradas
+from comun.escritura import escribir_salida
+from comun.sondeo import sondear
+from comun.sumidero import volcar_df
+
 # =============================================
 # VARIABLES GLOBALES (configuradas por Flask)
 # =============================================
 INPUT_FOLDER = '.'  # Será configurado por Flask
 OUTPUT_FOLDER = '.'  # Será configurado por Flask
+SINK_DATABASE = None  # Ruta SQLite opcional (configurada por Flask)
+SINK_TABLE = 'rq'
+SINK_KEY = None  # Columnas para upsert; None = solo insertar
+FORMATO = 'csv'  # Formato de la salida limpia: 'csv' o 'parquet' (configurado por clean.py)
 
 # Diccionario para conversión de meses
 MESES = {
@@ -25,6 +36,20 @@ MESES = {
     'dic': '12', 'diciembre': '12'
 }
 
+# Fechas correctamente convertidas por convertir_fecha
+PATRON_FECHA_SQL = r'^\d{4}-\d{2}-\d{2}$'
+
+# Huella del archivo de entrada para la detección automática (comun.deteccion)
+ESQUEMA = {
+    'columnas': 12,
+    'patrones': {
+        0: r'^-?\d+([.,]\d+)?$',
+        1: r'^-?\d+([.,]\d+)?$',
+        2: r'\d{1,2}[\s/-]?[a-z0-9]+[\s/-]?\d{2,4}',
+        4: r'^\d{1,2}:\d{2}:\d{2}$',
+    },
+}
+
 # =============================================
 # FUNCIÓN PRINCIPAL QUE EJECUTARÁ FLASK
 # =============================================
@@ -37,24 +62,31 @@ def procesar_archivos():
     print("="*50 + "\n")
     
     # Procesar todos los archivos CSV en la carpeta de entrada
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.endswith('.csv'):
-            input_path = os.path.join(INPUT_FOLDER, filename)
-            output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
-            
-            print(f"\n📄 Procesando archivo: {filename}")
-            try:
-                procesar_archivo(input_path, output_path)
-            except Exception as e:
-                print(f"❌ Error al procesar {filename}: {str(e)}")
+    for entrada in listar_entradas(INPUT_FOLDER):
+        filename = entrada.nombre
+        output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
+        
+        print(f"\n📄 Procesando archivo: {filename}")
+        try:
+            procesar_archivo(entrada, output_path)
+        except Exception as e:
+            print(f"❌ Error al procesar {filename}: {str(e)}")
 
     print("\n" + "="*50)
     print("✅ PROCESAMIENTO COMPLETADO - RQ")
     print("="*50)
 
-def procesar_archivo(input_path, output_path):
-    # Leer el archivo CSV
-    df = pd.read_csv(input_path)
+def procesar_archivo(entrada, output_path):
+    # Leer el archivo CSV (descomprimiendo al vuelo si viene comprimido)
+    # Codificación y delimitador detectados en una muestra del archivo; el decimal se
+    # normaliza abajo como texto para conservar la representación original ("2", no "2.0")
+    muestra = sondear(entrada)
+    with entrada.abrir() as f:
+        df = pd.read_csv(f, **dict(muestra.opciones_pandas(), decimal='.'))
+    
+    reporte = ReporteCalidad('RQ', entrada.nombre)
+    reporte.filas_entrada = len(df)
+    reporte.registrar_nulos('antes', df)
     
     # Procesar columna 1 y 2 (índices 0 y 1) - Reemplazar "," por "."
     for col in [0, 1]:
@@ -71,7 +103,10 @@ def procesar_archivo(input_path, output_path):
         print(f"🔍 Ejemplo de fechas antes de conversión: {ejemplos_antes}")
         
         # Convertir fechas usando nuestra función mejorada
-        df.iloc[:, 2] = df.iloc[:, 2].apply(convertir_fecha)
+        fechas_originales = df.iloc[:, 2]
+        df.iloc[:, 2] = aplicar_unicos(df.iloc[:, 2], convertir_fecha)
+        fallidas = fechas_originales.notna() & ~df.iloc[:, 2].astype(str).str.match(PATRON_FECHA_SQL)
+        reporte.registrar_valores(str(col_name), fechas_originales[fallidas])
         
         # Mostrar ejemplos después de la conversión
         ejemplos_despues = df.iloc[:2, 2].astype(str).tolist()
@@ -92,6 +127,7 @@ def procesar_archivo(input_path, output_path):
             print(f"⏰ Columna '{col_name}' - Formato cambiado a HH:MM")
         except:
             print(f"⚠️ No se pudo convertir el formato de hora en columna {col_name}, manteniendo original")
+            reporte.advertir(f"No se pudo convertir el formato de hora en columna {col_name}")
     
     # Columnas 6-10 (índices 5-9) - Se mantienen igual
     
@@ -107,8 +143,17 @@ def procesar_archivo(input_path, output_path):
         print(f"➡️ Columna '{col_name}' - Se mantiene sin cambios")
     
     # Guardar el archivo procesado
-    df.to_csv(output_path, index=False)
+    output_path = escribir_salida(df, output_path, formato=FORMATO)
     print(f"💾 Guardado como: {os.path.basename(output_path)}")
+    
+    reporte.filas_salida = len(df)
+    reporte.registrar_nulos('despues', df)
+    reporte.guardar(output_path)
+    
+    # Cargar en la base local (opcional)
+    if SINK_DATABASE:
+        filas = volcar_df(SINK_DATABASE, SINK_TABLE, df, SINK_KEY)
+        print(f"🗄️ {filas} filas cargadas en la tabla '{SINK_TABLE}'")
 
 def convertir_fecha(fecha_str):
     """Convierte una fecha en varios formatos al formato YYYY-MM-DD"""
@@ -4,11 +4,24 @@ import os
 import locale
 import re
 
+from comun.calidad import ReporteCalidad
+from comun.categorias import aplicar_unicos, tipos_categoricos, inferir_categorias
+from comun.entrada import listar_entradas
+from comun.escritura import escribir_salida
+from comun.resumen import guardar_resumen, resumir
+from comun.sondeo import sondear
+from comun.sumidero import volcar_df
+
 # =============================================
 # VARIABLES GLOBALES (configuradas por Flask)
 # =============================================
 INPUT_FOLDER = '.'  # Será configurado por Flask
 OUTPUT_FOLDER = '.'  # Será configurado por Flask
+SINK_DATABASE = None  # Ruta SQLite opcional (configurada por Flask)
+SINK_TABLE = 'conexiones'
+SINK_KEY = ['agent_email', 'status_start_time']  # Columnas para upsert; None = solo insertar
+RESUMEN = False  # Emitir tablas de resumen junto al CSV limpio (configurado por Flask)
+FORMATO = 'csv'  # Formato de la salida limpia: 'csv' o 'parquet' (configurado por clean.py)
 
 # =============================================
 # DICCIONARIO COMPLETO DE CAMBIOS PARA LA COLUMNA LOB
@@ -59,6 +72,31 @@ CAMBIOS_LOB = {
     "PS Curación": "PS_Curacion"
 }
 
+# Nombres finales de las 11 columnas, en orden
+COLUMNAS = [
+    "status_start_time", "status_end_time", "agent_email", "agent_status",
+    "interval_start_at", "duration_hrs", "bpo", "Service", "lob", "ID_LOB", "fecha"
+]
+
+# Columnas con pocos valores distintos, leídas como categóricas
+# (agent_email, agent_status, bpo, Service, lob)
+COLUMNAS_CATEGORICAS = [2, 3, 6, 7, 8]
+
+# Fechas correctamente convertidas por convertir_fecha
+PATRON_FECHA_SQL = r'^\d{4}-\d{2}-\d{2}$'
+
+# Huella del archivo de entrada para la detección automática (comun.deteccion)
+ESQUEMA = {
+    'columnas': 11,
+    'minimo_columnas': 11,
+    'admite_extra': True,
+    'patrones': {
+        2: r'@',
+        5: r'^-?\d+([.,]\d+)?$',
+        10: r"^'?\s*\d{1,2}\s+[a-z]{3,9}\s+\d{4}",
+    },
+}
+
 # =============================================
 # FUNCIÓN PRINCIPAL QUE EJECUTARÁ FLASK
 # =============================================
@@ -80,54 +118,75 @@ def procesar_archivos():
             print("⚠️ Advertencia: No se pudo configurar el locale en español. Se usará un método alternativo.")
 
     # Procesar todos los archivos CSV
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.lower().endswith('.csv'):
-            input_path = os.path.join(INPUT_FOLDER, filename)
-            output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
+    for entrada in listar_entradas(INPUT_FOLDER):
+        filename = entrada.nombre
+        output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
+        
+        print(f"\n📄 Procesando archivo: {filename}")
+        
+        try:
+            # Codificación, delimitador y decimal detectados en una muestra del archivo
+            muestra = sondear(entrada)
+            with entrada.abrir() as f:
+                df = pd.read_csv(f, dtype=tipos_categoricos(muestra, COLUMNAS_CATEGORICAS),
+                                 **muestra.opciones_pandas())
+            inferir_categorias(df)
+            
+            if len(df.columns) < 11:
+                print(f"❌ El archivo no tiene 11 columnas. Saltando...")
+                continue
             
-            print(f"\n📄 Procesando archivo: {filename}")
+            reporte = ReporteCalidad('conexiones', filename)
+            reporte.filas_entrada = len(df)
+            nombres_finales = COLUMNAS + [str(col) for col in df.columns[11:]]
+            reporte.registrar_nulos('antes', df, nombres_finales)
             
-            try:
-                df = pd.read_csv(input_path)
-                
-                if len(df.columns) < 11:
-                    print(f"❌ El archivo no tiene 11 columnas. Saltando...")
-                    continue
-                
-                # Aplicar cambios a la columna LOB
-                columna_lob = df.columns[8]
-                df[columna_lob] = df[columna_lob].replace(CAMBIOS_LOB)
-                print(f"✅ Columna '{columna_lob}' actualizada según diccionario")
-                
-                # Convertir columna FECHA
-                columna_fecha = df.columns[10]
-                print(f"🔍 Ejemplo de fechas antes de conversión: {df[columna_fecha].head(2).values}")
-                
-                df[columna_fecha] = df[columna_fecha].astype(str).apply(convertir_fecha)
-                print(f"📅 Ejemplo de fechas después de conversión: {df[columna_fecha].head(2).values}")
-                
-                # Renombrar columnas
-                nuevos_nombres = {
-                    df.columns[0]: "status_start_time",
-                    df.columns[1]: "status_end_time",
-                    df.columns[2]: "agent_email",
-                    df.columns[3]: "agent_status",
-                    df.columns[4]: "interval_start_at",
-                    df.columns[5]: "duration_hrs",
-                    df.columns[6]: "bpo",
-                    df.columns[7]: "Service",
-                    df.columns[8]: "lob",
-                    df.columns[9]: "ID_LOB",
-                    df.columns[10]: "fecha"
-                }
-                df = df.rename(columns=nuevos_nombres)
-                
-                # Guardar archivo procesado
-                df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                print(f"💾 Guardado como: limpio_{filename}")
-                
-            except Exception as e:
-                print(f"❌ Error procesando el archivo: {e}")
+            # Aplicar cambios a la columna LOB
+            columna_lob = df.columns[8]
+            lob = df[columna_lob]
+            sin_mapear = lob.notna() & ~lob.isin(CAMBIOS_LOB.keys()) & ~lob.isin(CAMBIOS_LOB.values())
+            reporte.registrar_valores('lob_sin_mapear', lob[sin_mapear])
+            # map sobre una categórica traduce cada categoría una vez; se conserva categórica
+            df[columna_lob] = lob.map(lambda valor: CAMBIOS_LOB.get(valor, valor)).astype('category')
+            print(f"✅ Columna '{columna_lob}' actualizada según diccionario")
+            
+            # Convertir columna FECHA
+            columna_fecha = df.columns[10]
+            print(f"🔍 Ejemplo de fechas antes de conversión: {df[columna_fecha].head(2).values}")
+            
+            fechas_originales = df[columna_fecha]
+            df[columna_fecha] = aplicar_unicos(df[columna_fecha].astype(str), convertir_fecha)
+            fallidas = ~df[columna_fecha].str.match(PATRON_FECHA_SQL)
+            reporte.registrar_valores('fecha', fechas_originales[fallidas])
+            print(f"📅 Ejemplo de fechas después de conversión: {df[columna_fecha].head(2).values}")
+            
+            # Renombrar columnas
+            nuevos_nombres = dict(zip(df.columns[:11], COLUMNAS))
+            df = df.rename(columns=nuevos_nombres)
+            
+            # Guardar archivo procesado
+            output_path = escribir_salida(df, output_path, encoding='utf-8-sig', formato=FORMATO)
+            print(f"💾 Guardado como: {os.path.basename(output_path)}")
+            
+            reporte.filas_salida = len(df)
+            reporte.registrar_nulos('despues', df, nombres_finales)
+            reporte.guardar(output_path)
+            
+            # Resumen opcional: horas conectadas por agente, LOB y día (sobre el DataFrame ya cargado)
+            if RESUMEN:
+                horas = df.assign(duration_hrs=pd.to_numeric(df['duration_hrs'], errors='coerce'))
+                resumen = resumir(horas, ['agent_email', 'lob', 'fecha'],
+                                  duration_hrs=('duration_hrs', 'sum'), estados=('duration_hrs', 'size'))
+                guardar_resumen(output_path, 'horas', resumen)
+                print(f"📊 Resumen: {len(resumen)} filas agente/LOB/día")
+            
+            # Cargar en la base local (opcional)
+            if SINK_DATABASE:
+                filas = volcar_df(SINK_DATABASE, SINK_TABLE, df, SINK_KEY)
+                print(f"🗄️ {filas} filas cargadas en la tabla '{SINK_TABLE}'")
+            
+        except Exception as e:
+            print(f"❌ Error procesando el archivo: {e}")
 
     print("\n" + "="*50)
     print("✅ PROCESAMIENTO COMPLETADO - CONEXIONES")
@@ -1,13 +1,25 @@
 import os
 import csv
 import re
+from contextlib import nullcontext
 from datetime import datetime
+from functools import lru_cache
+
+from comun.calidad import ReporteCalidad
+from comun.entrada import listar_entradas
+from comun.resumen import AcumuladorResumen
+from comun.sondeo import sondear
+from comun.sumidero import SumideroSQLite
 
 # =============================================
 # VARIABLES GLOBALES (configuradas por Flask)
 # =============================================
 INPUT_FOLDER = '.'  # Será configurado por Flask
 OUTPUT_FOLDER = '.'  # Será configurado por Flask
+SINK_DATABASE = None  # Ruta SQLite opcional (configurada por Flask)
+SINK_TABLE = 'metrics'
+SINK_KEY = None  # Columnas para upsert; None = solo insertar
+RESUMEN = False  # Emitir tablas de resumen junto al CSV limpio (configurado por Flask)
 
 # Diccionario para conversión de meses
 MESES = {
@@ -25,6 +37,23 @@ MESES = {
     'dic': '12', 'diciembre': '12'
 }
 
+# Valores considerados correctamente limpios (para el reporte de calidad)
+PATRON_FECHA_SQL = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+PATRON_NUMERO = re.compile(r'^-?\d+(\.\d{1,2})?$')
+
+# Valores distintos que se recuerdan por columna: el archivo se procesa fila a fila
+# y fechas/valores se repiten mucho, así cada uno se formatea una sola vez
+TAMANO_CACHE = 65536
+
+# Huella del archivo de entrada para la detección automática (comun.deteccion)
+ESQUEMA = {
+    'columnas': 40,
+    'admite_extra': True,
+    'patrones': {
+        0: r'^\d{1,2}[-/\s]\w+[-/\s]\d{2,4}$|^null$',
+    },
+}
+
 # =============================================
 # FUNCIÓN PRINCIPAL QUE EJECUTARÁ FLASK
 # =============================================
@@ -39,29 +68,31 @@ def procesar_archivos():
     # Procesar todos los archivos CSV en la carpeta de entrada
     archivos_procesados = 0
     
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.lower().endswith('.csv'):
-            input_path = os.path.join(INPUT_FOLDER, filename)
-            output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
-            
-            try:
-                limpiar_archivo(input_path, output_path)
-                archivos_procesados += 1
-            except Exception as e:
-                print(f"Error procesando archivo {filename}: {str(e)}")
-    
+    for entrada in listar_entradas(INPUT_FOLDER):
+        filename = entrada.nombre
+        output_path = os.path.join(OUTPUT_FOLDER, f"limpio_{filename}")
+        
+        try:
+            limpiar_archivo(entrada, output_path)
+            archivos_procesados += 1
+        except Exception as e:
+            print(f"Error procesando archivo {filename}: {str(e)}")
+
     print("\n" + "="*50)
     print(f"✅ PROCESAMIENTO COMPLETADO - {archivos_procesados} ARCHIVOS")
     print("="*50)
 
-def limpiar_archivo(input_path, output_path):
+def limpiar_archivo(entrada, output_path):
     """Procesa un archivo CSV según los requerimientos"""
-    print(f"\nProcesando archivo: {os.path.basename(input_path)}")
+    print(f"\nProcesando archivo: {entrada.nombre}")
     
-    with open(input_path, mode='r', encoding='utf-8', newline='') as infile, \
+    # Codificación y delimitador detectados en una muestra del archivo
+    muestra = sondear(entrada)
+    
+    with entrada.abrir_texto(encoding=muestra.codificacion_lectura) as infile, \
          open(output_path, mode='w', encoding='utf-8', newline='') as outfile:
         
-        reader = csv.reader(infile)
+        reader = csv.reader(infile, delimiter=muestra.delimitador)
         writer = csv.writer(outfile)
         
         # Leer encabezados y verificar columnas
@@ -76,40 +107,86 @@ def limpiar_archivo(input_path, output_path):
         filas_procesadas = 0
         filas_con_errores = 0
         
-        for row in reader:
-            try:
-                # Asegurar que la fila tenga exactamente 40 columnas
-                if len(row) > 40:
-                    row = row[:40]
-                elif len(row) < 40:
-                    row.extend([''] * (40 - len(row)))
+        reporte = ReporteCalidad('metrics', entrada.nombre)
+        nombres_columnas = headers + [f"columna_{i + 1}" for i in range(len(headers), 40)]
+        nulos_antes = [0] * 40
+        nulos_despues = [0] * 40
+        
+        # Carga opcional en la base local, por lotes mientras se escribe el CSV; el with la
+        # cierra también si la lectura falla a mitad del archivo
+        sumidero_o_nada = (SumideroSQLite(SINK_DATABASE, SINK_TABLE, nombres_columnas, clave=SINK_KEY)
+                           if SINK_DATABASE else nullcontext())
+        # Resumen opcional acumulado en la misma pasada: filas por fecha
+        resumen = AcumuladorResumen([nombres_columnas[0]]) if RESUMEN else None
+        
+        with sumidero_o_nada as sumidero:
+            for row in reader:
+                reporte.filas_entrada += 1
+                try:
+                    # Asegurar que la fila tenga exactamente 40 columnas
+                    if len(row) > 40:
+                        row = row[:40]
+                    elif len(row) < 40:
+                        row.extend([''] * (40 - len(row)))
+                
+                    for indice, cell in enumerate(row):
+                        if cell == '' or cell.strip().lower() == 'null':
+                            nulos_antes[indice] += 1
                 
-                # Procesar primera columna (fecha)
-                if row:
-                    row[0] = convertir_fecha(row[0])
+                    # Procesar primera columna (fecha)
+                    if row:
+                        fecha_original = row[0]
+                        row[0] = convertir_fecha(row[0])
+                        if row[0] and not PATRON_FECHA_SQL.match(row[0]):
+                            reporte.contar_rechazo(nombres_columnas[0], fecha_original)
                 
-                # Eliminar "null" en todas las columnas
-                row = ['' if str(cell).strip().lower() == 'null' else cell for cell in row]
+                    # Eliminar "null" en todas las columnas
+                    row = ['' if str(cell).strip().lower() == 'null' else cell for cell in row]
                 
-                # Limpiar columna 20 (índice 19)
-                if len(row) > 19:
-                    row[19] = ''
+                    # Limpiar columna 20 (índice 19)
+                    if len(row) > 19:
+                        row[19] = ''
                 
-                # Procesar columna 35 (índice 34)
-                if len(row) > 34:
-                    row[34] = formatear_columna_35(row[34])
+                    # Procesar columna 35 (índice 34)
+                    if len(row) > 34:
+                        row[34] = formatear_columna_35(row[34])
+                        if row[34] and not PATRON_NUMERO.match(row[34]):
+                            reporte.contar_rechazo(nombres_columnas[34], row[34])
                 
-                writer.writerow(row)
-                filas_procesadas += 1
-            except Exception as e:
-                filas_con_errores += 1
-                print(f"  Error en fila {filas_procesadas + filas_con_errores + 1}: {str(e)}")
-                continue
+                    writer.writerow(row)
+                    filas_procesadas += 1
+                    if sumidero:
+                        sumidero.agregar([cell if cell != '' else None for cell in row])
+                    if resumen:
+                        resumen.agregar((row[0],))
+                
+                    for indice, cell in enumerate(row):
+                        if cell == '':
+                            nulos_despues[indice] += 1
+                except Exception as e:
+                    filas_con_errores += 1
+                    print(f"  Error en fila {filas_procesadas + filas_con_errores + 1}: {str(e)}")
+                    continue
+
+        if sumidero:
+            print(f"  {sumidero.filas_escritas} filas cargadas en la tabla '{SINK_TABLE}'")
     
     print(f"  Procesamiento completado: {filas_procesadas} filas procesadas")
     if filas_con_errores > 0:
         print(f"  Advertencia: {filas_con_errores} filas tuvieron errores y fueron omitidas")
+        reporte.advertir(f"{filas_con_errores} filas tuvieron errores y fueron omitidas")
+    
+    reporte.filas_salida = filas_procesadas
+    for indice, nombre in enumerate(nombres_columnas):
+        reporte.contar_nulo('antes', nombre, nulos_antes[indice])
+        reporte.contar_nulo('despues', nombre, nulos_despues[indice])
+    reporte.guardar(output_path)
+    
+    if resumen:
+        resumen.guardar(output_path, 'fechas')
+        print(f"  Resumen: {len(resumen.grupos)} fechas")
 
+@lru_cache(maxsize=TAMANO_CACHE)
 def convertir_fecha(fecha_original):
     """Convierte la fecha de DD-MM-YYYY a YYYY-MM-DD"""
     try:
@@ -140,6 +217,7 @@ def convertir_fecha(fecha_original):
     # Si no se puede convertir, devolver la original
     return fecha_original
 
+@lru_cache(maxsize=TAMANO_CACHE)
 def formatear_columna_35(valor):
     """Formatea la columna 35 para BigQuery:
     1. Reemplaza comas por puntos
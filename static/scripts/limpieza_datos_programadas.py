@@ -2,11 +2,51 @@ import pandas as pd
 import os
 from datetime import datetime
 
+from comun.calidad import ReporteCalidad
+from comun.categorias import aplicar_unicos, tipos_categoricos, inferir_categorias
+from comun.entrada import listar_entradas
+from comun.escritura import escribir_salida
+from comun.resumen import guardar_resumen, resumir
+from comun.sondeo import sondear
+from comun.sumidero import volcar_df
+
 # =============================================
 # VARIABLES GLOBALES (configuradas por Flask)
 # =============================================
 INPUT_FOLDER = '.'  # Será configurado por Flask
 OUTPUT_FOLDER = '.'  # Será configurado por Flask
+SINK_DATABASE = None  # Ruta SQLite opcional (configurada por Flask)
+SINK_TABLE = 'programadas'
+SINK_KEY = ['agent_email', 'fecha']  # Columnas para upsert; None = solo insertar
+RESUMEN = False  # Emitir tablas de resumen junto al CSV limpio (configurado por Flask)
+FORMATO = 'csv'  # Formato de la salida limpia: 'csv' o 'parquet' (configurado por clean.py)
+
+# Nombres de las 27 columnas de entrada
+COLUMNAS = [
+    "SM", "agent_email", "CapCasos", "LOB", "Week", "fecha", "Inicio_Turno", 
+    "Salida_Turno", "Horario_Roster", "Inicio_Break", "Fin_Break", "Condicion_break", 
+    "Asistencia", "Estado", "Novedades", "Observaciones", "Presenta_soporte", 
+    "Ausencia_Cubierta", "Observaciones_ausencia", "Tipo_Gestion", "BPO", 
+    "Experiencia_CRM", "Total_horas", "Inicio_Break_Prog", "Fin_Break_Prog", 
+    "Tiempo_Break", "Segundo_Break"
+]
+
+# Columnas con pocos valores distintos, leídas como categóricas
+# (SM, agent_email, LOB, Estado, BPO)
+COLUMNAS_CATEGORICAS = [0, 1, 3, 13, 20]
+
+# Huella del archivo de entrada para la detección automática (comun.deteccion)
+ESQUEMA = {
+    'columnas': 27,
+    'minimo_columnas': 27,
+    'admite_extra': True,
+    'encabezados': COLUMNAS,
+    'patrones': {
+        1: r'@',
+        5: r'^\d{1,4}/\d{1,2}/\d{1,4}$',
+        8: r'^\d{1,2}:\d{2}\s*-\s*\d{1,2}:\d{2}$',
+    },
+}
 
 # =============================================
 # FUNCIÓN PRINCIPAL QUE EJECUTARÁ FLASK
@@ -30,18 +70,26 @@ def procesar_archivos():
 # =============================================
 def limpiar_horas_programadas(input_path, output_path):
     # Cargar todos los archivos CSV en la carpeta de entrada
-    archivos = [f for f in os.listdir(input_path) if f.endswith('.csv')]
-    
-    for archivo in archivos:
+    for entrada in listar_entradas(input_path):
+        archivo = entrada.nombre
         try:
-            # Leer el archivo CSV
-            df = pd.read_csv(os.path.join(input_path, archivo))
+            # Leer el archivo CSV (descomprimiendo al vuelo si viene comprimido)
+            # Codificación, delimitador y decimal detectados en una muestra del archivo
+            muestra = sondear(entrada)
+            with entrada.abrir() as f:
+                df = pd.read_csv(f, dtype=tipos_categoricos(muestra, COLUMNAS_CATEGORICAS),
+                                 **muestra.opciones_pandas())
+            inferir_categorias(df)
+            
+            reporte = ReporteCalidad('programadas', archivo)
+            reporte.filas_entrada = len(df)
             
             # Eliminar columnas adicionales si existen (más de 27 columnas)
             if len(df.columns) > 27:
                 columnas_a_eliminar = df.columns[27:]
                 df = df.drop(columns=columnas_a_eliminar)
                 print(f"Advertencia: Se eliminaron {len(columnas_a_eliminar)} columnas adicionales en {archivo}")
+                reporte.advertir(f"Se eliminaron {len(columnas_a_eliminar)} columnas adicionales")
             
             # Verificar que el DataFrame tenga exactamente 27 columnas
             if len(df.columns) != 27:
@@ -49,134 +97,71 @@ def limpiar_horas_programadas(input_path, output_path):
                 continue
             
             # Asignar nombres a las columnas según lo especificado
-            column_names = [
-                "SM", "agent_email", "CapCasos", "LOB", "Week", "fecha", "Inicio_Turno", 
-                "Salida_Turno", "Horario_Roster", "Inicio_Break", "Fin_Break", "Condicion_break", 
-                "Asistencia", "Estado", "Novedades", "Observaciones", "Presenta_soporte", 
-                "Ausencia_Cubierta", "Observaciones_ausencia", "Tipo_Gestion", "BPO", 
-                "Experiencia_CRM", "Total_horas", "Inicio_Break_Prog", "Fin_Break_Prog", 
-                "Tiempo_Break", "Segundo_Break"
-            ]
+            column_names = COLUMNAS
             
             # Asignar los nombres de columnas
             df.columns = column_names
+            reporte.registrar_nulos('antes', df)
             
             # Eliminar filas donde agent_email esté vacío
+            filas_previas = len(df)
             df = df.dropna(subset=['agent_email'], how='any')
+            if len(df) < filas_previas:
+                reporte.advertir(f"Se eliminaron {filas_previas - len(df)} filas sin agent_email")
             
             # Limpieza columna por columna según las especificaciones
             
             # Columnas 1-3: Mantener solo texto
             for col in ["SM", "agent_email", "CapCasos"]:
-                df[col] = df[col].apply(lambda x: x if isinstance(x, str) else None)
+                original = df[col]
+                df[col] = aplicar_unicos(df[col], lambda x: x if isinstance(x, str) else None)
+                reporte.registrar_rechazos(col, original, df[col])
             
             # Columna 4 (LOB): Mantener solo texto, eliminar fechas, emails, números
-            def es_texto_valido(x):
-                if not isinstance(x, str):
-                    return False
-                # Verificar que no sea fecha, email o número
-                try:
-                    datetime.strptime(x, "%d/%m/%Y")
-                    return False
-                except:
-                    pass
-                try:
-                    datetime.strptime(x, "%Y-%m-%d")
-                    return False
-                except:
-                    pass
-                if "@" in x and "." in x:  # Simple check for email
-                    return False
-                try:
-                    float(x)
-                    return False
-                except:
-                    pass
-                return True
-            
-            df["LOB"] = df["LOB"].apply(lambda x: x if es_texto_valido(x) else None)
+            original = df["LOB"]
+            df["LOB"] = aplicar_unicos(df["LOB"], lambda x: x if es_texto_valido(x) else None)
+            reporte.registrar_rechazos("LOB", original, df["LOB"])
             
             # Columna 5 (Week): Mantener solo enteros (modificado para quitar .0)
+            original = df["Week"]
             df["Week"] = pd.to_numeric(df["Week"], errors='coerce')
             df["Week"] = df["Week"].dropna().astype('Int64')  # Usar Int64 que permite NaN
+            reporte.registrar_rechazos("Week", original, df["Week"])
             
             # Columna 6 (fecha): Formato DD/MM/AAAA a AAAA-MM-DD (formato SQL)
-            def convertir_fecha(x):
-                try:
-                    if isinstance(x, str):
-                        # Primero intentamos convertir desde el formato original DD/MM/AAAA
-                        try:
-                            fecha_obj = datetime.strptime(x, "%d/%m/%Y")
-                            return fecha_obj.strftime("%Y-%m-%d")
-                        except:
-                            # Si ya está en formato AAAA/MM/DD, lo convertimos
-                            if "/" in x and len(x.split("/")[0]) == 4:
-                                fecha_obj = datetime.strptime(x, "%Y/%m/%d")
-                                return fecha_obj.strftime("%Y-%m-%d")
-                            return None
-                    elif isinstance(x, datetime):
-                        return x.strftime("%Y-%m-%d")
-                    return None
-                except:
-                    return None
-            
-            df["fecha"] = df["fecha"].apply(convertir_fecha)
+            original = df["fecha"]
+            df["fecha"] = aplicar_unicos(df["fecha"], convertir_fecha)
+            reporte.registrar_rechazos("fecha", original, df["fecha"])
             
             # Columnas 7-8 (Inicio_Turno, Salida_Turno): Eliminar datos pero mantener columnas
             df["Inicio_Turno"] = None
             df["Salida_Turno"] = None
             
             # Columna 9 (Horario_Roster): Formato HH:MM - HH:MM, ajustar 24:00 a 00:00
-            def validar_horario(x):
-                if not isinstance(x, str):
-                    return None
-                partes = x.split(" - ")
-                if len(partes) != 2:
-                    return None
-                
-                def ajustar_hora(hora):
-                    if hora == "24:00":
-                        return "00:00"
-                    try:
-                        datetime.strptime(hora, "%H:%M")
-                        return hora
-                    except:
-                        return None
-                
-                inicio = ajustar_hora(partes[0])
-                fin = ajustar_hora(partes[1])
-                
-                if inicio and fin:
-                    return f"{inicio} - {fin}"
-                return None
-            
-            df["Horario_Roster"] = df["Horario_Roster"].apply(validar_horario)
+            original = df["Horario_Roster"]
+            df["Horario_Roster"] = aplicar_unicos(df["Horario_Roster"], validar_horario)
+            reporte.registrar_rechazos("Horario_Roster", original, df["Horario_Roster"])
             
             # Columnas 10-11 (Inicio_Break, Fin_Break): Eliminar datos pero mantener columnas
             df["Inicio_Break"] = None
             df["Fin_Break"] = None
             
             # Columna 12 (Condicion_break): Mantener solo texto
-            df["Condicion_break"] = df["Condicion_break"].apply(lambda x: x if isinstance(x, str) else None)
+            original = df["Condicion_break"]
+            df["Condicion_break"] = aplicar_unicos(df["Condicion_break"], lambda x: x if isinstance(x, str) else None)
+            reporte.registrar_rechazos("Condicion_break", original, df["Condicion_break"])
             
             # Columna 13 (Asistencia): Mantener solo booleanos
-            def validar_booleano(x):
-                if isinstance(x, bool):
-                    return x
-                if isinstance(x, str):
-                    x = x.upper().strip()
-                    if x in ["TRUE", "VERDADERO", "1", "SI"]:
-                        return True
-                    if x in ["FALSE", "FALSO", "0", "NO"]:
-                        return False
-                return None
-            
-            df["Asistencia"] = df["Asistencia"].apply(validar_booleano)
+            original = df["Asistencia"]
+            df["Asistencia"] = aplicar_unicos(df["Asistencia"], validar_booleano)
+            reporte.registrar_rechazos("Asistencia", original, df["Asistencia"])
             
             # Columnas 14-21: Mantener solo texto
             for col in ["Estado", "Novedades", "Observaciones", "Presenta_soporte", 
                        "Ausencia_Cubierta", "Observaciones_ausencia", "Tipo_Gestion", "BPO"]:
-                df[col] = df[col].apply(lambda x: x if isinstance(x, str) else None)
+                original = df[col]
+                df[col] = aplicar_unicos(df[col], lambda x: x if isinstance(x, str) else None)
+                reporte.registrar_rechazos(col, original, df[col])
             
             # Reemplazar comas por espacios en columnas de texto críticas
             df["Observaciones"] = df["Observaciones"].str.replace(',', ' ', regex=False)
@@ -186,28 +171,20 @@ def limpiar_horas_programadas(input_path, output_path):
             df["Experiencia_CRM"] = None
             
             # Columna 23 (Total_horas): Reemplazar "," por ".", mantener solo numéricos
-            def limpiar_numerico(x):
-                if pd.isna(x):
-                    return None
-                if isinstance(x, str):
-                    x = x.replace(",", ".")
-                    try:
-                        return float(x)
-                    except:
-                        return None
-                try:
-                    return float(x)
-                except:
-                    return None
-            
-            df["Total_horas"] = df["Total_horas"].apply(limpiar_numerico)
+            # Si el parser ya la leyó como numérica (decimal detectado), no hay nada que corregir
+            original = df["Total_horas"]
+            if not pd.api.types.is_numeric_dtype(df["Total_horas"]):
+                df["Total_horas"] = aplicar_unicos(df["Total_horas"], limpiar_numerico)
+            reporte.registrar_rechazos("Total_horas", original, df["Total_horas"])
             
             # Columnas 24-26: Eliminar datos pero mantener columnas
             for col in ["Inicio_Break_Prog", "Fin_Break_Prog", "Tiempo_Break"]:
                 df[col] = None
             
             # Columna 27 (Segundo_Break): Si está vacío, copiar de Asistencia, mantener solo booleanos
-            df["Segundo_Break"] = df["Segundo_Break"].apply(validar_booleano)
+            original = df["Segundo_Break"]
+            df["Segundo_Break"] = aplicar_unicos(df["Segundo_Break"], validar_booleano)
+            reporte.registrar_rechazos("Segundo_Break", original, df["Segundo_Break"])
             mask = df["Segundo_Break"].isna() & df["Asistencia"].notna()
             df.loc[mask, "Segundo_Break"] = df.loc[mask, "Asistencia"]
             
@@ -216,12 +193,129 @@ def limpiar_horas_programadas(input_path, output_path):
             
             # Guardar el archivo limpio
             output_file = os.path.join(output_path, f"limpio_{archivo}")
-            df.to_csv(output_file, index=False)
+            output_file = escribir_salida(df, output_file, formato=FORMATO)
             print(f"Archivo {archivo} procesado y guardado como {output_file}")
             
+            reporte.filas_salida = len(df)
+            reporte.registrar_nulos('despues', df)
+            reporte.guardar(output_file)
+            
+            # Resúmenes opcionales: horas por LOB y semana, asistencia por LOB y día
+            if RESUMEN:
+                resumen = resumir(df, ['LOB', 'Week'], Total_horas=('Total_horas', 'sum'),
+                                  agentes=('agent_email', 'nunique'), filas=('Total_horas', 'size'))
+                guardar_resumen(output_file, 'horas', resumen)
+                
+                marcas = df.assign(_asistio=df["Asistencia"].eq(True), _informada=df["Asistencia"].notna())
+                asistencia = resumir(marcas, ['LOB', 'fecha'], programados=('_asistio', 'size'),
+                                     informados=('_informada', 'sum'), asistencias=('_asistio', 'sum'))
+                asistencia["tasa_asistencia"] = (
+                    asistencia["asistencias"] / asistencia["informados"].where(asistencia["informados"] > 0)
+                ).round(4)
+                guardar_resumen(output_file, 'asistencia', asistencia)
+                print(f"Resúmenes: {len(resumen)} filas LOB/semana, {len(asistencia)} filas de asistencia LOB/día")
+            
+            # Cargar en la base local (opcional)
+            if SINK_DATABASE:
+                filas = volcar_df(SINK_DATABASE, SINK_TABLE, df, SINK_KEY)
+                print(f"{filas} filas cargadas en la tabla '{SINK_TABLE}'")
+            
         except Exception as e:
             print(f"Error al procesar el archivo {archivo}: {str(e)}")
 
+# =============================================
+# VALIDADORES POR COLUMNA (funciones puras: se aplican con aplicar_unicos)
+# =============================================
+def es_texto_valido(x):
+    if not isinstance(x, str):
+        return False
+    # Verificar que no sea fecha, email o número
+    try:
+        datetime.strptime(x, "%d/%m/%Y")
+        return False
+    except:
+        pass
+    try:
+        datetime.strptime(x, "%Y-%m-%d")
+        return False
+    except:
+        pass
+    if "@" in x and "." in x:  # Simple check for email
+        return False
+    try:
+        float(x)
+        return False
+    except:
+        pass
+    return True
+
+def convertir_fecha(x):
+    try:
+        if isinstance(x, str):
+            # Primero intentamos convertir desde el formato original DD/MM/AAAA
+            try:
+                fecha_obj = datetime.strptime(x, "%d/%m/%Y")
+                return fecha_obj.strftime("%Y-%m-%d")
+            except:
+                # Si ya está en formato AAAA/MM/DD, lo convertimos
+                if "/" in x and len(x.split("/")[0]) == 4:
+                    fecha_obj = datetime.strptime(x, "%Y/%m/%d")
+                    return fecha_obj.strftime("%Y-%m-%d")
+                return None
+        elif isinstance(x, datetime):
+            return x.strftime("%Y-%m-%d")
+        return None
+    except:
+        return None
+
+def validar_horario(x):
+    if not isinstance(x, str):
+        return None
+    partes = x.split(" - ")
+    if len(partes) != 2:
+        return None
+
+    def ajustar_hora(hora):
+        if hora == "24:00":
+            return "00:00"
+        try:
+            datetime.strptime(hora, "%H:%M")
+            return hora
+        except:
+            return None
+
+    inicio = ajustar_hora(partes[0])
+    fin = ajustar_hora(partes[1])
+
+    if inicio and fin:
+        return f"{inicio} - {fin}"
+    return None
+
+def validar_booleano(x):
+    if isinstance(x, bool):
+        return x
+    if isinstance(x, str):
+        x = x.upper().strip()
+        if x in ["TRUE", "VERDADERO", "1", "SI"]:
+            return True
+        if x in ["FALSE", "FALSO", "0", "NO"]:
+            return False
+    return None
+
+def limpiar_numerico(x):
+    if pd.isna(x):
+        return None
+    if isinstance(x, str):
+        x = x.replace(",", ".")
+        try:
+            return float(x)
+        except:
+            return None
+    try:
+        return float(x)
+    except:
+        return None
+
 # =============================================
 # BLOQUE PARA PRUEBAS LOCALES
 # =============================================
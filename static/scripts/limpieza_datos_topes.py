@@ -2,11 +2,54 @@ import os
 import pandas as pd
 from datetime import datetime
 
+from comun.calidad import ReporteCalidad
+from comun.categorias import aplicar_unicos, tipos_categoricos, inferir_categorias
+from comun.entrada import listar_entradas
+from comun.escritura import escribir_salida
+from comun.resumen import guardar_resumen, resumir
+from comun.sondeo import sondear
+from comun.sumidero import volcar_df
+
 # =============================================
 # VARIABLES GLOBALES (configuradas por Flask)
 # =============================================
 INPUT_FOLDER = '.'  # Será configurado por Flask
 OUTPUT_FOLDER = '.'  # Será configurado por Flask
+SINK_DATABASE = None  # Ruta SQLite opcional (configurada por Flask)
+SINK_TABLE = 'topes'
+SINK_KEY = ['agent_email', 'fecha']  # Columnas para upsert; None = solo insertar
+RESUMEN = False  # Emitir tablas de resumen junto al CSV limpio (configurado por Flask)
+FORMATO = 'csv'  # Formato de la salida limpia: 'csv' o 'parquet' (configurado por clean.py)
+
+# Nombres de las 9 columnas de salida
+COLUMNAS = [
+    'SM',
+    'agent_email',
+    'LOB',
+    'Week',
+    'fecha',
+    'Inicio_Turno',
+    'Salida_Turno',
+    'Horario_Rooster',
+    'Total_horas'
+]
+
+# Columnas con pocos valores distintos, leídas como categóricas (SM, agent_email, LOB)
+COLUMNAS_CATEGORICAS = [0, 1, 2]
+
+# Huella del archivo de entrada para la detección automática (comun.deteccion)
+ESQUEMA = {
+    'columnas': 9,
+    'minimo_columnas': 9,
+    'admite_extra': True,
+    'encabezado': False,  # Se lee con header=None; los títulos pueden venir o no
+    'encabezados': COLUMNAS,
+    'patrones': {
+        1: r'@',
+        4: r'^\d{1,2}/\d{1,2}/\d{4}$',
+        7: r'^\d{1,2}:\d{2}\s*-\s*\d{1,2}:\d{2}$',
+    },
+}
 
 # =============================================
 # FUNCIÓN PRINCIPAL QUE EJECUTARÁ FLASK
@@ -30,28 +73,22 @@ def procesar_archivos():
 # =============================================
 def limpiar_horas_tope(input_path, output_path):
     # Definir los nombres de las columnas
-    column_titles = [
-        'SM',
-        'agent_email',
-        'LOB',
-        'Week',
-        'fecha',
-        'Inicio_Turno',
-        'Salida_Turno',
-        'Horario_Rooster',
-        'Total_horas'
-    ]
+    column_titles = COLUMNAS
 
     # Cargar todos los archivos CSV en la carpeta de entrada
-    archivos = [f for f in os.listdir(input_path) if f.endswith('.csv')]
-    
-    for archivo in archivos:
+    for entrada in listar_entradas(input_path):
+        archivo = entrada.nombre
         try:
-            input_file = os.path.join(input_path, archivo)
             output_file = os.path.join(output_path, f"limpio_{archivo}")
             
             # Leer el archivo CSV ignorando cualquier encabezado existente
-            df = pd.read_csv(input_file, header=None)
+            # Codificación, delimitador y decimal detectados en una muestra del archivo
+            muestra = sondear(entrada)
+            with entrada.abrir() as f:
+                df = pd.read_csv(f, header=None,
+                                 dtype=tipos_categoricos(muestra, COLUMNAS_CATEGORICAS, encabezado=False),
+                                 **muestra.opciones_pandas())
+            inferir_categorias(df)
             
             # Verificar que tenga al menos 9 columnas
             if df.shape[1] < 9:
@@ -62,69 +99,45 @@ def limpiar_horas_tope(input_path, output_path):
             mask = ~df.apply(lambda row: any(str(cell).strip() in column_titles for cell in row), axis=1)
             df = df[mask].reset_index(drop=True)
             
+            reporte = ReporteCalidad('topes', archivo)
+            reporte.filas_entrada = len(df)
+            nombres_finales = column_titles + [str(col) for col in df.columns[9:]]
+            reporte.registrar_nulos('antes', df, nombres_finales)
+            
             # Procesamiento de cada columna según los requisitos
             
             # Columnas 1-3 (índices 0-2): Mantener solo texto
             for col in [0, 1, 2]:
-                df[col] = df[col].apply(lambda x: str(x) if pd.notna(x) and isinstance(x, (str, bool, int, float)) else None)
-                df[col] = df[col].apply(lambda x: x if isinstance(x, str) and not any(char.isdigit() for char in str(x)) and x not in ['True', 'False', 'TRUE', 'FALSE'] else None)
+                original = df[col]
+                df[col] = aplicar_unicos(df[col], lambda x: str(x) if pd.notna(x) and isinstance(x, (str, bool, int, float)) else None)
+                df[col] = aplicar_unicos(df[col], lambda x: x if isinstance(x, str) and not any(char.isdigit() for char in str(x)) and x not in ['True', 'False', 'TRUE', 'FALSE'] else None)
+                reporte.registrar_rechazos(column_titles[col], original, df[col])
             
             # Columna 4 (índice 3): Mantener solo números enteros
+            original = df[3]
             df[3] = pd.to_numeric(df[3], errors='coerce').astype('Int64')
+            reporte.registrar_rechazos(column_titles[3], original, df[3])
             
             # Columna 5 (índice 4): Convertir fechas y cambiar formato
-            def parse_date(date_str):
-                try:
-                    if pd.isna(date_str):
-                        return None
-                    # Intentar parsear en formato DD/MM/AAAA
-                    date_obj = datetime.strptime(str(date_str), '%d/%m/%Y')
-                    return date_obj.strftime('%Y-%m-%d')
-                except (ValueError, TypeError):
-                    return None
-            
-            df[4] = df[4].apply(parse_date)
+            original = df[4]
+            df[4] = aplicar_unicos(df[4], parse_date)
+            reporte.registrar_rechazos(column_titles[4], original, df[4])
             
             # Columnas 6-7 (índices 5-6): Limpiar datos pero mantener columnas
             for col in [5, 6]:
                 df[col] = None
             
             # Columna 8 (índice 7): Mantener solo formato HH:MM - HH:MM
-            def validate_time_range(time_str):
-                if pd.isna(time_str):
-                    return None
-                try:
-                    time_str = str(time_str).strip()
-                    if ' - ' in time_str:
-                        start, end = time_str.split(' - ')
-                        
-                        # Convertir 24:00 a 00:00 en ambas partes del rango
-                        start = '00:00' if start == '24:00' else start
-                        end = '00:00' if end == '24:00' else end
-                        
-                        # Validar formato HH:MM para ambas partes
-                        datetime.strptime(start, '%H:%M')
-                        datetime.strptime(end, '%H:%M')
-                        
-                        return f"{start} - {end}"
-                    return None
-                except (ValueError, TypeError):
-                    return None
-            
-            df[7] = df[7].apply(validate_time_range)
+            original = df[7]
+            df[7] = aplicar_unicos(df[7], validate_time_range)
+            reporte.registrar_rechazos(column_titles[7], original, df[7])
             
             # Columna 9 (índice 8): Mantener números, reemplazar , por .
-            def clean_numeric(value):
-                if pd.isna(value):
-                    return None
-                try:
-                    if isinstance(value, str):
-                        value = value.replace(',', '.')
-                    return float(value)
-                except (ValueError, TypeError):
-                    return None
-            
-            df[8] = df[8].apply(clean_numeric)
+            # Si el parser ya la leyó como numérica (decimal detectado), no hay nada que corregir
+            original = df[8]
+            if not pd.api.types.is_numeric_dtype(df[8]):
+                df[8] = aplicar_unicos(df[8], clean_numeric)
+            reporte.registrar_rechazos(column_titles[8], original, df[8])
             
             # Eliminar columnas adicionales si existen (después de la 9)
             if df.shape[1] > 9:
@@ -134,12 +147,72 @@ def limpiar_horas_tope(input_path, output_path):
             df.columns = column_titles[:df.shape[1]]
             
             # Guardar el archivo procesado
-            df.to_csv(output_file, index=False)
+            output_file = escribir_salida(df, output_file, formato=FORMATO)
             print(f"Archivo {archivo} procesado y guardado como {output_file}")
             
+            reporte.filas_salida = len(df)
+            reporte.registrar_nulos('despues', df)
+            reporte.guardar(output_file)
+            
+            # Resumen opcional: horas por LOB y semana
+            if RESUMEN:
+                resumen = resumir(df, ['LOB', 'Week'], Total_horas=('Total_horas', 'sum'),
+                                  agentes=('agent_email', 'nunique'), filas=('Total_horas', 'size'))
+                guardar_resumen(output_file, 'horas', resumen)
+                print(f"Resumen: {len(resumen)} filas LOB/semana")
+            
+            # Cargar en la base local (opcional)
+            if SINK_DATABASE:
+                filas = volcar_df(SINK_DATABASE, SINK_TABLE, df, SINK_KEY)
+                print(f"{filas} filas cargadas en la tabla '{SINK_TABLE}'")
+            
         except Exception as e:
             print(f"Error al procesar el archivo {archivo}: {str(e)}")
 
+# =============================================
+# VALIDADORES POR COLUMNA (funciones puras: se aplican con aplicar_unicos)
+# =============================================
+def parse_date(date_str):
+    try:
+        if pd.isna(date_str):
+            return None
+        # Intentar parsear en formato DD/MM/AAAA
+        date_obj = datetime.strptime(str(date_str), '%d/%m/%Y')
+        return date_obj.strftime('%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+def validate_time_range(time_str):
+    if pd.isna(time_str):
+        return None
+    try:
+        time_str = str(time_str).strip()
+        if ' - ' in time_str:
+            start, end = time_str.split(' - ')
+
+            # Convertir 24:00 a 00:00 en ambas partes del rango
+            start = '00:00' if start == '24:00' else start
+            end = '00:00' if end == '24:00' else end
+
+            # Validar formato HH:MM para ambas partes
+            datetime.strptime(start, '%H:%M')
+            datetime.strptime(end, '%H:%M')
+
+            return f"{start} - {end}"
+        return None
+    except (ValueError, TypeError):
+        return None
+
+def clean_numeric(value):
+    if pd.isna(value):
+        return None
+    try:
+        if isinstance(value, str):
+            value = value.replace(',', '.')
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
 # =============================================
 # BLOQUE PARA PRUEBAS LOCALES
 # =============================================
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Los tests importan los módulos de la raíz; motor agrega static/scripts (paquete comun) al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import motor  # noqa: E402,F401
+
+
+@pytest.fixture
+def app_aislada(tmp_path, monkeypatch):
+    """La app Flask inicializada con sus carpetas en ``tmp_path`` y los scripts dentro del proceso"""
+    import app as flask_app
+
+    for nombre in ('UPLOAD_FOLDER', 'DOWNLOAD_FOLDER', 'CHUNK_FOLDER', 'RESULT_FOLDER', 'PROGRESS_FOLDER',
+                   'ADMISSION_FOLDER'):
+        monkeypatch.setattr(flask_app, nombre, str(tmp_path / nombre.lower()))
+    for nombre in ('chunked_uploads', 'results', 'progress_store', 'admission', 'script_pool'):
+        monkeypatch.setattr(flask_app, nombre, None)
+    monkeypatch.setitem(flask_app.app.config, 'SCRIPT_POOL_SIZE', 0)
+    flask_app.init_app()
+    yield flask_app
+    flask_app.results.stop_sweeper()
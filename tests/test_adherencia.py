@@ -0,0 +1,162 @@
+"""Adherencia: lectura de salidas limpias, unión de intervalos y join por merge_asof contra los turnos"""
+import math
+
+import pandas as pd
+import pytest
+
+from comun.adherencia import calcular_adherencia, leer_conexiones, leer_turnos, unir_intervalos
+
+
+def _csv(tmp_path, nombre, filas, columnas):
+    ruta = tmp_path / nombre
+    pd.DataFrame(filas, columns=columnas).to_csv(ruta, index=False, encoding='utf-8-sig')
+    return str(ruta)
+
+
+def _turnos(tmp_path, filas, fuente='programadas'):
+    columna = 'Horario_Roster' if fuente == 'programadas' else 'Horario_Rooster'
+    ruta = _csv(tmp_path, f'{fuente}.csv', filas, ['agent_email', 'fecha', columna, 'Total_horas'])
+    return leer_turnos(**{f'rutas_{fuente}': [ruta]})
+
+
+def _conexiones(*intervalos, agente='a@x.com'):
+    return pd.DataFrame({
+        'agent_email': [agente] * len(intervalos),
+        'inicio': pd.to_datetime([inicio for inicio, _ in intervalos]),
+        'fin': pd.to_datetime([fin for _, fin in intervalos]),
+    })
+
+
+def _fila(resultado, fecha, agente='a@x.com'):
+    return resultado[(resultado['agent_email'] == agente) & (resultado['fecha'] == fecha)].iloc[0]
+
+
+def test_leer_conexiones_descarta_offline_e_intervalos_invalidos(tmp_path):
+    ruta = _csv(tmp_path, 'conexiones.csv', [
+        ['2025-04-01 08:00:00', '2025-04-01 09:00:00', ' A@X.com ', 'Online'],
+        ['2025-04-01 09:00:00', '2025-04-01 10:00:00', 'a@x.com', ' OFFLINE '],
+        ['2025-04-01 10:00:00', '2025-04-01 10:00:00', 'a@x.com', 'Online'],
+        ['2025-04-01 11:00:00', '2025-04-01 10:00:00', 'a@x.com', 'Online'],
+        ['2025-04-01 12:00:00', None, 'a@x.com', 'Break'],
+        ['2025-04-01 12:00:00', '2025-04-01 13:00:00', '  ', 'Online'],
+        ['2025-04-01 14:00:00', '2025-04-01 15:00:00', 'b@x.com', 'Break'],
+    ], ['status_start_time', 'status_end_time', 'agent_email', 'agent_status'])
+    conexiones = leer_conexiones([ruta])
+    assert conexiones['agent_email'].tolist() == ['a@x.com', 'b@x.com']
+    assert conexiones['inicio'].dt.hour.tolist() == [8, 14]
+
+
+def test_leer_conexiones_sin_rutas_es_vacio():
+    conexiones = leer_conexiones([])
+    assert conexiones.empty
+    assert list(conexiones.columns) == ['agent_email', 'inicio', 'fin']
+
+
+def test_unir_intervalos_solapados_contiguos_y_contenidos():
+    conexiones = pd.concat([
+        _conexiones(('2025-04-01 08:00', '2025-04-01 09:00'), ('2025-04-01 08:30', '2025-04-01 09:30'),
+                    ('2025-04-01 08:40', '2025-04-01 08:50'), ('2025-04-01 09:30', '2025-04-01 10:00'),
+                    ('2025-04-01 11:00', '2025-04-01 12:00')),
+        _conexiones(('2025-04-01 08:15', '2025-04-01 08:45'), agente='b@x.com'),
+    ], ignore_index=True)
+    bloques = unir_intervalos(conexiones)
+    assert list(zip(bloques['agent_email'], bloques['inicio'].dt.strftime('%H:%M'), bloques['fin'].dt.strftime('%H:%M'))) == [
+        ('a@x.com', '08:00', '10:00'),  # contiguo al bloque anterior: se une
+        ('a@x.com', '11:00', '12:00'),
+        ('b@x.com', '08:15', '08:45'),  # otro agente en el mismo horario no se mezcla
+    ]
+
+
+def test_programadas_tiene_prioridad_sobre_topes_salvo_sin_horario(tmp_path):
+    programadas = _csv(tmp_path, 'programadas.csv', [
+        ['a@x.com', '2025-04-01', '08:00 - 17:00', '8'],
+        ['a@x.com', '2025-04-02', 'sin turno', '8'],
+    ], ['agent_email', 'fecha', 'Horario_Roster', 'Total_horas'])
+    topes = _csv(tmp_path, 'topes.csv', [
+        ['A@x.com', '2025-04-01', '09:00 - 18:00', '9'],
+        ['a@x.com', '2025-04-02', '10:00 - 19:00', ''],
+    ], ['agent_email', 'fecha', 'Horario_Rooster', 'Total_horas'])
+    turnos = leer_turnos([programadas], [topes]).set_index('fecha')
+    assert turnos.loc['2025-04-01', 'fuente'] == 'programadas'
+    assert turnos.loc['2025-04-02', 'fuente'] == 'topes'
+    # Sin Total_horas, las horas programadas son el largo de la ventana
+    assert turnos.loc['2025-04-02', 'horas_programadas'] == 9
+
+
+def test_leer_turnos_sin_fuentes_es_error():
+    with pytest.raises(ValueError):
+        leer_turnos()
+
+
+@pytest.mark.parametrize('intervalo, esperado', [
+    (('2025-04-01 09:00', '2025-04-01 10:00'), 1.0),   # dentro del turno
+    (('2025-04-01 07:00', '2025-04-01 09:00'), 1.0),   # empieza antes del turno
+    (('2025-04-01 16:00', '2025-04-01 18:30'), 1.0),   # termina después del turno
+    (('2025-04-01 07:00', '2025-04-01 18:00'), 9.0),   # abarca el turno entero
+    (('2025-04-01 06:00', '2025-04-01 08:00'), 0.0),   # termina justo cuando empieza
+    (('2025-04-01 17:00', '2025-04-01 18:00'), 0.0),   # empieza justo cuando termina
+    (('2025-04-01 08:00', '2025-04-01 17:00'), 9.0),   # coincide con la ventana
+])
+def test_horas_en_turno_en_los_bordes(tmp_path, intervalo, esperado):
+    turnos = _turnos(tmp_path, [['a@x.com', '2025-04-01', '08:00 - 17:00', '9']])
+    resultado = calcular_adherencia(_conexiones(intervalo), turnos)
+    assert _fila(resultado, '2025-04-01')['horas_en_turno'] == esperado
+
+
+def test_turno_que_cruza_la_medianoche(tmp_path):
+    turnos = _turnos(tmp_path, [['a@x.com', '2025-04-01', '22:00 - 06:00', '8']])
+    conexiones = _conexiones(('2025-04-01 21:00', '2025-04-01 23:00'), ('2025-04-02 05:00', '2025-04-02 07:00'))
+    resultado = calcular_adherencia(conexiones, turnos)
+    turno = _fila(resultado, '2025-04-01')
+    assert turno['horas_turno'] == 8
+    assert turno['horas_en_turno'] == 2
+    # Las horas conectadas se cuentan por día de inicio: el tramo de la madrugada cae en el día siguiente
+    assert turno['horas_conectadas'] == 2
+    assert math.isnan(_fila(resultado, '2025-04-02')['horas_turno'])
+
+
+def test_intervalo_que_cruza_de_un_turno_al_siguiente(tmp_path):
+    turnos = _turnos(tmp_path, [
+        ['a@x.com', '2025-04-01', '16:00 - 00:00', '8'],
+        ['a@x.com', '2025-04-02', '00:00 - 08:00', '8'],
+    ])
+    resultado = calcular_adherencia(_conexiones(('2025-04-01 22:00', '2025-04-02 03:00')), turnos)
+    assert _fila(resultado, '2025-04-01')['horas_en_turno'] == 2
+    assert _fila(resultado, '2025-04-02')['horas_en_turno'] == 3
+
+
+def test_solapes_y_otros_agentes_no_se_cuentan_dos_veces(tmp_path):
+    turnos = _turnos(tmp_path, [
+        ['a@x.com', '2025-04-01', '08:00 - 16:00', '8'],
+        ['b@x.com', '2025-04-01', '08:00 - 16:00', '8'],
+    ])
+    conexiones = pd.concat([
+        _conexiones(('2025-04-01 08:00', '2025-04-01 12:00'), ('2025-04-01 10:00', '2025-04-01 12:00')),
+        _conexiones(('2025-04-01 08:00', '2025-04-01 16:00'), agente='b@x.com'),
+    ], ignore_index=True)
+    resultado = calcular_adherencia(conexiones, turnos)
+    a = _fila(resultado, '2025-04-01')
+    assert (a['horas_conectadas'], a['horas_en_turno'], a['adherencia'], a['conformidad']) == (4, 4, 0.5, 0.5)
+    assert _fila(resultado, '2025-04-01', 'b@x.com')['adherencia'] == 1
+
+
+def test_dias_sin_conexion_sin_turno_o_sin_horario(tmp_path):
+    turnos = _turnos(tmp_path, [
+        ['a@x.com', '2025-04-01', '08:00 - 16:00', '8'],
+        ['a@x.com', '2025-04-02', 'libre', '0'],
+    ])
+    resultado = calcular_adherencia(_conexiones(('2025-04-03 08:00', '2025-04-03 10:00')), turnos)
+    assert resultado['fecha'].tolist() == ['2025-04-01', '2025-04-02', '2025-04-03']
+    sin_conexion = _fila(resultado, '2025-04-01')
+    assert (sin_conexion['horas_conectadas'], sin_conexion['adherencia']) == (0, 0)
+    assert math.isnan(_fila(resultado, '2025-04-02')['adherencia'])
+    sin_turno = _fila(resultado, '2025-04-03')
+    assert sin_turno['horas_conectadas'] == 2 and math.isnan(sin_turno['adherencia'])
+
+
+def test_sin_conexiones(tmp_path):
+    turnos = _turnos(tmp_path, [['a@x.com', '2025-04-01', '08:00 - 16:00', '8']], fuente='topes')
+    resultado = calcular_adherencia(leer_conexiones([]), turnos)
+    assert len(resultado) == 1
+    assert resultado.loc[0, 'fuente'] == 'topes'
+    assert resultado.loc[0, 'horas_en_turno'] == 0
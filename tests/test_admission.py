@@ -0,0 +1,105 @@
+"""AdmissionControl: lugares por carril, límites por usuario, cola llena y liberación"""
+import json
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionControl, AdmissionError
+
+CHICO = 1  # costo del carril rápido
+GRANDE = 100  # costo del carril general
+
+
+def _control(tmp_path, **opciones):
+    opciones = {'slots': 1, 'fast_slots': 1, 'wait_seconds': 0, **opciones}
+    return AdmissionControl(str(tmp_path / 'admision'), **opciones)
+
+
+def _estado(control):
+    with open(f"{control.root}/state.json", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_sin_lugares_generales_es_error(tmp_path):
+    with pytest.raises(ValueError):
+        _control(tmp_path, slots=0)
+
+
+def test_rapidos_que_ocupan_lugares_generales_cuentan_para_el_total(tmp_path):
+    control = _control(tmp_path)
+    control.acquire('a', CHICO)
+    control.acquire('b', CHICO)
+    with pytest.raises(AdmissionError):
+        control.acquire('c', GRANDE)
+    assert len(_estado(control)['active']) == 2
+
+
+def test_carril_rapido_reservado_para_jobs_chicos(tmp_path):
+    control = _control(tmp_path)
+    control.acquire('a', GRANDE)
+    with pytest.raises(AdmissionError):
+        control.acquire('b', GRANDE)
+    control.acquire('c', CHICO)
+    with pytest.raises(AdmissionError):
+        control.acquire('d', CHICO)
+    assert sorted(t['lane'] for t in _estado(control)['active'].values()) == ['general', 'rapido']
+
+
+def test_limite_de_jobs_activos_por_usuario(tmp_path):
+    control = _control(tmp_path, slots=3, per_user_active=1)
+    control.acquire('a', GRANDE)
+    with pytest.raises(AdmissionError):
+        control.acquire('a', GRANDE)
+    # El límite es por carril: un job chico del mismo usuario sí entra
+    control.acquire('a', CHICO)
+    control.acquire('b', GRANDE)
+
+
+def test_cola_llena_responde_429_con_retry_after(tmp_path):
+    control = _control(tmp_path, max_queued=0, wait_seconds=5)
+    control.acquire('a', GRANDE)
+    with pytest.raises(AdmissionError, match="Cola") as error:
+        control.acquire('b', GRANDE)
+    assert error.value.status == 429
+    assert error.value.retry_after >= 1
+    assert not _estado(control)['queued']
+
+
+def test_cola_por_usuario_llena(tmp_path):
+    control = _control(tmp_path, per_user_queued=0, wait_seconds=5)
+    control.acquire('a', GRANDE)
+    inicio = time.monotonic()
+    with pytest.raises(AdmissionError, match="Cola"):
+        control.acquire('b', GRANDE)
+    assert time.monotonic() - inicio < 1
+
+
+def test_job_en_cola_toma_el_lugar_liberado(tmp_path):
+    control = _control(tmp_path, wait_seconds=5)
+    ticket = control.acquire('a', GRANDE)
+    threading.Timer(0.3, control.release, args=(ticket,)).start()
+    control.acquire('b', GRANDE)
+    assert [t['user'] for t in _estado(control)['active'].values()] == ['b']
+
+
+def test_admit_libera_el_lugar_si_el_job_falla(tmp_path):
+    control = _control(tmp_path)
+    with pytest.raises(RuntimeError):
+        with control.admit('a', GRANDE):
+            assert len(_estado(control)['active']) == 1
+            raise RuntimeError("falla del job")
+    assert not _estado(control)['active']
+    control.acquire('b', GRANDE)
+
+
+def test_sin_espera_rechaza_enseguida_sin_encolar(tmp_path):
+    # Worker síncrono: aunque la cola tenga lugar, esperar retendría el worker
+    control = _control(tmp_path, wait_seconds=5)
+    control.acquire('a', GRANDE)
+    inicio = time.monotonic()
+    with pytest.raises(AdmissionError) as error:
+        control.acquire('b', GRANDE, wait_seconds=0)
+    assert time.monotonic() - inicio < 1
+    assert error.value.status == 429
+    assert not _estado(control)['queued']
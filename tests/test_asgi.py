@@ -0,0 +1,87 @@
+"""Modo ASGI: peticiones de punta a punta y cuerpos que llegan a la app a medida que se leen"""
+import asyncio
+import json
+import os
+
+import pytest
+
+pytest.importorskip('a2wsgi')
+
+import asgi  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _pedir(method, path, cuerpos=(), headers=(), al_recibir=None):
+    """Ejecuta una petición contra asgi.app; devuelve (status, headers, cuerpo)"""
+    pendientes = list(cuerpos) or [b'']
+    entregados = 0
+    enviados = []
+
+    async def receive():
+        nonlocal entregados
+        if al_recibir:
+            al_recibir(entregados)
+        if pendientes:
+            entregados += 1
+            return {'type': 'http.request', 'body': pendientes.pop(0), 'more_body': bool(pendientes)}
+        return {'type': 'http.disconnect'}
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(nombre.lower().encode(), valor.encode()) for nombre, valor in headers],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    asyncio.run(asgi.app(scope, receive, send))
+    inicio = next(m for m in enviados if m['type'] == 'http.response.start')
+    cuerpo = b''.join(m.get('body', b'') for m in enviados if m['type'] == 'http.response.body')
+    return inicio['status'], dict((k.decode(), v.decode()) for k, v in inicio['headers']), cuerpo
+
+
+def test_pagina_principal(app_aislada):
+    status, headers, cuerpo = _pedir('GET', '/')
+    assert status == 200
+    assert headers['content-type'].startswith('text/html')
+    assert b'limpieza_datos_RQ' in cuerpo
+
+
+def test_fragmento_se_escribe_mientras_llega(app_aislada):
+    datos = bytes(range(256)) * (4 * MB // 256)
+    estado = app_aislada.chunked_uploads.create('grande.csv', len(datos))
+    parte = os.path.join(app_aislada.chunked_uploads.root, estado['upload_id'], 'data.part')
+    en_disco = {}
+
+    def al_recibir(entregados):
+        en_disco[entregados] = os.path.getsize(parte)
+
+    bloques = [datos[i:i + MB] for i in range(0, len(datos), MB)]
+    status, _, cuerpo = _pedir(
+        'PUT', f"/uploads/{estado['upload_id']}", bloques,
+        headers=[('Content-Length', str(len(datos))), ('Upload-Offset', '0')],
+        al_recibir=al_recibir,
+    )
+    assert status == 200
+    assert json.loads(cuerpo)['complete']
+    # Antes de pedir el último bloque la app ya escribió los primeros: el cuerpo no se junta en memoria
+    assert en_disco[len(bloques) - 1] >= MB
+    with open(parte, 'rb') as f:
+        assert f.read() == datos
+
+
+def test_descarga_con_range(app_aislada):
+    job_id, ruta = app_aislada.results.reserve('resultados.zip')
+    contenido = os.urandom(3 * MB)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    app_aislada.results.commit(job_id)
+
+    status, headers, cuerpo = _pedir('GET', f'/download/{job_id}/resultados.zip')
+    assert status == 200 and cuerpo == contenido
+    status, headers, cuerpo = _pedir('GET', f'/download/{job_id}/resultados.zip', headers=[('Range', 'bytes=1000-')])
+    assert status == 206
+    assert cuerpo == contenido[1000:]
+    assert headers['content-range'] == f'bytes 1000-{len(contenido) - 1}/{len(contenido)}'
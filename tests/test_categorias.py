@@ -0,0 +1,89 @@
+"""aplicar_unicos debe dar el mismo resultado que Series.apply con los validadores de los scripts"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import motor
+from comun.categorias import aplicar_unicos
+
+programadas = motor.load_script('limpieza_datos_programadas')
+topes = motor.load_script('limpieza_datos_topes')
+conexiones = motor.load_script('limpieza_datos_conexiones')
+
+VALIDADORES = {
+    'programadas.es_texto_valido': lambda x: x if programadas.es_texto_valido(x) else None,
+    'programadas.convertir_fecha': programadas.convertir_fecha,
+    'programadas.validar_horario': programadas.validar_horario,
+    'programadas.limpiar_numerico': programadas.limpiar_numerico,
+    'topes.parse_date': topes.parse_date,
+    'topes.validate_time_range': topes.validate_time_range,
+    'topes.clean_numeric': topes.clean_numeric,
+    'conexiones.convertir_fecha': conexiones.convertir_fecha,
+}
+
+VALORES = [
+    'CS Fraude', '15/04/2025', '2025/04/15', '2025-04-15', "'5 ene 2025", '12 marzo 2024',
+    '08:00 - 17:00', '22:00 - 24:00', '8:00-17:00', '1,5', '8.5', 'agente@bpo.com', '',
+    'CS Fraude', '15/04/2025', None, np.nan,
+]
+
+SERIES = {
+    'object': pd.Series(VALORES, dtype=object),
+    'float': pd.Series([8.5, np.nan, 1.0, 8.5, -0.0, np.inf]),
+    'categorica': pd.Series(VALORES, dtype='category'),
+    'todo_nan': pd.Series([np.nan] * 4),
+    'indice_y_nombre': pd.Series(VALORES, dtype=object, name='LOB',
+                                 index=pd.Index(range(100, 100 + 2 * len(VALORES), 2), name='fila')),
+    'vacia': pd.Series([], dtype=object, name='fecha'),
+}
+
+
+def _mismos_valores(obtenido, esperado):
+    """Mismos nulos en las mismas filas (None y NaN cuentan igual) y mismos valores en el resto"""
+    obtenido = obtenido.astype(object)
+    esperado = esperado.astype(object)
+    nulos = esperado.isna()
+    assert obtenido.isna().tolist() == nulos.tolist()
+    assert obtenido[~nulos].tolist() == esperado[~nulos].tolist()
+
+
+@pytest.mark.parametrize('nombre_serie', SERIES)
+@pytest.mark.parametrize('nombre_validador', VALIDADORES)
+def test_aplicar_unicos_equivale_a_apply(nombre_serie, nombre_validador):
+    serie = SERIES[nombre_serie]
+    funcion = VALIDADORES[nombre_validador]
+
+    esperado = serie.apply(funcion)
+    obtenido = aplicar_unicos(serie, funcion)
+
+    _mismos_valores(obtenido, esperado)
+    pd.testing.assert_index_equal(obtenido.index, serie.index)
+    assert obtenido.name == serie.name
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Entrada categórica con resultado de texto: la salida sigue siendo categórica
+        por_valor = serie.astype(object).apply(funcion)
+        assert isinstance(obtenido.dtype, pd.CategoricalDtype) == (por_valor.dtype == object)
+    else:
+        assert obtenido.dtype == esperado.dtype
+
+
+@pytest.mark.parametrize('dtype, esperadas', [(object, 4), ('category', 2)])
+def test_llama_una_vez_por_valor_distinto(dtype, esperadas):
+    llamadas = []
+
+    def contar(valor):
+        llamadas.append(valor)
+        return valor
+
+    # object: 'a', 'b', None y NaN; categórica: solo 'a' y 'b' (los nulos no pasan por la función)
+    serie = pd.Series(['a', 'b', 'a', None, 'b', np.nan] * 1000, dtype=dtype)
+    aplicar_unicos(serie, contar)
+    assert len(llamadas) == esperadas
+
+
+def test_categorica_conserva_categorias_transformadas():
+    serie = pd.Series(['15/04/2025', '16/04/2025', '15/04/2025', 'x'], dtype='category')
+    obtenido = aplicar_unicos(serie, topes.parse_date)
+    assert isinstance(obtenido.dtype, pd.CategoricalDtype)
+    assert sorted(obtenido.cat.categories) == ['2025-04-15', '2025-04-16']
+    assert obtenido.isna().tolist() == [False, False, False, True]
@@ -0,0 +1,125 @@
+"""ChunkedUploadStore: desplazamientos al reanudar, límites de tamaño y entrega de la carga"""
+import io
+import os
+import time
+
+import pytest
+
+import chunked_uploads
+from chunked_uploads import ChunkedUploadStore, UploadError
+
+DATOS = b'fecha,valor\n' + b'2025-04-01,1\n' * 100
+
+
+def _store(tmp_path, max_size=10 * 1024):
+    return ChunkedUploadStore(str(tmp_path / 'cargas'), max_size)
+
+
+def test_carga_en_fragmentos_y_reanudacion(tmp_path):
+    store = _store(tmp_path)
+    estado = store.create('datos.csv', len(DATOS))
+    assert estado['offset'] == 0 and not estado['complete']
+
+    estado = store.append(estado['upload_id'], 0, io.BytesIO(DATOS[:500]))
+    assert estado['offset'] == 500
+    # Tras una conexión caída el cliente consulta el estado y sigue desde ese byte
+    estado = store.status(estado['upload_id'])
+    estado = store.append(estado['upload_id'], estado['offset'], io.BytesIO(DATOS[estado['offset']:]))
+    assert estado['offset'] == len(DATOS) and estado['complete']
+
+
+def test_desplazamiento_fuera_de_secuencia_es_409_con_el_real(tmp_path):
+    store = _store(tmp_path)
+    upload_id = store.create('datos.csv', len(DATOS))['upload_id']
+    store.append(upload_id, 0, io.BytesIO(DATOS[:100]))
+    for offset in (0, 50, 200):
+        with pytest.raises(UploadError) as error:
+            store.append(upload_id, offset, io.BytesIO(DATOS[offset:offset + 100]))
+        assert error.value.status == 409
+        assert error.value.offset == 100
+    assert store.status(upload_id)['offset'] == 100
+
+
+def test_tamano_declarado_fuera_de_limite_es_413(tmp_path):
+    store = _store(tmp_path, max_size=1000)
+    for tamano in (-1, 1001):
+        with pytest.raises(UploadError) as error:
+            store.create('datos.csv', tamano)
+        assert error.value.status == 413
+    assert store.create('datos.csv', 1000)['size'] == 1000
+    assert store.create('vacio.csv', 0)['complete']
+
+
+def test_fragmento_que_excede_el_tamano_declarado_es_413(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked_uploads, 'COPY_BLOCK', 100)
+    store = _store(tmp_path)
+    upload_id = store.create('datos.csv', 250)['upload_id']
+    with pytest.raises(UploadError) as error:
+        store.append(upload_id, 0, io.BytesIO(b'x' * 300))
+    assert error.value.status == 413
+    # Los bloques que cabían quedan escritos y el cliente reanuda desde ahí
+    assert error.value.offset == 200
+    assert store.status(upload_id)['offset'] == 200
+    assert store.append(upload_id, 200, io.BytesIO(b'x' * 50))['complete']
+
+
+@pytest.mark.parametrize('upload_id', ['', '../cargas', 'Z' * 32, 'a' * 33])
+def test_id_invalido_es_404(tmp_path, upload_id):
+    store = _store(tmp_path)
+    with pytest.raises(UploadError) as error:
+        store.status(upload_id)
+    assert error.value.status == 404
+
+
+def test_carga_inexistente_es_404(tmp_path):
+    with pytest.raises(UploadError) as error:
+        _store(tmp_path).append('0' * 32, 0, io.BytesIO(b'x'))
+    assert error.value.status == 404
+
+
+def test_claim_mueve_la_carga_completa(tmp_path):
+    store = _store(tmp_path)
+    upload_id = store.create('datos.csv', len(DATOS))['upload_id']
+    store.append(upload_id, 0, io.BytesIO(DATOS[:10]))
+    with pytest.raises(UploadError) as error:
+        store.claim(upload_id, str(tmp_path), 'datos.csv')
+    assert error.value.status == 409 and error.value.offset == 10
+
+    store.append(upload_id, 10, io.BytesIO(DATOS[10:]))
+    destino = store.claim(upload_id, str(tmp_path), 'datos.csv')
+    assert open(destino, 'rb').read() == DATOS
+    assert not os.path.exists(os.path.join(store.root, upload_id))
+    with pytest.raises(UploadError):
+        store.status(upload_id)
+
+
+def test_purge_expired_solo_elimina_cargas_abandonadas(tmp_path):
+    store = _store(tmp_path)
+    store.ttl = 60
+    abandonada = store.create('a.csv', 10)['upload_id']
+    activa = store.create('b.csv', 10)['upload_id']
+    viejo = time.time() - 120
+    for ruta in (os.path.join(store.root, abandonada), os.path.join(store.root, abandonada, 'data.part')):
+        os.utime(ruta, (viejo, viejo))
+    store.purge_expired()
+    assert not os.path.exists(os.path.join(store.root, abandonada))
+    assert store.status(activa)['offset'] == 0
+
+
+def test_protocolo_http(app_aislada):
+    cliente = app_aislada.app.test_client()
+    respuesta = cliente.post('/uploads', json={'filename': 'datos.csv', 'size': len(DATOS)})
+    assert respuesta.status_code == 201
+    upload_id = respuesta.get_json()['upload_id']
+
+    assert cliente.put(f'/uploads/{upload_id}', data=DATOS[:100]).status_code == 400
+    respuesta = cliente.put(f'/uploads/{upload_id}', data=DATOS[:100], headers={'Upload-Offset': '0'})
+    assert respuesta.get_json()['offset'] == 100
+    respuesta = cliente.put(f'/uploads/{upload_id}', data=DATOS[:100], headers={'Upload-Offset': '0'})
+    assert respuesta.status_code == 409 and respuesta.get_json()['offset'] == 100
+    assert cliente.get(f'/uploads/{upload_id}').get_json()['offset'] == 100
+
+    assert cliente.post('/uploads', json={'filename': 'datos.exe', 'size': 10}).status_code == 400
+    respuesta = cliente.post('/uploads', json={'filename': 'datos.csv', 'size': app_aislada.app.config['MAX_UPLOAD_SIZE'] + 1})
+    assert respuesta.status_code == 413
+    assert cliente.get(f'/uploads/{"0" * 32}').status_code == 404
@@ -0,0 +1,116 @@
+"""El escritor pyarrow debe producir los mismos bytes que df.to_csv (escritor pandas)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from comun import escritura
+from comun.escritura import escribir_csv, escribir_salida
+
+pytestmark = pytest.mark.skipif(escritura.pa is None, reason="pyarrow no está instalado")
+
+
+def _escribir_ambos(df, tmp_path, encoding='utf-8'):
+    ruta_arrow = tmp_path / 'arrow.csv'
+    ruta_pandas = tmp_path / 'pandas.csv'
+    usado = escribir_csv(df, str(ruta_arrow), encoding=encoding, escritor='pyarrow')
+    assert escribir_csv(df, str(ruta_pandas), encoding=encoding, escritor='pandas') == 'pandas'
+    assert ruta_arrow.read_bytes() == ruta_pandas.read_bytes()
+    return usado
+
+
+CASOS_ARROW = {
+    'floats': pd.DataFrame({
+        'a': [1.0, np.nan, np.inf, -np.inf, -0.0, 0.1 + 0.2, 1e-05, 1e20, 123456789.125],
+        'b': range(9),
+    }),
+    'int64_nullable': pd.DataFrame({
+        'Week': pd.array([14, None, 15, -3], dtype='Int64'),
+        'n': pd.array([1, 2, 3, 4], dtype='int64'),
+    }),
+    'categoricas': pd.DataFrame({
+        'lob': pd.Series(['CS_Fraude', None, 'PS_Phone', 'CS_Fraude'], dtype='category'),
+        'email': pd.Series(['a@x.com', 'b@x.com', None, 'a@x.com'], dtype='category'),
+    }),
+    'bool_object': pd.DataFrame({
+        'Asistencia': pd.Series([True, False, None, True], dtype=object),
+        'Segundo_Break': pd.Series([False, None, None, True], dtype=object),
+    }),
+    'bool_numpy': pd.DataFrame({'x': [True, False, True], 'y': [1, 2, 3]}),
+    'none_y_vacios': pd.DataFrame({
+        'texto': pd.Series(['a', None, 'c', None], dtype=object),
+        'vacia': pd.Series([None] * 4, dtype=object),
+        'otra': ['x', 'y', 'z', 'w'],
+    }),
+    'unicode': pd.DataFrame({'nombre': ['Curación', 'año', 'ñandú'], 'v': [1.5, 2.0, np.nan]}),
+}
+
+
+@pytest.mark.parametrize('caso', CASOS_ARROW)
+def test_pyarrow_igual_a_pandas(caso, tmp_path):
+    assert _escribir_ambos(CASOS_ARROW[caso], tmp_path) == 'pyarrow'
+
+
+@pytest.mark.parametrize('caso', CASOS_ARROW)
+def test_bom_utf8_sig(caso, tmp_path):
+    assert _escribir_ambos(CASOS_ARROW[caso], tmp_path, encoding='utf-8-sig') == 'pyarrow'
+    assert (tmp_path / 'arrow.csv').read_bytes().startswith(b'\xef\xbb\xbf')
+
+
+@pytest.mark.parametrize('valor', ['con,coma', 'con "comillas"', 'con\nsalto', 'con\rretorno'])
+def test_valores_que_requieren_comillas_usan_pandas(valor, tmp_path):
+    df = pd.DataFrame({'texto': ['normal', valor, None], 'n': [1, 2, 3]})
+    assert _escribir_ambos(df, tmp_path) == 'pandas'
+
+
+def test_encabezado_con_comillas(tmp_path):
+    df = pd.DataFrame({'col,uno': [1, 2], 'col "dos"': ['a', 'b']})
+    _escribir_ambos(df, tmp_path)
+
+
+def test_una_columna_usa_pandas(tmp_path):
+    df = pd.DataFrame({'solo': ['a', None, '', 'b']})
+    assert _escribir_ambos(df, tmp_path) == 'pandas'
+
+
+def test_string_vacio(tmp_path):
+    # Con varias columnas el csv de Python escribe el texto vacío y el nulo como campo vacío
+    df = pd.DataFrame({'texto': ['a', '', None], 'n': [1, 2, 3]})
+    assert _escribir_ambos(df, tmp_path) == 'pyarrow'
+
+
+def test_tipos_mixtos_y_fechas(tmp_path):
+    df = pd.DataFrame({
+        'mixta': pd.Series(['a', 1, 2.5, None], dtype=object),
+        'fecha': pd.to_datetime(['2025-04-01', None, '2025-04-03', '2025-04-04']),
+    })
+    assert _escribir_ambos(df, tmp_path) == 'pandas'
+
+
+def test_otro_encoding_usa_pandas(tmp_path):
+    df = CASOS_ARROW['unicode']
+    assert _escribir_ambos(df, tmp_path, encoding='latin-1') == 'pandas'
+
+
+def test_dataframe_vacio(tmp_path):
+    df = pd.DataFrame({'a': pd.Series([], dtype=object), 'b': pd.Series([], dtype='float64')})
+    _escribir_ambos(df, tmp_path)
+
+
+@pytest.mark.parametrize('caso', sorted(CASOS_ARROW))
+def test_parquet_conserva_tipos_y_csv(caso, tmp_path):
+    # El Parquet tipado, escrito luego como CSV, da los mismos bytes que el CSV directo
+    df = CASOS_ARROW[caso]
+    ruta = escribir_salida(df, str(tmp_path / 'salida.csv'), formato='parquet')
+    assert ruta == str(tmp_path / 'salida.parquet')
+    leido = pd.read_parquet(ruta)
+    assert list(leido.dtypes) == list(df.dtypes)
+    escribir_csv(leido, str(tmp_path / 'desde_parquet.csv'), escritor='pandas')
+    escribir_csv(df, str(tmp_path / 'directo.csv'), escritor='pandas')
+    assert (tmp_path / 'desde_parquet.csv').read_bytes() == (tmp_path / 'directo.csv').read_bytes()
+
+
+def test_parquet_tipos_mixtos_como_texto(tmp_path):
+    df = pd.DataFrame({'mixta': pd.Series(['a', 1, 2.5, None], dtype=object), 'n': [1, 2, 3, 4]})
+    leido = pd.read_parquet(escribir_salida(df, str(tmp_path / 'salida.csv'), formato='parquet'))
+    assert leido['mixta'].tolist() == ['a', '1', '2.5', None]
+    assert leido['n'].tolist() == [1, 2, 3, 4]
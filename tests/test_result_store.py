@@ -0,0 +1,128 @@
+"""ResultStore: vencimiento por TTL, desalojo por espacio y descargas con Range"""
+import os
+import time
+
+import pytest
+
+from result_store import ResultStore
+
+
+def _publicar(store, contenido=b'PK resultados', nombre='resultados.zip', ttl=None):
+    job_id, ruta = store.reserve(nombre)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    store.commit(job_id, ttl=ttl)
+    return job_id
+
+
+def test_publicado_se_descarga_hasta_vencer(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=3600)
+    job_id = _publicar(store)
+    job = store.get(job_id, 'resultados.zip')
+    assert job['size'] == len(b'PK resultados')
+    assert open(job['path'], 'rb').read() == b'PK resultados'
+    # Descargar no borra: se puede repetir
+    assert store.get(job_id, 'resultados.zip')
+    assert store.get(job_id, 'otro.zip') is None
+
+
+def test_reservado_no_es_descargable_ni_acepta_varios_archivos(tmp_path):
+    store = ResultStore(str(tmp_path))
+    job_id, ruta = store.reserve('resultados.zip')
+    open(ruta, 'wb').close()
+    assert store.get(job_id) is None
+    open(os.path.join(os.path.dirname(ruta), 'sobrante.csv'), 'wb').close()
+    with pytest.raises(ValueError):
+        store.commit(job_id)
+
+
+@pytest.mark.parametrize('job_id', ['', '../etc', 'X' * 32, 'a' * 31, 'a' * 32 + '/'])
+def test_id_invalido_no_toca_el_disco(tmp_path, job_id):
+    store = ResultStore(str(tmp_path))
+    assert store.get(job_id) is None
+    store.remove(job_id)
+    assert os.path.isdir(tmp_path)
+
+
+def test_barrido_elimina_vencidos_y_conserva_vigentes(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=3600)
+    vencido = _publicar(store, ttl=-1)
+    vigente = _publicar(store)
+    assert store.get(vencido) is None
+    store.sweep()
+    assert not os.path.exists(tmp_path / vencido)
+    assert store.get(vigente)
+
+
+def test_barrido_elimina_reservados_abandonados(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=60)
+    abandonado, _ = store.reserve('resultados.zip')
+    reciente, _ = store.reserve('resultados.zip')
+    viejo = time.time() - 120
+    os.utime(tmp_path / abandonado, (viejo, viejo))
+    store.sweep()
+    assert not os.path.exists(tmp_path / abandonado)
+    assert os.path.exists(tmp_path / reciente)
+
+
+def test_desalojo_empieza_por_el_que_vence_antes(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=3600, max_bytes=250)
+    primero = _publicar(store, b'x' * 100, ttl=100)
+    segundo = _publicar(store, b'x' * 100, ttl=200)
+    tercero = _publicar(store, b'x' * 100, ttl=300)
+    assert store.get(primero) is None
+    assert store.get(segundo) and store.get(tercero)
+
+
+def test_recien_publicado_no_se_desaloja_aunque_no_quepa(tmp_path):
+    store = ResultStore(str(tmp_path), ttl=3600, max_bytes=50)
+    anterior = _publicar(store, b'x' * 10, ttl=5000)
+    grande = _publicar(store, b'x' * 100, ttl=10)
+    assert store.get(grande)
+    assert store.get(anterior) is None
+
+
+def test_barredor_se_inicia_una_vez_y_se_detiene(tmp_path):
+    store = ResultStore(str(tmp_path), sweep_interval=0.05)
+    llamadas = []
+    store.sweep_tasks.append(lambda: llamadas.append(1))
+    store.start_sweeper()
+    hilo = store._sweeper
+    store.start_sweeper()
+    assert store._sweeper is hilo
+    time.sleep(0.3)
+    store.stop_sweeper()
+    assert llamadas and not hilo.is_alive()
+
+
+def test_descarga_completa_y_con_range(app_aislada):
+    contenido = bytes(range(256)) * 40
+    job_id = _publicar(app_aislada.results, contenido)
+    cliente = app_aislada.app.test_client()
+
+    respuesta = cliente.get(f'/download/{job_id}/resultados.zip')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Accept-Ranges'] == 'bytes'
+    assert respuesta.data == contenido
+
+    respuesta = cliente.get(f'/download/{job_id}/resultados.zip', headers={'Range': 'bytes=100-199'})
+    assert respuesta.status_code == 206
+    assert respuesta.data == contenido[100:200]
+    assert respuesta.headers['Content-Range'] == f'bytes 100-199/{len(contenido)}'
+
+    # Reanudación con If-Range: el ETag coincide porque el archivo no cambió
+    etag = respuesta.headers['ETag']
+    respuesta = cliente.get(f'/download/{job_id}/resultados.zip',
+                            headers={'Range': 'bytes=9000-', 'If-Range': etag})
+    assert respuesta.status_code == 206 and respuesta.data == contenido[9000:]
+
+    respuesta = cliente.get(f'/download/{job_id}/resultados.zip', headers={'Range': f'bytes={len(contenido)}-'})
+    assert respuesta.status_code == 416
+
+
+def test_descarga_vencida_o_desconocida_es_404(app_aislada):
+    vencido = _publicar(app_aislada.results, ttl=-1)
+    cliente = app_aislada.app.test_client()
+    assert cliente.get(f'/download/{vencido}/resultados.zip').status_code == 404
+    assert cliente.get(f'/download/{"0" * 32}/resultados.zip').status_code == 404
+    assert cliente.get(f'/download/{vencido}/otro.zip').status_code == 404
@@ -0,0 +1,118 @@
+"""SumideroSQLite: inserción por lotes, upsert por clave y cierre ante errores"""
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from comun.sumidero import SumideroSQLite, nombres_unicos, volcar_df
+
+
+def _filas(ruta, tabla='datos', orden='id'):
+    with closing(sqlite3.connect(ruta)) as conexion:
+        return conexion.execute(f'SELECT * FROM "{tabla}" ORDER BY {orden}').fetchall()
+
+
+def test_nombres_unicos_para_encabezados_vacios_o_repetidos():
+    assert nombres_unicos(['id', '', 'id', ' id ', None]) == ['id', 'columna_2', 'id_2', 'id_3', 'None']
+
+
+def test_sin_clave_solo_inserta(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    for _ in range(2):
+        with SumideroSQLite(ruta, 'datos', ['id', 'valor']) as sumidero:
+            sumidero.agregar(['1', 'a'])
+    assert _filas(ruta) == [('1', 'a'), ('1', 'a')]
+
+
+def test_clave_actualiza_en_lugar_de_duplicar(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    with SumideroSQLite(ruta, 'datos', ['id', 'fecha', 'valor'], clave=['id', 'fecha']) as sumidero:
+        sumidero.agregar(['1', '2025-04-01', 'a'])
+        sumidero.agregar(['1', '2025-04-02', 'b'])
+    # Un archivo que se solapa con el anterior: la fila repetida se actualiza
+    with SumideroSQLite(ruta, 'datos', ['id', 'fecha', 'valor'], clave=['id', 'fecha']) as sumidero:
+        sumidero.agregar(['1', '2025-04-02', 'B'])
+        sumidero.agregar(['2', '2025-04-02', 'c'])
+    assert _filas(ruta, orden='id, fecha') == [
+        ('1', '2025-04-01', 'a'), ('1', '2025-04-02', 'B'), ('2', '2025-04-02', 'c')]
+
+
+def test_duplicados_dentro_del_mismo_lote(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    with SumideroSQLite(ruta, 'datos', ['id', 'valor'], clave=['id'], tamano_lote=10) as sumidero:
+        for valor in 'abc':
+            sumidero.agregar(['1', valor])
+    assert _filas(ruta) == [('1', 'c')]
+
+
+def test_clave_con_nulos_siempre_inserta(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    with SumideroSQLite(ruta, 'datos', ['id', 'valor'], clave=['id']) as sumidero:
+        sumidero.agregar([None, 'a'])
+        sumidero.agregar([None, 'b'])
+    assert len(_filas(ruta)) == 2
+
+
+def test_clave_que_cubre_todas_las_columnas_no_duplica(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    for _ in range(2):
+        with SumideroSQLite(ruta, 'datos', ['id', 'fecha'], clave=['id', 'fecha']) as sumidero:
+            sumidero.agregar(['1', '2025-04-01'])
+    assert _filas(ruta) == [('1', '2025-04-01')]
+
+
+def test_clave_inexistente_es_error(tmp_path):
+    with pytest.raises(ValueError, match="no existe"):
+        SumideroSQLite(str(tmp_path / 'base.db'), 'datos', ['id', 'valor'], clave=['email'])
+
+
+def test_clave_agregada_a_una_tabla_existente(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    with SumideroSQLite(ruta, 'datos', ['id']) as sumidero:
+        sumidero.agregar(['1'])
+    # Una versión nueva del script con más columnas y clave: la tabla se amplía
+    with SumideroSQLite(ruta, 'datos', ['id', 'valor'], clave=['id']) as sumidero:
+        sumidero.agregar(['1', 'a'])
+    assert _filas(ruta) == [('1', 'a')]
+
+
+def test_lotes_se_escriben_al_llenarse(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    sumidero = SumideroSQLite(ruta, 'datos', ['id'], tamano_lote=2)
+    for numero in range(5):
+        sumidero.agregar([numero])
+    assert sumidero.filas_escritas == 4
+    sumidero.cerrar()
+    assert sumidero.filas_escritas == 5
+    assert len(_filas(ruta)) == 5
+
+
+def test_error_dentro_del_with_descarta_el_lote_pendiente(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    with pytest.raises(RuntimeError):
+        with SumideroSQLite(ruta, 'datos', ['id'], tamano_lote=2) as sumidero:
+            for numero in range(3):
+                sumidero.agregar([numero])
+            raise RuntimeError("falla a mitad del archivo")
+    assert len(_filas(ruta)) == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        sumidero.conexion.execute('SELECT 1')
+
+
+def test_volcar_df_con_tipos_y_nulos(tmp_path):
+    ruta = str(tmp_path / 'base.db')
+    df = pd.DataFrame({
+        'id': pd.array([1, 2, None], dtype='Int64'),
+        'horas': [1.5, np.nan, 3.0],
+        'email': ['a@x.com', None, 'c@x.com'],
+    })
+    assert volcar_df(ruta, 'datos', df, clave=['email']) == 3
+    assert volcar_df(ruta, 'datos', df.assign(horas=[9.0, 9.0, 9.0]), clave=['email']) == 3
+    with closing(sqlite3.connect(ruta)) as conexion:
+        tipos = {fila[1]: fila[2] for fila in conexion.execute('PRAGMA table_info("datos")')}
+    assert tipos == {'id': 'INTEGER', 'horas': 'REAL', 'email': 'TEXT'}
+    # La fila con email nulo se inserta las dos veces; las otras se actualizan
+    assert _filas(ruta, orden='email, id, horas') == [
+        (2, None, None), (2, 9.0, None), (1, 9.0, 'a@x.com'), (None, 9.0, 'c@x.com')]